@@ -1,11 +1,43 @@
 from django.contrib import admin
-from .models import RSSSubscription, CachedURL
+from .models import RSSSubscription, FeedSource, FeedSyncCycle, OPMLImport, CachedURL, HostHealth, HostRobots, URLAlias
 
 @admin.register(RSSSubscription)
 class RSSSubscriptionAdmin(admin.ModelAdmin):
-	list_display = ('name', 'user', 'feed_url', 'is_active', 'last_fetched_at')
+	list_display = ('name', 'user', 'feed_url', 'is_active', 'last_fetched_at', 'skipped_sync_count')
 	list_filter = ('is_active',)
 	search_fields = ('name', 'feed_url', 'user__username')
+	raw_id_fields = ('source',)
+
+
+@admin.register(FeedSource)
+class FeedSourceAdmin(admin.ModelAdmin):
+	list_display = ('url', 'last_fetched_at', 'created_at')
+	search_fields = ('url',)
+
+
+@admin.register(FeedSyncCycle)
+class FeedSyncCycleAdmin(admin.ModelAdmin):
+	list_display = (
+		'started_at',
+		'trigger',
+		'wall_time_seconds',
+		'feeds_total',
+		'feeds_fetched',
+		'feeds_skipped',
+		'feeds_deferred',
+		'feeds_failed',
+		'entries_added',
+		'entries_removed',
+	)
+	list_filter = ('trigger',)
+	date_hierarchy = 'started_at'
+
+
+@admin.register(OPMLImport)
+class OPMLImportAdmin(admin.ModelAdmin):
+	list_display = ('id', 'user', 'status', 'total', 'created_count', 'processed', 'succeeded', 'failed', 'created_at')
+	list_filter = ('status',)
+	search_fields = ('user__username',)
 
 
 @admin.register(CachedURL)
@@ -21,3 +53,32 @@ class CachedURLAdmin(admin.ModelAdmin):
 	)
 	list_filter = ('fetch_status', 'last_http_status')
 	search_fields = ('url', 'title', 'site_name')
+
+
+@admin.register(HostHealth)
+class HostHealthAdmin(admin.ModelAdmin):
+	list_display = (
+		'host',
+		'state',
+		'consecutive_failures',
+		'trip_count',
+		'next_probe_at',
+		'last_success_at',
+		'last_failure_at',
+	)
+	list_filter = ('state',)
+	search_fields = ('host',)
+
+
+@admin.register(URLAlias)
+class URLAliasAdmin(admin.ModelAdmin):
+	list_display = ('alias_url', 'cached_url', 'created_at')
+	search_fields = ('alias_url', 'cached_url__url')
+	raw_id_fields = ('cached_url',)
+
+
+@admin.register(HostRobots)
+class HostRobotsAdmin(admin.ModelAdmin):
+	list_display = ('host', 'status', 'crawl_delay', 'fetched_at', 'expires_at')
+	list_filter = ('status',)
+	search_fields = ('host',)
@@ -0,0 +1,207 @@
+"""
+ホスト単位のサーキットブレーカー
+
+CachedURL の failure_count / next_retry_at は URL 単位なので、サイト全体が落ちていると
+そのサイトの全URLがそれぞれタイムアウトを待ってからバックオフすることになる。
+HostHealth に連続失敗数を記録し、閾値を超えたホストは open にして
+next_probe_at まではネットワークに出さずにスキップする。
+next_probe_at を過ぎたら1件だけ試行（half_open）し、成功すれば closed に戻す。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HostHealth
+from .ratelimit import host_of
+
+
+def breaker_threshold():
+    """open にする連続失敗数"""
+    return max(1, int(getattr(settings, 'HOST_BREAKER_FAILURE_THRESHOLD', 5)))
+
+
+def _cooldown(trip_count):
+    """open にする時間（連続で open になるたびに倍、上限あり）"""
+    base = float(getattr(settings, 'HOST_BREAKER_COOLDOWN_MINUTES', 10))
+    maximum = float(getattr(settings, 'HOST_BREAKER_MAX_COOLDOWN_MINUTES', 360))
+    minutes = min(base * (2 ** max(0, trip_count - 1)), maximum)
+    return timedelta(minutes=minutes)
+
+
+def breaker_cooldown_seconds():
+    """初回 open 時の延期秒数（バッチ内で閾値に達したホストの残りURL用）"""
+    return _cooldown(1).total_seconds()
+
+
+def _probe_timeout():
+    return timedelta(seconds=float(getattr(settings, 'HOST_BREAKER_PROBE_TIMEOUT', 120)))
+
+
+def is_host_failure(status_code, error):
+    """ホスト側の障害とみなすか（接続エラー・タイムアウト・5xx）"""
+    if error is not None:
+        return True
+    return status_code is not None and status_code >= 500
+
+
+def check_host(url, now=None):
+    """
+    このURLのホストにアクセスしてよいか判定する
+    戻り値: (allowed, retry_at)  allowed=False のとき retry_at まで延期する
+    open で next_probe_at を過ぎていれば half_open に遷移し、呼び出し元が試行役になる
+    """
+    allowed, retry_at, _probing = claim_host_name(host_of(url), now=now)
+    return allowed, retry_at
+
+
+def claim_host_name(host, now=None):
+    """
+    check_host のホスト名版（試行役（half_open）を取ったかも返す）
+    戻り値: (allowed, retry_at, probing)
+    probing=True の呼び出し元は record_host_result で結果を記録するか、
+    取得しなかった場合（robots.txt で拒否・レート制限で延期など）は release_host_probe で試行役を返す
+    """
+    if not host:
+        return True, None, False
+    now = now or timezone.now()
+
+    health = HostHealth.objects.filter(host=host).only(
+        'state', 'next_probe_at', 'updated_at'
+    ).first()
+    if health is None or health.state == 'closed':
+        return True, None, False
+
+    if health.state == 'half_open':
+        # 試行中の結果が一定時間返ってこなければ次の試行を許可する
+        if health.updated_at and health.updated_at + _probe_timeout() > now:
+            return False, health.updated_at + _probe_timeout(), False
+
+    elif health.next_probe_at and health.next_probe_at > now:
+        return False, health.next_probe_at, False
+
+    # 試行役を1つに絞る（条件付き UPDATE に勝ったものだけが試行する）
+    claimed = HostHealth.objects.filter(pk=health.pk, state=health.state, updated_at=health.updated_at).update(
+        state='half_open',
+        updated_at=now,
+    )
+    if claimed:
+        return True, None, True
+    return False, now + _probe_timeout(), False
+
+
+def release_host_probe(host, now=None):
+    """
+    取得せずに終わった試行役を返す（open に戻す。next_probe_at はそのままなので次の取得がすぐ試行役になれる）
+    ホストの状態は変えない（成功・失敗として数えない）
+    """
+    if not host:
+        return
+    HostHealth.objects.filter(host=host, state='half_open').update(
+        state='open',
+        updated_at=now or timezone.now(),
+    )
+
+
+def _apply_result(health, ok, now):
+    if ok:
+        health.state = 'closed'
+        health.consecutive_failures = 0
+        health.trip_count = 0
+        health.last_success_at = now
+        health.opened_at = None
+        health.next_probe_at = None
+        return
+
+    health.consecutive_failures += 1
+    health.last_failure_at = now
+    if health.state == 'open':
+        return
+    if health.state == 'half_open' or health.consecutive_failures >= breaker_threshold():
+        health.trip_count += 1
+        health.state = 'open'
+        health.opened_at = now
+        health.next_probe_at = now + _cooldown(health.trip_count)
+
+
+def record_host_results(outcomes, now=None):
+    """
+    ホストごとの結果をまとめて反映する
+    outcomes: {host: [True(成功) / False(障害), ...]}（発生順）
+    """
+    outcomes = {host: results for host, results in outcomes.items() if host and results}
+    if not outcomes:
+        return
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            health.host: health
+            for health in HostHealth.objects.select_for_update().filter(host__in=list(outcomes))
+        }
+        to_create = []
+        to_update = []
+        for host, results in outcomes.items():
+            health = existing.get(host)
+            if health is None:
+                # 成功しかしていない新規ホストは行を作らない
+                if all(results):
+                    continue
+                health = HostHealth(host=host)
+                to_create.append(health)
+            else:
+                to_update.append(health)
+            for ok in results:
+                _apply_result(health, ok, now)
+            health.updated_at = now
+
+        if to_create:
+            HostHealth.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            HostHealth.objects.bulk_update(to_update, [
+                'state',
+                'consecutive_failures',
+                'trip_count',
+                'last_success_at',
+                'last_failure_at',
+                'opened_at',
+                'next_probe_at',
+                'updated_at',
+            ])
+
+
+def record_host_result(url, ok, now=None):
+    """1件分の結果を反映する"""
+    record_host_results({host_of(url): [ok]}, now=now)
+
+
+def host_health_map(hosts):
+    """{host: HostHealth} を1クエリで取得"""
+    hosts = [host for host in set(hosts) if host]
+    if not hosts:
+        return {}
+    return {health.host: health for health in HostHealth.objects.filter(host__in=hosts)}
+
+
+def is_host_open(health, now=None):
+    """open で試行時刻（next_probe_at）前か（バッチに入れても延期されるだけのホスト）"""
+    if health is None or health.state != 'open':
+        return False
+    now = now or timezone.now()
+    return bool(health.next_probe_at and health.next_probe_at > now)
+
+
+def host_priority(health, now=None):
+    """
+    バッチ内の並び順キー（小さいほど先）
+    正常ホスト → 失敗が少ないホスト → 試行待ちのホスト
+    """
+    if health is None:
+        return (0, 0)
+    now = now or timezone.now()
+    if is_host_open(health, now=now):
+        return (3, health.consecutive_failures)
+    if health.state in ('open', 'half_open'):
+        return (2, health.consecutive_failures)
+    return (1 if health.consecutive_failures else 0, health.consecutive_failures)
@@ -0,0 +1,68 @@
+"""
+分類結果の共有キャッシュ（CachedURL 単位）
+
+カテゴリ・推奨タグは CachedURL のタイトル・概要だけで決まるため、
+RSS の購読者が多いフィードのように同じURLを複数ユーザーが保存しても推論は1回で済ませる。
+- キーは (CachedURL ID, 分類設定のフィンガープリント)。テキストのハッシュが一致した行だけを使う
+- メタデータの再取得でテキストが変わったら invalidate_classification で削除する（tasks._mark_fetch_success / fetcher）
+"""
+from django.utils import timezone
+
+from .models import ClassificationResult, TextEmbedding
+
+
+def load_classification_results(keys, fingerprint):
+    """
+    保存済みの分類結果を読む
+    keys: {CachedURL ID: テキストのハッシュ}
+    戻り値: {CachedURL ID: (カテゴリ名, スコア, 推奨タグ)}（ハッシュが一致したものだけ）
+    """
+    if not keys:
+        return {}
+    rows = ClassificationResult.objects.filter(
+        cached_url_id__in=list(keys),
+        fingerprint=fingerprint,
+    ).values_list('cached_url_id', 'text_hash', 'category', 'category_score', 'tags')
+    return {
+        cached_url_id: (category, category_score, tags)
+        for cached_url_id, digest, category, category_score, tags in rows
+        if keys.get(cached_url_id) == digest
+    }
+
+
+def save_classification_results(items, fingerprint):
+    """
+    分類結果をまとめて保存する（同じ CachedURL・設定の行は上書き）
+    items: [(CachedURL ID, テキストのハッシュ, (カテゴリ名, スコア, 推奨タグ)), ...]
+    """
+    now = timezone.now()
+    rows = [
+        ClassificationResult(
+            cached_url_id=cached_url_id,
+            fingerprint=fingerprint,
+            text_hash=digest,
+            category=category,
+            category_score=float(category_score),
+            tags=tags,
+            updated_at=now,
+        )
+        for cached_url_id, digest, (category, category_score, tags) in items
+    ]
+    if rows:
+        ClassificationResult.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['cached_url', 'fingerprint'],
+            update_fields=['text_hash', 'category', 'category_score', 'tags', 'updated_at'],
+            batch_size=500,
+        )
+
+
+def invalidate_classification(cached_url_ids):
+    """テキストが変わった CachedURL の分類結果と埋め込みを捨てる"""
+    cached_url_ids = list(cached_url_ids)
+    if not cached_url_ids:
+        return
+    ClassificationResult.objects.filter(cached_url_id__in=cached_url_ids).delete()
+    TextEmbedding.objects.filter(cached_url_id__in=cached_url_ids).delete()
+
@@ -0,0 +1,194 @@
+"""
+記事テキストの埋め込みストア（CachedURL 単位）
+
+分類のたびに同じテキストを推論し直さないよう、埋め込みを保存して再利用する。
+- キーは (CachedURL ID, モデルのフィンガープリント)。テキストのハッシュが変わった行は使わない
+- ベクトルは float16 のバイト列で TextEmbedding.vector に保存する（1件 384次元なら 768 バイト）
+- 読み出しは numpy.frombuffer で行い、BLOB をコピーせずに配列として扱う
+
+類似度検索などでまとめて読む用途には、export_embeddings コマンドでモデル単位のスナップショット
+（float16 の .npy + CachedURL ID の .npy + manifest.json）を書き出し、open_snapshot で
+メモリマップとして開く。ワーカー間でページキャッシュを共有でき、読み込み時のコピーも発生しない。
+"""
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import TextEmbedding
+
+MANIFEST_NAME = 'manifest.json'
+VECTORS_NAME = 'vectors.f16.npy'
+IDS_NAME = 'cached_url_ids.npy'
+
+
+def store_enabled():
+    return bool(getattr(settings, 'EMBEDDING_STORE_ENABLED', True))
+
+
+def text_hash(text):
+    """分類用テキストのハッシュ（SHA-256 の16進文字列）"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def _as_vector(value, dim):
+    import numpy as np
+
+    return np.frombuffer(value, dtype=np.float16, count=dim)
+
+
+def load_embeddings(keys, fingerprint):
+    """
+    保存済みの埋め込みを読む
+    keys: {CachedURL ID: テキストのハッシュ}
+    戻り値: {CachedURL ID: float16 の1次元配列}（ハッシュが一致したものだけ）
+    """
+    if not keys:
+        return {}
+    rows = TextEmbedding.objects.filter(
+        cached_url_id__in=list(keys),
+        model_fingerprint=fingerprint,
+    ).values_list('cached_url_id', 'text_hash', 'dim', 'vector')
+    return {
+        cached_url_id: _as_vector(vector, dim)
+        for cached_url_id, digest, dim, vector in rows
+        if keys.get(cached_url_id) == digest
+    }
+
+
+def save_embeddings(items, fingerprint):
+    """
+    埋め込みをまとめて保存する（同じ CachedURL・モデルの行は上書き）
+    items: [(CachedURL ID, テキストのハッシュ, 1次元配列), ...]
+    """
+    import numpy as np
+
+    now = timezone.now()
+    rows = []
+    for cached_url_id, digest, embedding in items:
+        vector = np.ascontiguousarray(embedding, dtype=np.float16).reshape(-1)
+        rows.append(TextEmbedding(
+            cached_url_id=cached_url_id,
+            model_fingerprint=fingerprint,
+            text_hash=digest,
+            dim=vector.shape[0],
+            vector=vector.tobytes(),
+            updated_at=now,
+        ))
+    if rows:
+        TextEmbedding.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['cached_url', 'model_fingerprint'],
+            update_fields=['text_hash', 'dim', 'vector', 'updated_at'],
+            batch_size=500,
+        )
+
+
+def encode_with_store(model, texts, cached_url_ids, fingerprint):
+    """
+    テキストの埋め込みをストア経由で求める
+    保存済み（テキストのハッシュが一致）のものは読み出し、残りだけを model.encode(リスト) の1回で推論して保存する
+    戻り値: float32 の [len(texts), dim] 配列（texts と同じ順序）
+    """
+    import numpy as np
+
+    texts = list(texts)
+    digests = [text_hash(text) for text in texts]
+    stored = load_embeddings(dict(zip(cached_url_ids, digests)), fingerprint)
+
+    missing = [i for i, cached_url_id in enumerate(cached_url_ids) if cached_url_id not in stored]
+    encoded = {}
+    if missing:
+        embeddings = np.asarray(model.encode([texts[i] for i in missing]), dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        encoded = dict(zip(missing, embeddings))
+        save_embeddings(
+            [(cached_url_ids[i], digests[i], encoded[i]) for i in missing],
+            fingerprint,
+        )
+
+    return np.stack([
+        encoded[i] if i in encoded else stored[cached_url_id].astype(np.float32)
+        for i, cached_url_id in enumerate(cached_url_ids)
+    ])
+
+
+def export_snapshot(directory, fingerprint, chunk_size=10000):
+    """
+    モデル1つ分の埋め込みをメモリマップ用のスナップショットとして書き出す
+    - vectors.f16.npy: float16 の [件数, dim]（np.lib.format.open_memmap でチャンクごとに書き込む）
+    - cached_url_ids.npy: 各行の CachedURL ID（int64）
+    - manifest.json: フィンガープリント・次元数・件数・ファイル名
+    一時ファイルに書いてから置き換えるので、読み手は常に完結したスナップショットを開く
+    戻り値: manifest の dict
+    """
+    import numpy as np
+
+    queryset = TextEmbedding.objects.filter(model_fingerprint=fingerprint)
+    count = queryset.count()
+    dims = set(queryset.values_list('dim', flat=True).distinct())
+    if len(dims) > 1:
+        raise ValueError(f'次元数が混在しています: {sorted(dims)}')
+    dim = dims.pop() if dims else 0
+
+    os.makedirs(directory, exist_ok=True)
+    vectors_path = os.path.join(directory, VECTORS_NAME)
+    ids_path = os.path.join(directory, IDS_NAME)
+    vectors = np.lib.format.open_memmap(vectors_path + '.tmp', mode='w+', dtype=np.float16, shape=(count, dim))
+    ids = np.lib.format.open_memmap(ids_path + '.tmp', mode='w+', dtype=np.int64, shape=(count,))
+
+    # ID順にチャンク単位で読む（テーブル全体をメモリに載せない）
+    row = 0
+    last_id = 0
+    while row < count:
+        chunk = list(
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'cached_url_id', 'vector')[:chunk_size]
+        )
+        if not chunk:
+            break
+        chunk = chunk[:count - row]
+        last_id = chunk[-1][0]
+        for offset, (_pk, cached_url_id, vector) in enumerate(chunk):
+            vectors[row + offset] = _as_vector(vector, dim)
+            ids[row + offset] = cached_url_id
+        row += len(chunk)
+    vectors.flush()
+    ids.flush()
+    del vectors, ids
+
+    manifest = {
+        'model_fingerprint': fingerprint,
+        'dtype': 'float16',
+        'dim': dim,
+        'count': row,
+        'vectors': VECTORS_NAME,
+        'cached_url_ids': IDS_NAME,
+        'created_at': timezone.now().isoformat(),
+    }
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(vectors_path + '.tmp', vectors_path)
+    os.replace(ids_path + '.tmp', ids_path)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def open_snapshot(directory):
+    """
+    export_snapshot で書き出したスナップショットを読み取り専用のメモリマップで開く
+    戻り値: (manifest, CachedURL ID の配列, float16 の [件数, dim] 配列)
+    """
+    import numpy as np
+
+    with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    ids = np.load(os.path.join(directory, manifest['cached_url_ids']), mmap_mode='r')
+    vectors = np.load(os.path.join(directory, manifest['vectors']), mmap_mode='r')
+    return manifest, ids[:manifest['count']], vectors[:manifest['count']]
@@ -0,0 +1,129 @@
+"""
+RSS / Atom のストリーミング解析
+
+ET.fromstring でフィード全体の木を作ると、content:encoded に本文全体を載せる
+ニュース・ポッドキャストのフィードではメモリと CPU を大きく消費する。
+- XMLPullParser にチャンク単位で流し込み、item / entry を読み終えるたびに木から切り離して解放する
+- 必要な子要素（link / guid / title / description）は要素の終了時に1回だけ見る
+- description は DEFAULT_DESCRIPTION_MAX_CHARS で切り詰める
+- 既知の GUID が一定数連続したら以降は読まない（差分取り込みモード）
+"""
+import xml.etree.ElementTree as ET
+
+DEFAULT_DESCRIPTION_MAX_CHARS = 5000
+FEED_CHUNK_SIZE = 64 * 1024
+
+_ENTRY_TAGS = {'item', 'entry'}
+_GUID_TAGS = {'guid', 'id'}
+_DESCRIPTION_TAGS = {'description', 'summary', 'content'}
+
+
+def _local_tag(tag_name):
+    if not isinstance(tag_name, str) or not tag_name:
+        return ''
+    return tag_name.split('}')[-1].lower()
+
+
+class _EntryState:
+    """読み込み中の item / entry（直下の子要素の値を最初の1件だけ保持）"""
+    __slots__ = ('element', 'link', 'guid', 'title', 'description')
+
+    def __init__(self, element):
+        self.element = element
+        self.link = None
+        self.guid = None
+        self.title = None
+        self.description = None
+
+    def take(self, child, description_max_chars):
+        tag = _local_tag(child.tag)
+        text = (child.text or '').strip()
+        if tag == 'link':
+            if self.link is None:
+                # RSS: <link>URL</link> / Atom: <link href="URL" />
+                self.link = text or (child.attrib.get('href') or '').strip() or None
+        elif tag in _GUID_TAGS:
+            if self.guid is None and text:
+                self.guid = text
+        elif tag == 'title':
+            if self.title is None and text:
+                self.title = text
+        elif tag in _DESCRIPTION_TAGS:
+            if self.description is None and text:
+                self.description = text[:description_max_chars]
+
+    def to_entry(self):
+        guid = self.guid or self.link
+        if not self.link or not guid:
+            return None
+        return {
+            'link': self.link,
+            'guid': guid,
+            'title': self.title,
+            'description': self.description,
+        }
+
+
+def iter_feed_entries(content, description_max_chars=None):
+    """
+    フィード本文（バイト列）から {'link', 'guid', 'title', 'description'} を順に返す
+    読み終えた要素は親から外して解放する
+    """
+    description_max_chars = description_max_chars or DEFAULT_DESCRIPTION_MAX_CHARS
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    stack = []
+    entries = []
+
+    def _drain():
+        for event, element in parser.read_events():
+            if event == 'start':
+                stack.append(element)
+                if _local_tag(element.tag) in _ENTRY_TAGS:
+                    entries.append(_EntryState(element))
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if entries and parent is entries[-1].element:
+                entries[-1].take(element, description_max_chars)
+                # content:encoded などの大きな本文は読み終えた時点で捨てる
+                element.clear()
+
+            if entries and element is entries[-1].element:
+                state = entries.pop()
+                element.clear()
+                if parent is not None:
+                    parent.remove(element)
+                entry = state.to_entry()
+                if entry is not None:
+                    yield entry
+            elif not entries and parent is not None:
+                # item / entry の外側（channel のタイトル等）も読み終えたら解放する
+                parent.remove(element)
+
+    content = content or b''
+    for start in range(0, len(content), FEED_CHUNK_SIZE):
+        parser.feed(content[start:start + FEED_CHUNK_SIZE])
+        yield from _drain()
+    parser.close()
+    yield from _drain()
+
+
+def parse_feed_entries(content, known_guids=None, stop_after_known=0, description_max_chars=None):
+    """
+    フィードのエントリを解析する
+    known_guids / stop_after_known: 既知の GUID が stop_after_known 件連続したら読むのをやめる（0 で無効）
+    戻り値: (エントリのリスト, 最後まで読んだか)
+    """
+    known_guids = known_guids or set()
+    entries = []
+    known_run = 0
+    for entry in iter_feed_entries(content, description_max_chars=description_max_chars):
+        entries.append(entry)
+        if stop_after_known > 0 and str(entry['guid']).strip() in known_guids:
+            known_run += 1
+            if known_run >= stop_after_known:
+                return entries, False
+        else:
+            known_run = 0
+    return entries, True
@@ -0,0 +1,86 @@
+"""
+フィード単位の適応的ポーリング
+
+全フィードを15分ごとに取得すると、月に1回しか更新されないフィードも同じ回数だけ取得することになる。
+取得のたびに前回から増えた GUID の数を数え、1時間あたりの新着件数を指数移動平均で推定する。
+- 次回の取得間隔は「平均して1件の新着が溜まる時間」（RSS_POLL_MIN_MINUTES 〜 RSS_POLL_MAX_MINUTES）
+- 新着が途絶えても間隔は1回につき最大2倍までしか伸ばさない
+- 同じ時刻に取得が集中しないよう RSS_POLL_JITTER の割合で前後にずらす
+"""
+import hashlib
+import random
+from datetime import timedelta
+
+from django.conf import settings
+
+# 推定の追従速度（大きいほど直近の観測を重視）
+RATE_SMOOTHING = 0.3
+MAX_GROWTH = 2.0
+
+
+def _bounds():
+    minimum = float(getattr(settings, 'RSS_POLL_MIN_MINUTES', 15)) * 60
+    maximum = float(getattr(settings, 'RSS_POLL_MAX_MINUTES', 24 * 60)) * 60
+    return minimum, max(minimum, maximum)
+
+
+def guid_digests(guids):
+    """GUID を短いハッシュのリストにする（FeedSource.guid_digests 保存用）"""
+    return sorted({hashlib.sha1(str(guid).encode('utf-8')).hexdigest()[:12] for guid in guids})
+
+
+def count_new_guids(source, digests):
+    """
+    前回の取得にはなかった GUID の数（まだ一度も取得していなければ None）
+    前回のエントリが0件だった場合は記録なしではなく、今回の件数がそのまま新着数になる
+    """
+    if source.last_fetched_at is None:
+        return None
+    return len(set(digests) - set(source.guid_digests or []))
+
+
+def _jittered(seconds):
+    jitter = float(getattr(settings, 'RSS_POLL_JITTER', 0.1))
+    if jitter <= 0:
+        return seconds
+    return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+
+def next_poll_fields(source, new_count, now):
+    """
+    取得結果を反映した適応的ポーリングの値を返す（保存はしない）
+    new_count: 今回見つかった新着件数（304・本文同一なら 0、不明なら None）
+    戻り値: {'publish_rate_per_hour', 'poll_interval_seconds', 'next_poll_at', 'last_new_entry_at'}
+    """
+    minimum, maximum = _bounds()
+    rate = source.publish_rate_per_hour
+    interval = source.poll_interval_seconds or minimum
+    last_new_entry_at = source.last_new_entry_at
+
+    if new_count:
+        last_new_entry_at = now
+
+    if new_count is None or source.last_fetched_at is None:
+        # 初回は更新頻度が分からないので最短間隔で様子を見る
+        interval = minimum
+    else:
+        elapsed_hours = max((now - source.last_fetched_at).total_seconds() / 3600, 1 / 60)
+        observed = new_count / elapsed_hours
+        rate = observed if rate is None else RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * rate
+        target = 3600 / rate if rate > 0 else maximum
+        interval = min(target, interval * MAX_GROWTH)
+
+    interval = min(max(interval, minimum), maximum)
+    return {
+        'publish_rate_per_hour': rate,
+        'poll_interval_seconds': interval,
+        'next_poll_at': now + timedelta(seconds=_jittered(interval)),
+        'last_new_entry_at': last_new_entry_at,
+    }
+
+
+def retry_poll_fields(source, now):
+    """取得に失敗・延期した場合の次回取得時刻（間隔は学習しない）"""
+    minimum, maximum = _bounds()
+    interval = min(max(source.poll_interval_seconds or minimum, minimum), maximum)
+    return {'next_poll_at': now + timedelta(seconds=_jittered(interval))}
@@ -0,0 +1,126 @@
+"""
+RSS フィードの並行同期エンジン
+
+sync_all_rss_feeds / sync_due_rss_feeds の1サイクル分をまとめて処理する。
+- 計画段階: FeedSource と購読をまとめて読み、robots.txt を引いておく（tasks._plan_feed_syncs）
+- 取得・解析段階: スレッドプールで並行実行（全体 / ホスト単位の同時接続数を制限）。DB には触れない
+- 書き込み段階: 取得が終わったフィードから順に、呼び出し元のスレッドで DB に反映する（tasks._write_feed_sync）
+  スレッドが次のフィードを取得している間に書き込むので、取得と書き込みが重なる
+- サイクルごとの集計（取得・スキップ・失敗したフィード数、追加・削除した記事数、所要時間）を FeedSyncCycle に保存する
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FeedSyncCycle
+from .ratelimit import host_of
+
+_SKIPPED_OUTCOMES = ('not_modified', 'unchanged')
+
+
+def _interleave_by_host(plans):
+    """
+    ホストが偏らないよう計画を並べ替える（同じホストのフィードが続くと、
+    ホスト単位の上限で待つスレッドが接続枠を埋めてしまう）
+    """
+    by_host = {}
+    for plan in plans:
+        by_host.setdefault(host_of(plan.source.url), []).append(plan)
+    queues = list(by_host.values())
+    ordered = []
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def _feed_outcome(outcomes):
+    """購読ごとの結果からフィード単位の結果を決める（1件でも取り込めば 'synced'）"""
+    values = set(outcomes.values())
+    for outcome in ('synced', 'failed', 'deferred', 'not_modified'):
+        if outcome in values:
+            return outcome
+    return 'unchanged'
+
+
+def run_feed_sync_cycle(source_ids, trigger='all', concurrency=None, per_host=None,
+                        subscription_ids=None, on_feed_synced=None):
+    """
+    FeedSource ID 群を並行同期し、集計を FeedSyncCycle に保存する
+    - concurrency: 同時に取得するフィード数（RSS_SYNC_CONCURRENCY）
+    - per_host: 同一ホストへの同時接続数（RSS_SYNC_PER_HOST）
+    - subscription_ids: 指定時はこの購読だけに反映する（OPML インポート直後の初回同期など）
+    - on_feed_synced: フィード1件を書き込むたびに {購読ID: 結果} を渡して呼ぶ（進捗の記録用）
+    戻り値: {'trigger', 'feeds_total', 'feeds_fetched', 'feeds_skipped', 'feeds_deferred', 'feeds_failed',
+             'entries_added', 'entries_removed', 'wall_time_seconds'}
+    """
+    from .tasks import _fetch_feed_plan, _plan_feed_syncs, _write_feed_sync, classify_articles_in_batches
+
+    concurrency = max(1, int(concurrency or getattr(settings, 'RSS_SYNC_CONCURRENCY', 16)))
+    per_host = max(1, int(per_host or getattr(settings, 'RSS_SYNC_PER_HOST', 2)))
+
+    started_at = timezone.now()
+    started = time.monotonic()
+    summary = {
+        'trigger': trigger,
+        'feeds_total': 0,
+        'feeds_fetched': 0,
+        'feeds_skipped': 0,
+        'feeds_deferred': 0,
+        'feeds_failed': 0,
+        'entries_added': 0,
+        'entries_removed': 0,
+    }
+
+    plans = _interleave_by_host(_plan_feed_syncs(list(source_ids), subscription_ids=subscription_ids))
+    summary['feeds_total'] = len(plans)
+    host_sems = {}
+    host_sems_lock = threading.Lock()
+
+    def _fetch(plan):
+        host = host_of(plan.source.url)
+        with host_sems_lock:
+            host_sem = host_sems.setdefault(host, threading.Semaphore(per_host))
+        with host_sem:
+            return _fetch_feed_plan(plan)
+
+    new_article_ids = []
+    if plans:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(plans))) as executor:
+            futures = {executor.submit(_fetch, plan): plan for plan in plans}
+            for future in as_completed(futures):
+                plan = futures[future]
+                try:
+                    outcomes, created_ids, removed = _write_feed_sync(plan, future.result())
+                except Exception as exc:
+                    print(f"Error syncing RSS {plan.source.url}: {exc}")
+                    outcomes, created_ids, removed = (
+                        {subscription.id: 'failed' for subscription in plan.subscriptions}, [], 0
+                    )
+
+                outcome = _feed_outcome(outcomes)
+                if outcome == 'synced':
+                    summary['feeds_fetched'] += 1
+                elif outcome in _SKIPPED_OUTCOMES:
+                    summary['feeds_skipped'] += 1
+                else:
+                    summary[f'feeds_{outcome}'] += 1
+                summary['entries_added'] += len(created_ids)
+                summary['entries_removed'] += removed
+                new_article_ids.extend(created_ids)
+                if on_feed_synced is not None:
+                    on_feed_synced(outcomes)
+
+    # 新規記事の分類は全フィードの書き込みが終わってから開始する
+    classify_articles_in_batches(new_article_ids)
+
+    summary['wall_time_seconds'] = time.monotonic() - started
+    FeedSyncCycle.objects.create(
+        started_at=started_at,
+        finished_at=timezone.now(),
+        **summary,
+    )
+    return summary
@@ -0,0 +1,445 @@
+"""
+CachedURL メタデータの一括取得エンジン（asyncio）
+
+retry_pending_metadata のように大量の CachedURL をまとめて再取得する用途向け。
+- ネットワーク待ちは asyncio + スレッドプールで並行実行（全体 / ホスト単位の同時接続数を制限）
+- ダウンロード段階（I/O）と解析段階（CPU）を分離し、間を上限付きキューでつなぐ
+  解析は ProcessPoolExecutor で行い、解析が追いつかないときはキューが詰まってダウンロードが待つ（背圧）
+- 成功・失敗の記録は tasks._apply_fetch_success / _apply_fetch_failure を再利用
+- バリデータを持つ URL は条件付きGETで再検証し、304 なら解析しない
+- ホスト単位のレート制限（ratelimit.py）を超える分は失敗にせず延期
+- サーキットブレーカー（circuit.py）で open のホストはネットワークに出さずに延期
+- robots.txt（robots.py）で拒否された URL は取得せずに記録
+- DB への書き戻しは bulk_update でまとめて1トランザクション
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .html_meta import (
+    DEFAULT_HEAD_MAX_BYTES,
+    STREAM_CHUNK_SIZE,
+    extract_head_metadata_from_bytes,
+    read_head_bytes,
+)
+from .http_client import http_get
+from .classification_cache import invalidate_classification
+from .http_cache import conditional_headers, is_not_modified, response_validators
+from .circuit import (
+    breaker_cooldown_seconds,
+    breaker_threshold,
+    claim_host_name,
+    host_health_map,
+    is_host_failure,
+    record_host_results,
+    release_host_probe,
+)
+from .ratelimit import deferral_seconds, get_rate_limiter, host_of
+from .robots import ALLOW_ALL, get_robots_policies
+from .urlnorm import record_redirect_alias
+from .models import CachedURL
+
+METADATA_USER_AGENT = 'YourAppName-Bookmark-Bot/1.0'
+
+_parse_executor = None
+_parse_executor_pid = None
+_parse_executor_workers = None
+_parse_executor_lock = threading.Lock()
+
+
+class DownloadResult:
+    """
+    ダウンロード段階の結果
+    defer_seconds が設定されている場合は未取得（レート制限で延期）
+    解析段階を通ったものは metadata（失敗時は parse_error）が入り、content は解放される
+    """
+    __slots__ = (
+        'status_code', 'content', 'headers', 'error', 'defer_seconds', 'final_url', 'metadata', 'parse_error',
+    )
+
+    def __init__(self, status_code=None, content=None, headers=None, error=None, defer_seconds=None,
+                 final_url=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+        self.error = error
+        self.defer_seconds = defer_seconds
+        self.final_url = final_url
+        self.metadata = None
+        self.parse_error = None
+
+    @property
+    def needs_parse(self):
+        return (
+            self.defer_seconds is None
+            and self.error is None
+            and self.status_code is not None
+            and 200 <= self.status_code < 400
+            and self.status_code != 304
+        )
+
+
+def get_parse_executor():
+    """
+    解析段階用のプロセスプールを取得（プロセスごとに1つ、初回に起動して使い回す）
+    METADATA_PARSE_WORKERS=0 や、子プロセスを作れない環境（Celery prefork の子など）では None
+    """
+    global _parse_executor, _parse_executor_pid, _parse_executor_workers
+    workers = int(getattr(settings, 'METADATA_PARSE_WORKERS', 0) or 0)
+    pid = os.getpid()
+    if _parse_executor_pid == pid and _parse_executor_workers == workers:
+        return _parse_executor
+
+    with _parse_executor_lock:
+        if _parse_executor_pid != pid or _parse_executor_workers != workers:
+            if _parse_executor is not None and _parse_executor_pid == pid:
+                _parse_executor.shutdown(wait=False)
+            executor = None
+            if workers > 0:
+                try:
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                    # 起動できるかをここで確かめ、だめなら以後はスレッドで解析する
+                    executor.submit(int).result(timeout=30)
+                except Exception as exc:
+                    print(f"Parse process pool unavailable ({exc}). Parsing in threads.")
+                    if executor is not None:
+                        executor.shutdown(wait=False)
+                    executor = None
+            _parse_executor = executor
+            _parse_executor_pid = pid
+            _parse_executor_workers = workers
+    return _parse_executor
+
+
+def shutdown_parse_executor():
+    """解析用プロセスプールを停止する（設定変更時・テスト用）"""
+    global _parse_executor, _parse_executor_pid, _parse_executor_workers
+    with _parse_executor_lock:
+        if _parse_executor is not None and _parse_executor_pid == os.getpid():
+            _parse_executor.shutdown(wait=True)
+        _parse_executor = None
+        _parse_executor_pid = None
+        _parse_executor_workers = None
+
+
+def _download(url, extra_headers, timeout, max_bytes):
+    """
+    1件ダウンロードする（スレッドプール上で実行）
+    本文は <head> の終わりか max_bytes までしか読まない
+    """
+    try:
+        headers = {'User-Agent': METADATA_USER_AGENT, **extra_headers}
+        response = http_get(url, purpose='scraper', headers=headers, timeout=timeout, stream=True)
+        try:
+            content = b''
+            if response.status_code < 400:
+                content = read_head_bytes(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), max_bytes)
+            return DownloadResult(
+                response.status_code,
+                content,
+                response.headers,
+                final_url=getattr(response, 'url', None),
+            )
+        finally:
+            response.close()
+    except requests.RequestException as exc:
+        return DownloadResult(error=exc)
+
+
+async def _download_all(targets, concurrency, per_host, timeout, max_bytes, failure_budget=None,
+                        parse_executor=None, queue_size=None):
+    """
+    (url, 追加リクエストヘッダー) のリストを並行ダウンロードし、解析段階に流す
+    - concurrency: 全体の同時接続数
+    - per_host: 同一ホストへの同時接続数（プロセス内）
+    - ホスト単位のトークンバケット（ワーカー間共有）で待ちが短ければ待機、長ければ延期
+    - failure_budget: {host: 残り許容連続失敗数}。0 になったホストの残りはバッチ内で延期
+    - parse_executor: 解析段階のプロセスプール（None ならダウンロード用スレッドで解析）
+    - queue_size: ダウンロード済み・未解析の件数の上限。満杯の間は接続枠を握ったまま待つ
+    戻り値: targets と同じ順序の DownloadResult リスト
+    """
+    loop = asyncio.get_running_loop()
+    global_sem = asyncio.Semaphore(concurrency)
+    host_sems = {}
+    limiter = get_rate_limiter()
+    max_inline_wait = float(getattr(settings, 'FETCH_RATE_LIMIT_MAX_INLINE_WAIT', 5))
+    failure_budget = dict(failure_budget or {})
+    breaker_defer = breaker_cooldown_seconds()
+    parse_workers = max(1, int(getattr(settings, 'METADATA_PARSE_WORKERS', 0) or 0)) if parse_executor else 1
+    parse_queue = asyncio.Queue(maxsize=max(1, int(queue_size or parse_workers * 4)))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def _fetch(url, extra_headers):
+            host = host_of(url)
+            host_sem = host_sems.setdefault(host, asyncio.Semaphore(per_host))
+            async with host_sem:
+                # バッチ内で連続失敗が閾値に達したホストはネットワークに出さない
+                if failure_budget.get(host, 1) <= 0:
+                    return DownloadResult(defer_seconds=breaker_defer)
+
+                while True:
+                    wait = await loop.run_in_executor(executor, limiter.try_acquire, url)
+                    if wait <= 0:
+                        break
+                    if wait > max_inline_wait:
+                        return DownloadResult(defer_seconds=wait)
+                    await asyncio.sleep(wait)
+
+                async with global_sem:
+                    result = await loop.run_in_executor(
+                        executor, _download, url, extra_headers, timeout, max_bytes
+                    )
+
+                    # 429 / Retry-After はホスト全体を止め、同じホストの後続も延期させる
+                    if result.error is None:
+                        throttle_seconds = deferral_seconds(result.status_code, result.headers)
+                        if throttle_seconds is not None:
+                            limiter.defer_host(url, throttle_seconds)
+                            result.defer_seconds = throttle_seconds
+                            return result
+
+                    if host in failure_budget:
+                        if is_host_failure(result.status_code, result.error):
+                            failure_budget[host] -= 1
+                        else:
+                            failure_budget[host] = breaker_threshold()
+
+                    if result.needs_parse:
+                        await parse_queue.put((url, result))
+                return result
+
+        async def _parse_worker():
+            while True:
+                item = await parse_queue.get()
+                if item is None:
+                    parse_queue.task_done()
+                    return
+                url, result = item
+                try:
+                    result.metadata = await loop.run_in_executor(
+                        parse_executor or executor,
+                        extract_head_metadata_from_bytes,
+                        result.content,
+                        url,
+                        result.headers.get('Content-Type'),
+                        max_bytes,
+                    )
+                except Exception as exc:
+                    result.parse_error = exc
+                finally:
+                    result.content = None
+                    parse_queue.task_done()
+
+        parsers = [asyncio.create_task(_parse_worker()) for _ in range(parse_workers)]
+        try:
+            results = await asyncio.gather(*(_fetch(url, extra) for url, extra in targets))
+            for _ in parsers:
+                await parse_queue.put(None)
+            await asyncio.gather(*parsers)
+        finally:
+            for task in parsers:
+                task.cancel()
+        return results
+
+
+def _apply_download_result(cache, request_headers, result):
+    """
+    ダウンロード結果を CachedURL に反映し、更新フィールドと結果種別を返す
+    判定ルールは fetch_article_metadata と同じ
+    """
+    from .tasks import (
+        _apply_fetch_deferred,
+        _apply_fetch_failure,
+        _apply_fetch_not_modified,
+        _apply_fetch_success,
+        _extract_metadata,
+    )
+
+    # レート制限・スロットリングは失敗に数えず延期
+    if result.defer_seconds is not None:
+        return _apply_fetch_deferred(cache, result.defer_seconds, status_code=result.status_code), 'deferred'
+
+    if result.error is not None:
+        return _apply_fetch_failure(cache, status_code=None, is_not_found=False), 'failed'
+
+    status_code = result.status_code
+
+    # 304 は変更なし: 解析せず最終取得日時だけ更新
+    if is_not_modified(status_code, request_headers):
+        return _apply_fetch_not_modified(cache, status_code=status_code), 'not_modified'
+
+    # 404/410は削除・移転の可能性が高いのでタイトルは空のままにする
+    if status_code in (404, 410):
+        return _apply_fetch_failure(cache, status_code=status_code, is_not_found=True), 'not_found'
+
+    # 5xxやその他4xxは失敗として再試行
+    if status_code >= 400:
+        return _apply_fetch_failure(cache, status_code=status_code, is_not_found=False), 'failed'
+
+    if result.parse_error is not None:
+        print(f"Error processing {cache.url}: {result.parse_error}")
+        return [], 'error'
+
+    metadata = result.metadata
+    if metadata is None:
+        try:
+            metadata = _extract_metadata(result.content, cache.url, content_type=result.headers.get('Content-Type'))
+        except Exception as exc:
+            print(f"Error processing {cache.url}: {exc}")
+            return [], 'error'
+
+    fields = _apply_fetch_success(
+        cache,
+        status_code=status_code,
+        **metadata,
+        **response_validators(result.headers),
+    )
+    return fields, ('success' if cache.title else 'failed')
+
+
+def bulk_fetch_metadata(cached_url_ids, concurrency=None, per_host=None, timeout=None):
+    """
+    CachedURL ID のバッチを並行取得して bulk_update で書き戻す
+    next_retry_at が未来のものはスキップする
+    戻り値: {'requested', 'fetched', 'success', 'not_modified', 'deferred', 'disallowed', 'failed', 'not_found', 'error'}
+    """
+    concurrency = max(1, int(concurrency or getattr(settings, 'METADATA_FETCH_CONCURRENCY', 32)))
+    per_host = max(1, int(per_host or getattr(settings, 'METADATA_FETCH_PER_HOST', 4)))
+    timeout = timeout or getattr(settings, 'METADATA_FETCH_TIMEOUT', 10)
+    max_bytes = getattr(settings, 'METADATA_HEAD_MAX_BYTES', DEFAULT_HEAD_MAX_BYTES)
+
+    stats = {
+        'requested': len(cached_url_ids),
+        'fetched': 0,
+        'success': 0,
+        'not_modified': 0,
+        'deferred': 0,
+        'disallowed': 0,
+        'failed': 0,
+        'not_found': 0,
+        'error': 0,
+    }
+
+    now = timezone.now()
+    caches = list(
+        CachedURL.objects.filter(id__in=cached_url_ids).filter(
+            Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now)
+        )
+    )
+    if not caches:
+        return stats
+
+    from .tasks import _apply_fetch_deferred, _apply_fetch_disallowed, _classification_text
+
+    # --- ホスト単位のサーキットブレーカー: open のホストはネットワークに出さない ---
+    healths = host_health_map(host_of(cache.url) for cache in caches)
+    gates = {}
+    failure_budget = {}
+    probed_hosts = set()
+    for host in {host_of(cache.url) for cache in caches}:
+        health = healths.get(host)
+        if health is None or health.state == 'closed':
+            gates[host] = ('allow', None)
+            failure_budget[host] = breaker_threshold() - (health.consecutive_failures if health else 0)
+            continue
+        allowed, retry_at, probing = claim_host_name(host, now=now)
+        # 試行（half_open）はホストにつき1件だけ
+        gates[host] = ('probe', None) if allowed else ('skip', retry_at)
+        failure_budget[host] = 1
+        if probing:
+            probed_hosts.add(host)
+
+    # robots.txt は未取得・期限切れのホストだけ並行取得（Crawl-delay はレート制限に反映される）
+    policies = get_robots_policies(
+        [cache.url for cache in caches if gates[host_of(cache.url)][0] != 'skip'],
+        max_workers=concurrency,
+    )
+
+    targets = []
+    planned = []
+    skipped = []
+    disallowed = []
+    for cache in caches:
+        host = host_of(cache.url)
+        gate, retry_at = gates[host]
+        if gate == 'skip':
+            skipped.append((cache, retry_at))
+            continue
+        if not policies.get(host, ALLOW_ALL).can_fetch(cache.url):
+            disallowed.append(cache)
+            continue
+        if gate == 'probe':
+            gates[host] = ('skip', now + timedelta(seconds=breaker_cooldown_seconds()))
+        planned.append(cache)
+        targets.append((cache.url, conditional_headers(cache)))
+
+    results = asyncio.run(
+        _download_all(
+            targets,
+            concurrency,
+            per_host,
+            timeout,
+            max_bytes,
+            failure_budget=failure_budget,
+            parse_executor=get_parse_executor() if targets else None,
+            queue_size=getattr(settings, 'METADATA_PARSE_QUEUE_SIZE', None),
+        )
+    )
+
+    # 結果ごとに書き戻すフィールドが違うので、フィールドの組ごとに bulk_update する
+    # （和集合で書くと、延期・不許可・304 の行の読み込み時点の古い値で他のフィールドを上書きしてしまう）
+    changed = {}
+    host_outcomes = {}
+    text_changed = []
+    for cache, (url, request_headers), result in zip(planned, targets, results):
+        previous_text = _classification_text(cache)
+        fields, outcome = _apply_download_result(cache, request_headers, result)
+        stats[outcome] += 1
+        if fields:
+            changed.setdefault(tuple(sorted(fields)), []).append(cache)
+            if _classification_text(cache) != previous_text:
+                text_changed.append(cache.id)
+        if result.defer_seconds is None:
+            host_outcomes.setdefault(host_of(url), []).append(
+                not is_host_failure(result.status_code, result.error)
+            )
+
+    for cache, retry_at in skipped:
+        seconds = max(1.0, (retry_at - now).total_seconds()) if retry_at else breaker_cooldown_seconds()
+        fields = _apply_fetch_deferred(cache, seconds)
+        stats['deferred'] += 1
+        changed.setdefault(tuple(sorted(fields)), []).append(cache)
+
+    for cache in disallowed:
+        fields = _apply_fetch_disallowed(cache)
+        stats['disallowed'] += 1
+        changed.setdefault(tuple(sorted(fields)), []).append(cache)
+
+    record_host_results(host_outcomes)
+    # 試行役（half_open）を取ったのに結果がないホスト（全URLが robots.txt で拒否・延期）は試行役を返す
+    for host in probed_hosts - set(host_outcomes):
+        release_host_probe(host)
+
+    # リダイレクト先URLを別名として登録
+    for cache, result in zip(planned, results):
+        if result.final_url and result.status_code and result.status_code < 400:
+            record_redirect_alias(cache, result.final_url)
+
+    stats['fetched'] = len(caches) - stats['deferred'] - stats['disallowed']
+
+    if changed:
+        with transaction.atomic():
+            for update_fields, rows in changed.items():
+                CachedURL.objects.bulk_update(rows, update_fields, batch_size=500)
+            # 分類元のテキストが変わった URL は共有している分類結果・埋め込みを捨てる
+            invalidate_classification(text_changed)
+
+    return stats
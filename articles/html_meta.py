@@ -0,0 +1,258 @@
+"""
+HTML の <head> だけを読むストリーミング型メタデータ抽出
+
+必要な項目（og:title / description / og:image / site_name など）はすべて <head> 内にあるため、
+本文全体をダウンロードして BeautifulSoup の木を作る必要はない。
+- レスポンスをチャンク単位で読み、</head> か <body> に到達した時点、またはバイト上限で打ち切る
+- meta タグは1パスで収集し、優先順位は従来の BeautifulSoup 版と同じ
+"""
+import codecs
+import re
+import warnings
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+DEFAULT_HEAD_MAX_BYTES = 512 * 1024
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_\-]+)', re.IGNORECASE)
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([a-zA-Z0-9_\-]+)', re.IGNORECASE)
+_HEAD_END_RE = re.compile(rb'</head\s*>|<body[\s>]', re.IGNORECASE)
+_SNIFF_BYTES = 4096
+
+
+class _HeadMetaParser(HTMLParser):
+    """
+    <head> 内の meta / title を1パスで集めるパーサー
+    meta は (属性名, 属性値) をキーに最初の1件の content を保持する
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title_parts = None
+        self.done = False
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'body':
+            self.done = True
+            return
+        if tag == 'meta':
+            attr_map = dict(attrs)
+            content = attr_map.get('content')
+            for key in ('property', 'name'):
+                value = attr_map.get(key)
+                if value is not None:
+                    self.meta.setdefault((key, value), content)
+        elif tag == 'title' and self.title_parts is None:
+            self.title_parts = []
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        elif tag == 'head':
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+
+    def lookup(self, key, value):
+        """(存在したか, content) を返す"""
+        marker = (key, value)
+        return marker in self.meta, self.meta.get(marker)
+
+
+def _sniff_encoding(head_bytes, content_type=None):
+    """
+    文字コードを推定する（BOM → <meta charset> → Content-Type → utf-8）
+    """
+    if head_bytes.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head_bytes.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+
+    candidates = []
+    match = _META_CHARSET_RE.search(head_bytes[:_SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1).decode('ascii', 'ignore'))
+    if content_type:
+        header_match = _HEADER_CHARSET_RE.search(content_type)
+        if header_match:
+            candidates.append(header_match.group(1))
+
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+def _build_metadata(parser, url):
+    """収集結果から従来と同じ優先順位で各項目を決定する"""
+    # タイトル: og:title > <title>
+    found, title = parser.lookup('property', 'og:title')
+    if not found:
+        title = ''.join(parser.title_parts) if parser.title_parts is not None else None
+
+    # 概要: og:description > meta description
+    found, description = parser.lookup('property', 'og:description')
+    if not found:
+        _found, description = parser.lookup('name', 'description')
+
+    # 画像: og:image
+    _found, image_url = parser.lookup('property', 'og:image')
+
+    # サイト名: og:site_name > application-name > twitter:site
+    found, site_name = parser.lookup('property', 'og:site_name')
+    if not found:
+        found, site_name = parser.lookup('name', 'application-name')
+        if not found:
+            found, twitter_site = parser.lookup('name', 'twitter:site')
+            if found:
+                site_name = (twitter_site or '').lstrip('@')
+
+    # サイト名のフォールバック（ドメインから）
+    if not site_name:
+        parsed = urlparse(url)
+        site_name = parsed.netloc.replace('www.', '') or None
+
+    return {
+        'title': title,
+        'description': description,
+        'image_url': image_url,
+        'site_name': site_name,
+    }
+
+
+def extract_head_metadata(chunks, url, content_type=None, max_bytes=None):
+    """
+    バイト列チャンクのイテラブルから <head> のメタデータを抽出する
+    </head> / <body> に達するか max_bytes を読んだ時点で残りのチャンクは読まない
+    戻り値: {'title', 'description', 'image_url', 'site_name'}
+    """
+    max_bytes = max_bytes or DEFAULT_HEAD_MAX_BYTES
+    parser = _HeadMetaParser()
+    decoder = None
+    pending = b''
+    total = 0
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        remaining = max_bytes - total
+        if remaining <= 0:
+            break
+        chunk = chunk[:remaining]
+        total += len(chunk)
+
+        if decoder is None:
+            # 文字コード判定のため先頭を少し溜めてから解析を始める
+            pending += chunk
+            if len(pending) < _SNIFF_BYTES and total < max_bytes and not _HEAD_END_RE.search(pending):
+                continue
+            decoder = codecs.getincrementaldecoder(_sniff_encoding(pending, content_type))(errors='replace')
+            chunk, pending = pending, b''
+
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            break
+
+    if not parser.done:
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(_sniff_encoding(pending, content_type))(errors='replace')
+            parser.feed(decoder.decode(pending))
+        parser.feed(decoder.decode(b'', final=True))
+
+    return _build_metadata(parser, url)
+
+
+def extract_head_metadata_from_bytes(content, url, content_type=None, max_bytes=None):
+    """取得済みのバイト列から抽出する（チャンク分割して extract_head_metadata に渡す）"""
+    content = content or b''
+    chunks = (content[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(content), STREAM_CHUNK_SIZE))
+    return extract_head_metadata(chunks, url, content_type=content_type, max_bytes=max_bytes)
+
+
+def read_head_bytes(chunks, max_bytes=None):
+    """
+    チャンクを </head> / <body> か max_bytes に達するまで読み、先頭部分のバイト列を返す
+    （ダウンロード段階と解析段階を分けたい一括取得エンジン向け）
+    """
+    max_bytes = max_bytes or DEFAULT_HEAD_MAX_BYTES
+    buffer = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # 境界をまたいだ </head> も検出できるよう直前の数バイトから検索する
+        search_from = max(0, len(buffer) - 8)
+        buffer.extend(chunk[:max_bytes - len(buffer)])
+        if _HEAD_END_RE.search(buffer, search_from) or len(buffer) >= max_bytes:
+            break
+    return bytes(buffer)
+
+
+def extract_metadata_soup(content, url):
+    """
+    旧実装: 本文全体を BeautifulSoup で解析して抽出する
+    ベンチマークと結果比較のために残している
+    """
+    from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # タイトル取得
+    title = None
+    og_title = soup.find('meta', property='og:title')
+    if og_title:
+        title = og_title.get('content')
+    else:
+        title_tag = soup.find('title')
+        if title_tag:
+            title = title_tag.get_text()
+
+    # 概要取得
+    description = None
+    og_desc = soup.find('meta', property='og:description')
+    if og_desc:
+        description = og_desc.get('content')
+    else:
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc:
+            description = meta_desc.get('content')
+
+    # 画像取得
+    image_url = None
+    og_image = soup.find('meta', property='og:image')
+    if og_image:
+        image_url = og_image.get('content')
+
+    # サイト名取得
+    site_name = None
+    og_site_name = soup.find('meta', property='og:site_name')
+    if og_site_name:
+        site_name = og_site_name.get('content')
+    else:
+        app_name = soup.find('meta', attrs={'name': 'application-name'})
+        if app_name:
+            site_name = app_name.get('content')
+        else:
+            twitter_site = soup.find('meta', attrs={'name': 'twitter:site'})
+            if twitter_site:
+                site_name = twitter_site.get('content', '').lstrip('@')
+
+    if not site_name:
+        parsed = urlparse(url)
+        site_name = parsed.netloc.replace('www.', '') or None
+
+    return {
+        'title': title,
+        'description': description,
+        'image_url': image_url,
+        'site_name': site_name,
+    }
@@ -0,0 +1,73 @@
+"""
+スクレイピング・RSS取得用の HTTP キャッシュ層（条件付きリクエスト）
+
+CachedURL / FeedSource に保存した ETag / Last-Modified を使って再取得時に
+If-None-Match / If-Modified-Since を送る。
+304 Not Modified が返れば本文のダウンロード・解析を行わず最終取得日時だけ更新する。
+RSS はバリデータを返さないサーバーも多いため、本文のハッシュでも変化なしを判定する。
+"""
+import hashlib
+
+ETAG_MAX_LENGTH = 500
+LAST_MODIFIED_MAX_LENGTH = 100
+
+
+def has_validators(cache):
+    """ETag / Last-Modified のどちらかを保存しているか"""
+    return bool(cache.etag or cache.last_modified)
+
+
+def conditional_headers(cache):
+    """
+    再検証用のリクエストヘッダーを返す
+    直近の取得が成功していて、バリデータを持っている場合のみ付与する
+    """
+    if cache.fetch_status != 'success' or not cache.title or not has_validators(cache):
+        return {}
+    return validator_headers(cache.etag, cache.last_modified)
+
+
+def validator_headers(etag, last_modified):
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def feed_conditional_headers(source):
+    """
+    RSS 再取得用のリクエストヘッダー（FeedSource）
+    前回の同期を最後まで終えている（content_hash がある）場合のみ付与する
+    """
+    if not source.content_hash:
+        return {}
+    return validator_headers(source.etag, source.last_modified)
+
+
+def content_digest(content):
+    """フィード本文のハッシュ（SHA-256 の16進文字列）"""
+    return hashlib.sha256(content or b'').hexdigest()
+
+
+def response_validators(headers):
+    """
+    レスポンスヘッダーから保存用のバリデータを取り出す
+    戻り値: {'etag', 'last_modified'}（ヘッダーがなければ None）
+    """
+    etag = (headers.get('ETag') or '').strip() or None
+    last_modified = (headers.get('Last-Modified') or '').strip() or None
+
+    # 上限を超える値は切り詰めると一致判定できなくなるので保存しない
+    if etag and len(etag) > ETAG_MAX_LENGTH:
+        etag = None
+    if last_modified and len(last_modified) > LAST_MODIFIED_MAX_LENGTH:
+        last_modified = None
+
+    return {'etag': etag, 'last_modified': last_modified}
+
+
+def is_not_modified(status_code, request_headers):
+    """条件付きリクエストに対する 304 応答か"""
+    return status_code == 304 and bool(request_headers)
@@ -0,0 +1,155 @@
+"""
+プロセス単位で共有する HTTP セッション（keep-alive コネクションプール）
+
+fetch_article_metadata / RSS 取得で毎回 requests.get を呼ぶと URL ごとに TCP+TLS 接続を張り直すため、
+用途（'scraper' / 'feed'）ごとに requests.Session をプロセス内で使い回す。
+- ホストごとのプールサイズ上限とリトライ/バックオフは settings で調整
+- Celery prefork の fork 後は PID が変わるのでセッションを作り直す
+- プールのヒット（接続再利用）/ミス（新規接続）をカウントして pool_stats() で参照できる
+"""
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+_sessions = {}
+_sessions_pid = None
+_sessions_lock = threading.Lock()
+
+
+class PoolCounters:
+    """コネクションプールの利用回数（checkouts）と新規接続数（misses）"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.misses = 0
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            checkouts, misses = self.checkouts, self.misses
+        hits = max(0, checkouts - misses)
+        return {
+            'requests': checkouts,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': (hits / checkouts) if checkouts else 0.0,
+        }
+
+
+def _counting_pool_class(base, counters):
+    class CountingPool(base):
+        def _get_conn(self, timeout=None):
+            counters.record_checkout()
+            return super()._get_conn(timeout=timeout)
+
+        def _new_conn(self):
+            counters.record_miss()
+            return super()._new_conn()
+
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """接続の再利用状況を数える HTTPAdapter"""
+    def __init__(self, counters, **kwargs):
+        self.counters = counters
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self.counters),
+            'https': _counting_pool_class(HTTPSConnectionPool, self.counters),
+        }
+
+
+def _build_retry(purpose):
+    """
+    共有セッションのリトライ設定
+    - 503 / 429 はリトライしない（呼び出し側が Retry-After を見て延期する。即時リトライはレート制限を迂回する）
+    - scraper は接続エラーをリトライしない（落ちたホストで接続タイムアウトを重ねず、サーキットブレーカーに任せる）
+    """
+    status_forcelist = getattr(settings, 'HTTP_RETRY_STATUS_FORCELIST', (502, 504))
+    total = int(getattr(settings, 'HTTP_RETRY_TOTAL', 2))
+    return Retry(
+        total=total,
+        connect=0 if purpose == 'scraper' else total,
+        read=0,
+        backoff_factor=float(getattr(settings, 'HTTP_RETRY_BACKOFF', 0.5)),
+        status_forcelist=tuple(status_forcelist),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        # 最終的なステータスコードは呼び出し側で判定する（404 判定などのため）
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+
+
+def _build_session(purpose):
+    counters = PoolCounters()
+    adapter = PooledHTTPAdapter(
+        counters,
+        pool_connections=int(getattr(settings, 'HTTP_POOL_CONNECTIONS', 50)),
+        pool_maxsize=int(getattr(settings, 'HTTP_POOL_MAXSIZE', 8)),
+        max_retries=_build_retry(purpose),
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.pool_counters = counters
+    return session
+
+
+def get_session(purpose='scraper'):
+    """用途ごとの共有セッションを取得（プロセスごとに1つ）"""
+    global _sessions_pid
+    pid = os.getpid()
+    session = _sessions.get(purpose) if _sessions_pid == pid else None
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        if _sessions_pid != pid:
+            # fork 後の子プロセスでは親のソケットを使わない
+            _sessions.clear()
+            _sessions_pid = pid
+        session = _sessions.get(purpose)
+        if session is None:
+            session = _build_session(purpose)
+            _sessions[purpose] = session
+    return session
+
+
+def http_get(url, purpose='scraper', **kwargs):
+    """共有セッション経由の GET"""
+    return get_session(purpose).get(url, **kwargs)
+
+
+def pool_stats():
+    """用途ごとのプール統計 {'scraper': {'requests', 'hits', 'misses', 'hit_rate'}, ...}"""
+    if _sessions_pid != os.getpid():
+        return {}
+    return {purpose: session.pool_counters.snapshot() for purpose, session in list(_sessions.items())}
+
+
+def reset_sessions():
+    """セッションを破棄する（設定変更時・テスト用）"""
+    global _sessions_pid
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _sessions_pid = None
@@ -0,0 +1,322 @@
+"""
+埋め込みの推論サーバー（全ワーカーで1つのモデルを共有する）
+
+prefork の Celery ワーカーはプロセスごとに SentenceTransformer / OpenVINO IR モデルを読み込むため、
+メモリを数百MBずつ消費し、推論も1リクエストずつになる。
+run_inference_server コマンドでこのサーバーを1つ起動し、ワーカーは
+AI_TRANSFORMERS_BACKEND=inference_server で InferenceClient 経由で埋め込みを求める。
+
+- 待ち受け: localhost の HTTP（http://127.0.0.1:8765）または Unix ソケット（unix:///path/to.sock）
+- POST /encode {"texts": [...]} → {"dim", "count", "embeddings": float32 のバイト列を base64, "fingerprint"}
+- GET /health → {"status", "backend", "fingerprint", "stats"}
+- マイクロバッチ: 同時に届いたリクエストを INFERENCE_SERVER_MAX_WAIT_MS の間まとめ、
+  最大 INFERENCE_SERVER_MAX_BATCH 件のテキストを1回の model.encode で推論する
+"""
+import base64
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+DEFAULT_INFERENCE_SERVER_URL = 'http://127.0.0.1:8765'
+MAX_REQUEST_BYTES = 8 * 1024 * 1024
+
+
+class InferenceServerError(RuntimeError):
+    """推論サーバーに接続できない・エラーを返した"""
+
+
+class _Request:
+    __slots__ = ('texts', 'future')
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    同時に届いた encode リクエストを短い時間窓でまとめて1回の推論にする
+    encode: テキストのリスト → [件数, dim] の配列 を返す関数（1スレッドからのみ呼ばれる）
+    """
+    def __init__(self, encode, max_batch=64, max_wait=0.01):
+        self.encode = encode
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        """テキストのリストを推論待ちに入れる（戻り値: 結果の配列を返す Future）"""
+        request = _Request(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'texts': self.texts,
+            'mean_batch_size': (self.texts / self.batches) if self.batches else 0.0,
+        }
+
+    def _collect(self, first):
+        """最初のリクエストから max_wait 秒（または max_batch 件）までのリクエストを集める"""
+        batch = [first]
+        count = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        stop = False
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                stop = True
+                break
+            batch.append(request)
+            count += len(request.texts)
+        return batch, stop
+
+    def _run(self):
+        import numpy as np
+
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            texts = [text for request in batch for text in request.texts]
+            try:
+                embeddings = np.asarray(self.encode(texts), dtype=np.float32) if texts else np.empty((0, 0), dtype=np.float32)
+                if embeddings.ndim == 1:
+                    embeddings = embeddings[None, :]
+            except Exception as exc:
+                for request in batch:
+                    request.future.set_exception(exc)
+            else:
+                offset = 0
+                for request in batch:
+                    request.future.set_result(embeddings[offset:offset + len(request.texts)])
+                    offset += len(request.texts)
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += len(texts)
+            if stop:
+                return
+
+
+def encode_payload(embeddings):
+    """[件数, dim] の配列をレスポンス用の dict にする（float32 のバイト列を base64）"""
+    import numpy as np
+
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    count, dim = embeddings.shape if embeddings.ndim == 2 else (0, 0)
+    return {
+        'count': count,
+        'dim': dim,
+        'embeddings': base64.b64encode(embeddings.tobytes()).decode('ascii'),
+    }
+
+
+def decode_payload(payload):
+    """encode_payload の逆（float32 の [件数, dim] 配列）"""
+    import numpy as np
+
+    data = base64.b64decode(payload['embeddings'])
+    return np.frombuffer(data, dtype=np.float32).reshape(int(payload['count']), int(payload['dim']))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'NewsrereadInference/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status_code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'not found'})
+            return
+        self._send_json(200, {
+            'status': 'ok',
+            'backend': self.server.backend,
+            'fingerprint': self.server.fingerprint,
+            'stats': self.server.batcher.stats(),
+        })
+
+    def do_POST(self):
+        if self.path != '/encode':
+            self._send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_REQUEST_BYTES:
+            self._send_json(413 if length else 400, {'error': 'invalid body size'})
+            return
+        try:
+            body = json.loads(self.rfile.read(length))
+            if not isinstance(body, dict):
+                raise ValueError('body must be a JSON object')
+            texts = body.get('texts')
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError('texts must be a list of strings')
+        except ValueError as exc:
+            self._send_json(400, {'error': str(exc)})
+            return
+        try:
+            embeddings = self.server.batcher.submit(texts).result(timeout=self.server.request_timeout)
+        except Exception as exc:
+            self._send_json(500, {'error': str(exc)})
+            return
+        payload = encode_payload(embeddings)
+        payload['fingerprint'] = self.server.fingerprint
+        self._send_json(200, payload)
+
+    def address_string(self):
+        # Unix ソケットでは client_address が空文字列になる
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _parse_url(url):
+    """'unix:///path.sock' → ('unix', path) / 'http://host:port' → ('http', (host, port))"""
+    parts = urlsplit(url or DEFAULT_INFERENCE_SERVER_URL)
+    if parts.scheme == 'unix':
+        return 'unix', parts.path
+    if parts.scheme == 'http':
+        return 'http', (parts.hostname or '127.0.0.1', parts.port or 80)
+    raise ValueError(f'推論サーバーのURLは http:// か unix:// で指定してください: {url}')
+
+
+def create_server(url, batcher, backend, fingerprint, request_timeout=60):
+    """推論サーバーを作る（serve_forever は呼び出し元で行う）"""
+    scheme, address = _parse_url(url)
+    if scheme == 'unix':
+        if os.path.exists(address):
+            os.unlink(address)
+        server = _UnixHTTPServer(address, _Handler)
+    else:
+        server = ThreadingHTTPServer(address, _Handler)
+        server.daemon_threads = True
+    server.batcher = batcher
+    server.backend = backend
+    server.fingerprint = fingerprint
+    server.request_timeout = request_timeout
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._socket_path)
+        self.sock = sock
+
+
+class InferenceClient:
+    """
+    推論サーバーのクライアント（SentenceTransformer / OpenVINOIREmbedder と同じ encode を持つ）
+    fingerprint はサーバーが読み込んだモデルのもの（埋め込みストアのキーに使う）
+    エラーになったら failed を立てる（get_inference_client が /health を読み直して作り直す）
+    /encode の応答の fingerprint が初期化時と違えば（サーバーが別のモデルで再起動した）エラーにする
+    """
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self.failed = False
+        self._scheme, self._address = _parse_url(url)
+        health = self.health()
+        self.backend = health.get('backend')
+        self.fingerprint = health.get('fingerprint')
+
+    def _connection(self):
+        if self._scheme == 'unix':
+            return _UnixHTTPConnection(self._address, timeout=self.timeout)
+        host, port = self._address
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _request(self, method, path, body=None):
+        connection = self._connection()
+        try:
+            data = json.dumps(body).encode('utf-8') if body is not None else None
+            headers = {'Content-Type': 'application/json'} if data is not None else {}
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+            payload = json.loads(response.read() or b'{}')
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            self.failed = True
+            raise InferenceServerError(f'{self.url}: {exc}') from exc
+        finally:
+            connection.close()
+        if response.status != 200:
+            self.failed = True
+            raise InferenceServerError(f"{self.url}: {response.status} {payload.get('error', '')}")
+        return payload
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def encode(self, texts, convert_to_tensor=False):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        payload = self._request('POST', '/encode', {'texts': list(texts)})
+        if payload.get('fingerprint') != self.fingerprint:
+            self.failed = True
+            raise InferenceServerError(f"{self.url}: model changed ({self.fingerprint} -> {payload.get('fingerprint')})")
+        embeddings = decode_payload(payload)
+
+        if convert_to_tensor:
+            try:
+                import torch
+                tensor = torch.from_numpy(embeddings.copy())
+                return tensor[0] if single else tensor
+            except Exception:
+                pass
+
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from articles.html_meta import extract_head_metadata_from_bytes, extract_metadata_soup
+
+
+def _build_sample_page(body_kb):
+    head = (
+        '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
+        '<title>ベンチマーク用ページ</title>'
+        '<meta property="og:title" content="ベンチマーク用 OG タイトル">'
+        '<meta property="og:description" content="ヘッダーだけで完結するメタデータ">'
+        '<meta property="og:image" content="https://example.com/og.png">'
+        '<meta property="og:site_name" content="Example News">'
+        + '<link rel="stylesheet" href="/s.css">' * 20
+        + '</head>'
+    )
+    paragraph = '<div class="c"><p>本文のダミーテキストです。<a href="/x">link</a></p></div>'
+    repeat = max(1, (body_kb * 1024) // len(paragraph.encode('utf-8')))
+    return (head + '<body>' + paragraph * repeat + '</body></html>').encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'メタデータ抽出のベンチマーク（head-only ストリーミング版 vs 旧 BeautifulSoup 版）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--body-kb', type=int, default=2048, help='ダミー本文のサイズ（KB）')
+        parser.add_argument('--repeat', type=int, default=5, help='各実装の実行回数')
+
+    def handle(self, *args, **options):
+        content = _build_sample_page(options['body_kb'])
+        url = 'https://www.example.com/article'
+        repeat = max(1, options['repeat'])
+
+        results = {}
+        for label, func in (
+            ('head_stream', extract_head_metadata_from_bytes),
+            ('soup_full', extract_metadata_soup),
+        ):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                metadata = func(content, url)
+            elapsed = (time.perf_counter() - started) / repeat
+            results[label] = (elapsed, metadata)
+            self.stdout.write(f"{label:12s}: {elapsed * 1000:9.2f} ms/page")
+
+        if results['head_stream'][1] != results['soup_full'][1]:
+            self.stderr.write('結果が一致しません')
+            self.stderr.write(f"  head_stream: {results['head_stream'][1]}")
+            self.stderr.write(f"  soup_full  : {results['soup_full'][1]}")
+            return
+
+        speedup = results['soup_full'][0] / max(results['head_stream'][0], 1e-9)
+        self.stdout.write(
+            f"page={len(content) / 1024:.0f}KB  speedup={speedup:.1f}x  (結果一致)"
+        )
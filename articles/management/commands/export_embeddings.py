@@ -0,0 +1,34 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from articles.embedding_store import export_snapshot
+from articles.models import TextEmbedding
+
+
+class Command(BaseCommand):
+    help = '保存済みの埋め込みをモデルごとのスナップショット（float16 のメモリマップ用 .npy + manifest.json）に書き出す'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='書き出し先（デフォルト: EMBEDDING_SNAPSHOT_DIR）')
+        parser.add_argument('--fingerprint', default=None, help='このモデルのフィンガープリントだけを書き出す')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='1回に読む行数')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'EMBEDDING_SNAPSHOT_DIR', 'embeddings')
+        fingerprints = (
+            [options['fingerprint']] if options['fingerprint']
+            else list(TextEmbedding.objects.values_list('model_fingerprint', flat=True).distinct())
+        )
+        if not fingerprints:
+            self.stdout.write('保存済みの埋め込みはありません')
+            return
+
+        # モデルごとに <dir>/<フィンガープリント>/ に書き出す（open_snapshot でそのディレクトリを開く）
+        for fingerprint in fingerprints:
+            target = os.path.join(directory, fingerprint)
+            manifest = export_snapshot(target, fingerprint, chunk_size=max(1, options['chunk_size']))
+            self.stdout.write(self.style.SUCCESS(
+                f"{target}: {manifest['count']} 件 (dim={manifest['dim']}, {manifest['dtype']})"
+            ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from articles.models import CachedURL
+from articles.textnorm import normalize_description
+
+
+class Command(BaseCommand):
+    help = '保存済みの CachedURL.description を取り込み時と同じ正規化（HTML除去・空白の圧縮・長さの上限）で書き直す'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='1回に読み書きする行数')
+        parser.add_argument('--dry-run', action='store_true', help='書き込まずに件数だけ数える')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        dry_run = options['dry_run']
+
+        # ID順にチャンク単位で読み、変化した行だけ bulk_update する（テーブル全体をメモリに載せない）
+        last_id = 0
+        scanned = 0
+        changed = 0
+        while True:
+            rows = list(
+                CachedURL.objects.filter(id__gt=last_id, description__isnull=False)
+                .order_by('id')
+                .values_list('id', 'description')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            scanned += len(rows)
+
+            updates = []
+            for cache_id, description in rows:
+                normalized = normalize_description(description)
+                if normalized != description:
+                    updates.append(CachedURL(id=cache_id, description=normalized))
+            changed += len(updates)
+            if updates and not dry_run:
+                with transaction.atomic():
+                    CachedURL.objects.bulk_update(updates, ['description'], batch_size=500)
+
+            self.stdout.write(f"scanned={scanned} changed={changed} (last_id={last_id})")
+
+        label = '変更対象' if dry_run else '更新'
+        self.stdout.write(self.style.SUCCESS(f"{label}: {changed}/{scanned} 件"))
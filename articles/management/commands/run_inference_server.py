@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from articles.inference_server import DEFAULT_INFERENCE_SERVER_URL, MicroBatcher, create_server
+from articles.tasks import embedding_model_fingerprint, load_local_embedding_model
+
+
+class Command(BaseCommand):
+    help = '埋め込みの推論サーバーを起動する（モデルを1つだけ読み込み、同時に届いたリクエストをまとめて推論する）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None, help='待ち受け先 http://127.0.0.1:8765 / unix:///path.sock（デフォルト: INFERENCE_SERVER_URL）')
+        parser.add_argument('--backend', default=None, help='読み込むモデル auto / sentence_transformers / openvino_ir（デフォルト: INFERENCE_SERVER_BACKEND）')
+        parser.add_argument('--max-batch', type=int, default=None, help='1回の推論にまとめる最大テキスト数')
+        parser.add_argument('--max-wait-ms', type=float, default=None, help='リクエストをまとめるために待つ最大時間（ミリ秒）')
+
+    def handle(self, *args, **options):
+        url = options['url'] or getattr(settings, 'INFERENCE_SERVER_URL', '') or DEFAULT_INFERENCE_SERVER_URL
+        backend = options['backend'] or getattr(settings, 'INFERENCE_SERVER_BACKEND', 'auto')
+        if backend == 'inference_server':
+            raise CommandError('推論サーバー自身のバックエンドに inference_server は指定できません')
+        max_batch = options['max_batch'] or getattr(settings, 'INFERENCE_SERVER_MAX_BATCH', 64)
+        max_wait_ms = options['max_wait_ms']
+        if max_wait_ms is None:
+            max_wait_ms = getattr(settings, 'INFERENCE_SERVER_MAX_WAIT_MS', 10)
+
+        model, resolved = load_local_embedding_model(backend)
+        if model is None:
+            raise CommandError(f'埋め込みモデルを読み込めません（backend={backend}）')
+
+        batcher = MicroBatcher(model.encode, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+        server = create_server(url, batcher, backend=resolved, fingerprint=embedding_model_fingerprint(resolved))
+        self.stdout.write(self.style.SUCCESS(
+            f"Inference server ({resolved}) listening on {url} (max_batch={max_batch}, max_wait={max_wait_ms}ms)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            batcher.close()
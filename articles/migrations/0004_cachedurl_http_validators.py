@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_cachedurl_failure_count_cachedurl_fetch_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedurl',
+            name='etag',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='cachedurl',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0004_cachedurl_http_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, unique=True)),
+                ('state', models.CharField(choices=[('closed', '正常'), ('open', '遮断中'), ('half_open', '試行中')], default='closed', max_length=10)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('trip_count', models.PositiveIntegerField(default=0)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+                ('opened_at', models.DateTimeField(blank=True, null=True)),
+                ('next_probe_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
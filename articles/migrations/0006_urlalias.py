@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0005_hosthealth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='URLAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias_url', models.URLField(max_length=2000, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cached_url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='articles.cachedurl')),
+            ],
+        ),
+    ]
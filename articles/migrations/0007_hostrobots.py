@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0006_urlalias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostRobots',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('ok', '取得済み'), ('missing', 'なし'), ('error', '取得失敗')], default='ok', max_length=10)),
+                ('body', models.TextField(blank=True, default='')),
+                ('crawl_delay', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='cachedurl',
+            name='fetch_status',
+            field=models.CharField(choices=[('pending', '未取得'), ('success', '取得成功'), ('failed', '取得失敗'), ('not_found', '404/410'), ('disallowed', 'robots.txtで拒否')], default='pending', max_length=20),
+        ),
+    ]
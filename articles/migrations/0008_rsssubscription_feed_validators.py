@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0007_hostrobots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rsssubscription',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='rsssubscription',
+            name='etag',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='rsssubscription',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='rsssubscription',
+            name='skipped_sync_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def attach_feed_sources(apps, schema_editor):
+    """既存の購読をフィードURLごとの FeedSource に紐づけ、バリデータを移す"""
+    FeedSource = apps.get_model('articles', 'FeedSource')
+    RSSSubscription = apps.get_model('articles', 'RSSSubscription')
+
+    sources = {}
+    for subscription in RSSSubscription.objects.order_by('-last_fetched_at', 'id'):
+        url = subscription.feed_url.strip()
+        source = sources.get(url)
+        if source is None:
+            source = FeedSource.objects.create(
+                url=url,
+                etag=subscription.etag,
+                last_modified=subscription.last_modified,
+                content_hash=subscription.content_hash,
+                last_fetched_at=subscription.last_fetched_at,
+            )
+            sources[url] = source
+        subscription.source = source
+        subscription.save(update_fields=['source'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0008_rsssubscription_feed_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=500, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=100, null=True)),
+                ('content_hash', models.CharField(blank=True, max_length=64, null=True)),
+                ('last_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rsssubscription',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subscriptions', to='articles.feedsource'),
+        ),
+        migrations.RunPython(attach_feed_sources, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='rsssubscription',
+            name='etag',
+        ),
+        migrations.RemoveField(
+            model_name='rsssubscription',
+            name='last_modified',
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0009_feedsource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedsource',
+            name='guid_digests',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='feedsource',
+            name='last_new_entry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedsource',
+            name='next_poll_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedsource',
+            name='poll_interval_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedsource',
+            name='publish_rate_per_hour',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
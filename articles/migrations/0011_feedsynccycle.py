@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0010_feedsource_adaptive_polling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedSyncCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigger', models.CharField(choices=[('all', '全件'), ('due', '取得時刻到来分')], default='all', max_length=10)),
+                ('started_at', models.DateTimeField(db_index=True)),
+                ('finished_at', models.DateTimeField()),
+                ('wall_time_seconds', models.FloatField(default=0.0)),
+                ('feeds_total', models.PositiveIntegerField(default=0)),
+                ('feeds_fetched', models.PositiveIntegerField(default=0)),
+                ('feeds_skipped', models.PositiveIntegerField(default=0)),
+                ('feeds_deferred', models.PositiveIntegerField(default=0)),
+                ('feeds_failed', models.PositiveIntegerField(default=0)),
+                ('entries_added', models.PositiveIntegerField(default=0)),
+                ('entries_removed', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
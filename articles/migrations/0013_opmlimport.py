@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0012_article_last_seen_in_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedsynccycle',
+            name='trigger',
+            field=models.CharField(choices=[('all', '全件'), ('due', '取得時刻到来分'), ('import', 'OPMLインポート')], default='all', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='OPMLImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '検証中'), ('completed', '完了'), ('failed', '失敗')], default='pending', max_length=10)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('existing_count', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('succeeded', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('subscription_ids', models.JSONField(blank=True, default=list)),
+                ('results', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opml_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0013_opmlimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_fingerprint', models.CharField(max_length=64)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('dim', models.PositiveIntegerField()),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cached_url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='articles.cachedurl')),
+            ],
+            options={
+                'unique_together': {('cached_url', 'model_fingerprint')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0014_textembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('category', models.CharField(max_length=50)),
+                ('category_score', models.FloatField()),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cached_url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classification_results', to='articles.cachedurl')),
+            ],
+            options={
+                'unique_together': {('cached_url', 'fingerprint')},
+            },
+        ),
+    ]
@@ -13,6 +13,7 @@ class CachedURL(models.Model):
         ('success', '取得成功'),
         ('failed', '取得失敗'),
         ('not_found', '404/410'),
+        ('disallowed', 'robots.txtで拒否'),
     ]
 
     url = models.URLField(max_length=2000, unique=True, db_index=True)
@@ -26,6 +27,9 @@ class CachedURL(models.Model):
     last_failure_at = models.DateTimeField(blank=True, null=True)
     next_retry_at = models.DateTimeField(blank=True, null=True)
     last_http_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    # 条件付きGET（If-None-Match / If-Modified-Since）用のバリデータ
+    etag = models.CharField(max_length=500, blank=True, null=True)
+    last_modified = models.CharField(max_length=100, blank=True, null=True)
 
     def __str__(self):
         return self.url
@@ -37,6 +41,109 @@ class CachedURL(models.Model):
         return timezone.now() - self.last_scraped_at > timedelta(days=days)
 # ★ここまで追加
 
+
+class URLAlias(models.Model):
+    """
+    入力URL・リダイレクト先URL → 正規化済み CachedURL の対応表
+    utm_* 付きのURLや短縮URLの転送先などを同じ CachedURL に寄せるために使う
+    """
+    alias_url = models.URLField(max_length=2000, unique=True)
+    cached_url = models.ForeignKey(CachedURL, on_delete=models.CASCADE, related_name='aliases')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.alias_url} -> {self.cached_url_id}"
+
+
+class HostHealth(models.Model):
+    """
+    ホスト（ドメイン）単位の取得状況（サーキットブレーカー）
+    連続失敗が閾値を超えたホストは open にして、そのホストのURLはネットワークに出さずスキップする
+    """
+    STATE_CHOICES = [
+        ('closed', '正常'),
+        ('open', '遮断中'),
+        ('half_open', '試行中'),
+    ]
+
+    host = models.CharField(max_length=255, unique=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='closed')
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    trip_count = models.PositiveIntegerField(default=0)  # 連続で open になった回数（クールダウン延長用）
+    last_success_at = models.DateTimeField(blank=True, null=True)
+    last_failure_at = models.DateTimeField(blank=True, null=True)
+    opened_at = models.DateTimeField(blank=True, null=True)
+    next_probe_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.host} ({self.state})"
+
+
+class HostRobots(models.Model):
+    """
+    ホスト単位の robots.txt キャッシュ
+    missing（4xx）は制限なし、error（5xx・接続エラー）は短い期限で制限なしとして扱う
+    """
+    STATUS_CHOICES = [
+        ('ok', '取得済み'),
+        ('missing', 'なし'),
+        ('error', '取得失敗'),
+    ]
+
+    host = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ok')
+    body = models.TextField(blank=True, default='')
+    crawl_delay = models.FloatField(blank=True, null=True)
+    fetched_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.host} ({self.status})"
+
+
+class TextEmbedding(models.Model):
+    """
+    CachedURL の分類用テキスト（タイトル + 概要）の埋め込みキャッシュ
+    モデルごとに1行。テキストが変わったかは text_hash で判定する
+    vector は float16 のバイト列（numpy.frombuffer でコピーせずに読める）
+    """
+    cached_url = models.ForeignKey(CachedURL, on_delete=models.CASCADE, related_name='embeddings')
+    model_fingerprint = models.CharField(max_length=64)
+    text_hash = models.CharField(max_length=64)
+    dim = models.PositiveIntegerField()
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('cached_url', 'model_fingerprint')
+
+    def __str__(self):
+        return f"{self.cached_url_id} ({self.model_fingerprint[:12]}, dim={self.dim})"
+
+
+class ClassificationResult(models.Model):
+    """
+    CachedURL 単位の分類結果（カテゴリ・推奨タグ）のキャッシュ
+    分類はタイトル・概要だけで決まるので、同じURLを保存した別ユーザーの記事には推論せずに写す
+    分類設定（エンジン・モデル・カテゴリ候補）ごとに1行。テキストが変わったかは text_hash で判定し、
+    メタデータの再取得でテキストが変わったときは削除する
+    """
+    cached_url = models.ForeignKey(CachedURL, on_delete=models.CASCADE, related_name='classification_results')
+    fingerprint = models.CharField(max_length=64)
+    text_hash = models.CharField(max_length=64)
+    category = models.CharField(max_length=50)
+    category_score = models.FloatField()
+    tags = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('cached_url', 'fingerprint')
+
+    def __str__(self):
+        return f"{self.cached_url_id} ({self.fingerprint[:12]}): {self.category}"
+
+
 class Tag(models.Model):
     """
     記事に紐づけるタグ
@@ -52,6 +159,59 @@ class Tag(models.Model):
         return self.name
 
 
+class FeedSource(models.Model):
+    """
+    フィードURL単位の取得状態（同じフィードを購読する全ユーザーで共有）
+    1回の同期でフィードは1度だけ取得・解析し、各購読者の記事に反映する
+    """
+    url = models.URLField(max_length=2000, unique=True)
+    # 条件付きGET用のバリデータと、最後に取得した本文のハッシュ
+    etag = models.CharField(max_length=500, blank=True, null=True)
+    last_modified = models.CharField(max_length=100, blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+    last_fetched_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # 適応的ポーリング: 新着GUIDの観測から更新頻度を推定し、次回取得時刻を決める
+    next_poll_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    poll_interval_seconds = models.FloatField(blank=True, null=True)
+    publish_rate_per_hour = models.FloatField(blank=True, null=True)  # 新着件数/時間の指数移動平均
+    last_new_entry_at = models.DateTimeField(blank=True, null=True)
+    guid_digests = models.JSONField(default=list, blank=True)  # 前回取得時のGUIDの短縮ハッシュ
+
+    def __str__(self):
+        return self.url
+
+
+class FeedSyncCycle(models.Model):
+    """
+    RSS 同期1サイクル分の集計（同期にかかる時間の推移を追うため）
+    フィード数はフィードURL単位、記事数は購読者ごとの Article 単位
+    """
+    TRIGGER_CHOICES = [
+        ('all', '全件'),
+        ('due', '取得時刻到来分'),
+        ('import', 'OPMLインポート'),
+    ]
+
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, default='all')
+    started_at = models.DateTimeField(db_index=True)
+    finished_at = models.DateTimeField()
+    wall_time_seconds = models.FloatField(default=0.0)
+    feeds_total = models.PositiveIntegerField(default=0)
+    feeds_fetched = models.PositiveIntegerField(default=0)  # 取得して取り込んだフィード
+    feeds_skipped = models.PositiveIntegerField(default=0)  # 304・本文が前回と同じ
+    feeds_deferred = models.PositiveIntegerField(default=0)  # ホストのペースを超えるため見送り
+    feeds_failed = models.PositiveIntegerField(default=0)
+    entries_added = models.PositiveIntegerField(default=0)
+    entries_removed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} {self.trigger} ({self.wall_time_seconds:.1f}s)"
+
+
 class RSSSubscription(models.Model):
     """
     ユーザーごとのRSS購読設定
@@ -59,9 +219,19 @@ class RSSSubscription(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rss_subscriptions')
     name = models.CharField(max_length=100)
     feed_url = models.URLField(max_length=2000)
+    source = models.ForeignKey(
+        FeedSource,
+        on_delete=models.SET_NULL,
+        related_name='subscriptions',
+        blank=True,
+        null=True
+    )
     is_active = models.BooleanField(default=True)
     last_fetched_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # この購読に最後に取り込んだフィード本文のハッシュ（FeedSource.content_hash と同じなら取り込み済み）
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+    skipped_sync_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('user', 'feed_url')
@@ -70,6 +240,36 @@ class RSSSubscription(models.Model):
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
+
+class OPMLImport(models.Model):
+    """
+    OPML インポート1回分の進捗（クライアントがポーリングして確認する）
+    購読の作成は同期的に行い、フィードの検証（初回同期）はバックグラウンドで並行実行する
+    """
+    STATUS_CHOICES = [
+        ('pending', '待機中'),
+        ('running', '検証中'),
+        ('completed', '完了'),
+        ('failed', '失敗'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='opml_imports')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(default=0)  # OPML 内のフィード数（重複を除く）
+    created_count = models.PositiveIntegerField(default=0)
+    existing_count = models.PositiveIntegerField(default=0)  # 購読済みだったもの
+    processed = models.PositiveIntegerField(default=0)  # 検証を終えた新規購読の数
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    subscription_ids = models.JSONField(default=list, blank=True)  # 今回作成した購読
+    results = models.JSONField(default=dict, blank=True)  # {購読ID: 'synced' / 'failed' / ...}
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"OPML import {self.id} ({self.user.username}, {self.status})"
+
 class Article(models.Model):
     """
     保存する記事のモデル (ユーザー固有の情報のみ)
@@ -112,6 +312,8 @@ class Article(models.Model):
     )
     is_from_rss = models.BooleanField(default=False)
     rss_guid = models.CharField(max_length=500, blank=True, null=True, db_index=True)
+    # 最後にフィードに載っていた同期の時刻（これより前のまま残った未読記事はフィードから消えたとみなして削除）
+    last_seen_in_feed = models.DateTimeField(blank=True, null=True)
 
     # 読了ステータス (機能4)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='unread')
@@ -154,6 +356,10 @@ class Article(models.Model):
     
     class Meta:
         unique_together = ('user', 'cached_url')
+        indexes = [
+            # フィードから消えた未読RSS記事の削除対象を引くため
+            models.Index(fields=['rss_subscription', 'is_from_rss', 'status'], name='article_rss_sub_status_idx'),
+        ]
 
     def __str__(self):
         return self.cached_url.title or self.cached_url.url
@@ -0,0 +1,80 @@
+"""
+OPML の読み書き（RSS購読の一括インポート / エクスポート）
+
+- インポート: outline 要素を入れ子（カテゴリ）ごと走査し、xmlUrl を持つものをフィードとして取り出す
+  同じURLは1件にまとめ、http / https 以外や不正なURLは除外する
+- エクスポート: 購読を OPML 2.0 の outline として書き出す
+"""
+import xml.etree.ElementTree as ET
+from email.utils import format_datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.utils import timezone
+
+OPML_MAX_BYTES = 5 * 1024 * 1024
+FEED_NAME_MAX_CHARS = 100
+FEED_URL_MAX_CHARS = 2000
+
+_url_validator = URLValidator(schemes=['http', 'https'])
+
+
+class OPMLError(ValueError):
+    """OPML として読めない"""
+
+
+def parse_opml(content):
+    """
+    OPML からフィードを取り出す
+    戻り値: [(名前, フィードURL), ...]（文書内の順序、URL の重複は最初の1件のみ）
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if not content or not content.strip():
+        raise OPMLError('OPML が空です')
+    if len(content) > OPML_MAX_BYTES:
+        raise OPMLError('OPML が大きすぎます')
+    # 外部実体・実体展開は使わない（OPML では不要）
+    if b'<!ENTITY' in content:
+        raise OPMLError('OPML に実体宣言は使えません')
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError as exc:
+        raise OPMLError(f'OPML を解析できません: {exc}') from exc
+    if root.tag.lower() != 'opml':
+        raise OPMLError('ルート要素が opml ではありません')
+
+    feeds = []
+    seen = set()
+    for outline in root.iter('outline'):
+        feed_url = (outline.get('xmlUrl') or outline.get('xmlurl') or '').strip()
+        if not feed_url or feed_url in seen or len(feed_url) > FEED_URL_MAX_CHARS:
+            continue
+        try:
+            _url_validator(feed_url)
+        except ValidationError:
+            continue
+        seen.add(feed_url)
+        name = (outline.get('title') or outline.get('text') or '').strip() or feed_url
+        feeds.append((name[:FEED_NAME_MAX_CHARS], feed_url))
+    return feeds
+
+
+def build_opml(subscriptions, title='Newsreread subscriptions'):
+    """購読のリストを OPML 2.0 のバイト列にする"""
+    root = ET.Element('opml', version='2.0')
+    head = ET.SubElement(root, 'head')
+    ET.SubElement(head, 'title').text = title
+    ET.SubElement(head, 'dateCreated').text = format_datetime(timezone.now())
+    body = ET.SubElement(root, 'body')
+    for subscription in subscriptions:
+        ET.SubElement(
+            body,
+            'outline',
+            type='rss',
+            text=subscription.name,
+            title=subscription.name,
+            xmlUrl=subscription.feed_url,
+        )
+    ET.indent(root)
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
@@ -0,0 +1,247 @@
+"""
+ホスト単位の取得ペース制御（トークンバケット）
+
+複数の Celery ワーカーが同じニュースサイトに同時アクセスして 429 を受けないよう、
+ホストごとのトークンバケットをワーカー間で共有する。
+- FETCH_RATE_LIMIT_BACKEND='redis': Redis 上で Lua スクリプトによりアトミックに消費（本番用）
+- FETCH_RATE_LIMIT_BACKEND='memory': プロセス内のみで共有（テスト・開発用）
+- Retry-After を受け取ったホストは指定時刻までブロックする
+トークンがない場合は待ち秒数を返すので、呼び出し側は失敗ではなく「延期」として扱う。
+"""
+import os
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.utils import timezone
+
+_BUCKET_KEY_PREFIX = 'newsreread:ratelimit:bucket:'
+_BLOCK_KEY_PREFIX = 'newsreread:ratelimit:block:'
+_RATE_KEY_PREFIX = 'newsreread:ratelimit:rate:'
+
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[3])
+local blocked = tonumber(redis.call('GET', KEYS[2]) or '0')
+if blocked > now then
+    return tostring(blocked - now)
+end
+local override = redis.call('GET', KEYS[3])
+local rate = tonumber(override or ARGV[1])
+local capacity = tonumber(ARGV[2])
+if override then
+    capacity = 1
+end
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return tostring(wait)
+"""
+
+_limiter = None
+_limiter_pid = None
+_limiter_lock = threading.Lock()
+
+
+def host_of(url):
+    return (urlparse(url).netloc or '').lower()
+
+
+class InMemoryBucketStore:
+    """プロセス内のトークンバケット（Redis の代替。テスト用）"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._blocked_until = {}
+        self._rates = {}
+
+    def acquire(self, host, rate, capacity, now):
+        with self._lock:
+            blocked = self._blocked_until.get(host, 0.0)
+            if blocked > now:
+                return blocked - now
+            rate_override = self._rates.get(host)
+            if rate_override and rate_override[1] > now:
+                rate = rate_override[0]
+                capacity = 1.0
+            tokens, ts = self._buckets.get(host, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[host] = (tokens, now)
+            return wait
+
+    def block(self, host, until):
+        with self._lock:
+            self._blocked_until[host] = max(self._blocked_until.get(host, 0.0), until)
+
+    def set_rate(self, host, rate, ttl, now):
+        with self._lock:
+            self._rates[host] = (rate, now + ttl)
+
+
+class RedisBucketStore:
+    """Redis 上のトークンバケット（ワーカー間で共有）"""
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self._script = self.client.register_script(_TOKEN_BUCKET_LUA)
+
+    def acquire(self, host, rate, capacity, now):
+        ttl = max(60, int(capacity / rate) + 60)
+        keys = [_BUCKET_KEY_PREFIX + host, _BLOCK_KEY_PREFIX + host, _RATE_KEY_PREFIX + host]
+        return float(self._script(keys=keys, args=[rate, capacity, now, ttl]))
+
+    def block(self, host, until):
+        key = _BLOCK_KEY_PREFIX + host
+        ttl = max(1, int(until - time.time()) + 1)
+        current = self.client.get(key)
+        if current is None or float(current) < until:
+            self.client.set(key, until, ex=ttl)
+
+    def set_rate(self, host, rate, ttl, now):
+        self.client.set(_RATE_KEY_PREFIX + host, rate, ex=max(1, int(ttl)))
+
+
+class HostRateLimiter:
+    """
+    ホスト単位のレート制御
+    rate: 1秒あたりの取得数, burst: バケット容量（連続取得できる数）
+    """
+    def __init__(self, store, rate, burst):
+        self.store = store
+        self.rate = max(1e-6, float(rate))
+        self.burst = max(1.0, float(burst))
+
+    def try_acquire(self, url):
+        """
+        トークンを1つ消費する
+        戻り値: 待ち秒数（0 なら今すぐ取得してよい）
+        ストアに接続できない場合は取得を止めない（fail open）
+        """
+        host = host_of(url)
+        if not host:
+            return 0.0
+        try:
+            return max(0.0, self.store.acquire(host, self.rate, self.burst, time.time()))
+        except Exception as exc:
+            print(f"Rate limiter unavailable ({exc}). Proceeding without limit.")
+            return 0.0
+
+    def defer_host(self, url, seconds):
+        """Retry-After 等でホスト全体を seconds 秒止める"""
+        host = host_of(url)
+        if not host or seconds <= 0:
+            return
+        try:
+            self.store.block(host, time.time() + seconds)
+        except Exception as exc:
+            print(f"Rate limiter unavailable ({exc}). Could not defer {host}.")
+
+    def set_host_rate(self, url, rate, ttl):
+        """
+        ホスト固有のレート（例: robots.txt の Crawl-delay）を ttl 秒間適用する
+        適用中はバケット容量を1にする（バーストで Crawl-delay の間隔を破らない）
+        """
+        host = host_of(url)
+        if not host or rate <= 0:
+            return
+        try:
+            self.store.set_rate(host, float(rate), ttl, time.time())
+        except Exception as exc:
+            print(f"Rate limiter unavailable ({exc}). Could not set rate for {host}.")
+
+
+def _build_store():
+    backend = str(getattr(settings, 'FETCH_RATE_LIMIT_BACKEND', 'memory')).strip().lower()
+    if backend == 'redis':
+        url = getattr(settings, 'FETCH_RATE_LIMIT_REDIS_URL', None) or getattr(settings, 'CELERY_BROKER_URL', '')
+        try:
+            return RedisBucketStore(url)
+        except Exception as exc:
+            print(f"Redis rate limiter unavailable ({exc}). Fallback to in-memory.")
+    return InMemoryBucketStore()
+
+
+def get_rate_limiter():
+    """プロセス共通の HostRateLimiter を取得"""
+    global _limiter, _limiter_pid
+    pid = os.getpid()
+    if _limiter is not None and _limiter_pid == pid:
+        return _limiter
+
+    with _limiter_lock:
+        if _limiter is None or _limiter_pid != pid:
+            _limiter = HostRateLimiter(
+                _build_store(),
+                rate=getattr(settings, 'FETCH_HOST_RATE', 1.0),
+                burst=getattr(settings, 'FETCH_HOST_BURST', 4),
+            )
+            _limiter_pid = pid
+    return _limiter
+
+
+def reset_rate_limiter():
+    """リミッターを破棄する（設定変更時・テスト用）"""
+    global _limiter, _limiter_pid
+    with _limiter_lock:
+        _limiter = None
+        _limiter_pid = None
+
+
+def parse_retry_after(value):
+    """
+    Retry-After ヘッダーを秒数に変換する（秒数 / HTTP-date の両形式）
+    解釈できなければ None
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=dt_timezone.utc)
+    return max(0.0, (retry_at - timezone.now()).total_seconds())
+
+
+def deferral_seconds(status_code, headers):
+    """
+    スロットリング応答なら延期秒数を返す（失敗として数えない）
+    - 429: Retry-After（なければ FETCH_RATE_LIMIT_DEFAULT_BACKOFF）
+    - 503: Retry-After がある場合のみ
+    それ以外は None
+    """
+    if status_code not in (429, 503):
+        return None
+    retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+    if retry_after is None:
+        if status_code != 429:
+            return None
+        retry_after = float(getattr(settings, 'FETCH_RATE_LIMIT_DEFAULT_BACKOFF', 60))
+    max_defer = float(getattr(settings, 'FETCH_RATE_LIMIT_MAX_DEFER', 6 * 60 * 60))
+    return min(retry_after, max_defer)
+
+
+def defer_until(seconds):
+    return timezone.now() + timedelta(seconds=seconds)
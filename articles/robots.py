@@ -0,0 +1,211 @@
+"""
+ホスト単位の robots.txt キャッシュ
+
+スクレイパーが robots.txt を見ずに取得していると、ブロックしているサイトの URL が
+_calculate_retry_at のバックオフで何度も再試行される。
+- robots.txt はホストごとに HostRobots へ保存し、ROBOTS_TXT_TTL_HOURS の間は再取得しない
+- 4xx（robots.txt なし）は「制限なし」として同じ TTL で、5xx・接続エラーは短い TTL でキャッシュする（ネガティブキャッシュ）
+- プロセス内でも解析済みのルールを保持し、毎回 DB を読まない
+- Crawl-delay はホスト単位のレート制限（ratelimit.py）に反映し、メタデータ取得と RSS 取得の両方のペースを落とす
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .http_client import http_get
+from .models import HostRobots
+from .ratelimit import get_rate_limiter, host_of
+
+ROBOTS_USER_AGENT = 'YourAppName-Bookmark-Bot/1.0'
+ROBOTS_MAX_BYTES = 512 * 1024
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+class RobotsPolicy:
+    """1ホスト分の解析済み robots.txt"""
+    def __init__(self, parser=None, crawl_delay=None):
+        self.parser = parser
+        self.crawl_delay = crawl_delay
+
+    def can_fetch(self, url, user_agent=ROBOTS_USER_AGENT):
+        if self.parser is None:
+            return True
+        return self.parser.can_fetch(user_agent, url)
+
+
+ALLOW_ALL = RobotsPolicy()
+
+
+def robots_enabled():
+    return bool(getattr(settings, 'ROBOTS_TXT_ENABLED', True))
+
+
+def _ttl(status):
+    if status == 'error':
+        return timedelta(minutes=float(getattr(settings, 'ROBOTS_TXT_ERROR_TTL_MINUTES', 30)))
+    return timedelta(hours=float(getattr(settings, 'ROBOTS_TXT_TTL_HOURS', 24)))
+
+
+def _robots_url(url):
+    parts = urlparse(url)
+    return f"{parts.scheme or 'https'}://{parts.netloc}/robots.txt"
+
+
+def _download_robots(url):
+    """
+    robots.txt を取得する（ネットワークのみ、DB には触れない）
+    戻り値: (status, body)  status は 'ok' / 'missing' / 'error'
+    """
+    timeout = float(getattr(settings, 'ROBOTS_TXT_TIMEOUT', 5))
+    try:
+        response = http_get(
+            _robots_url(url),
+            purpose='scraper',
+            headers={'User-Agent': ROBOTS_USER_AGENT},
+            timeout=timeout,
+            stream=True,
+        )
+    except requests.RequestException as exc:
+        print(f"Error fetching robots.txt for {host_of(url)}: {exc}")
+        return 'error', ''
+
+    try:
+        if response.status_code >= 500:
+            return 'error', ''
+        if response.status_code >= 400:
+            return 'missing', ''
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            body.extend(chunk)
+            if len(body) >= ROBOTS_MAX_BYTES:
+                break
+        return 'ok', bytes(body[:ROBOTS_MAX_BYTES]).decode('utf-8', errors='replace')
+    except requests.RequestException as exc:
+        print(f"Error fetching robots.txt for {host_of(url)}: {exc}")
+        return 'error', ''
+    finally:
+        response.close()
+
+
+def _build_policy(status, body):
+    if status != 'ok' or not body.strip():
+        return ALLOW_ALL
+    parser = RobotFileParser()
+    parser.parse(body.splitlines())
+    crawl_delay = parser.crawl_delay(ROBOTS_USER_AGENT)
+    try:
+        crawl_delay = float(crawl_delay) if crawl_delay is not None else None
+    except (TypeError, ValueError):
+        crawl_delay = None
+    return RobotsPolicy(parser, crawl_delay)
+
+
+def _apply_crawl_delay(url, policy, ttl_seconds):
+    """Crawl-delay が既定のレートより遅ければ、そのホストのレートを下げる（適用中はバースト1）"""
+    if not policy.crawl_delay or policy.crawl_delay <= 0:
+        return
+    max_delay = float(getattr(settings, 'ROBOTS_MAX_CRAWL_DELAY', 60))
+    rate = 1.0 / min(policy.crawl_delay, max_delay)
+    if rate < float(getattr(settings, 'FETCH_HOST_RATE', 1.0)):
+        get_rate_limiter().set_host_rate(url, rate, ttl_seconds)
+
+
+def _remember(host, url, policy, expires_at):
+    ttl_seconds = max(1.0, (expires_at - timezone.now()).total_seconds())
+    with _policies_lock:
+        _policies[host] = (time.time() + ttl_seconds, policy)
+    _apply_crawl_delay(url, policy, ttl_seconds)
+
+
+def _cached_policy(host):
+    with _policies_lock:
+        cached = _policies.get(host)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    return None
+
+
+def _store(host, status, body, now):
+    policy = _build_policy(status, body)
+    expires_at = now + _ttl(status)
+    HostRobots.objects.update_or_create(
+        host=host,
+        defaults={
+            'status': status,
+            'body': body,
+            'crawl_delay': policy.crawl_delay,
+            'fetched_at': now,
+            'expires_at': expires_at,
+        },
+    )
+    return policy, expires_at
+
+
+def get_robots_policies(urls, max_workers=8):
+    """
+    URL 群のホストごとの RobotsPolicy を返す {host: RobotsPolicy}
+    プロセス内キャッシュ → HostRobots → ネットワークの順に引き、
+    期限切れ・未取得のホストはスレッドで並行取得する
+    """
+    by_host = {}
+    for url in urls:
+        host = host_of(url)
+        if host:
+            by_host.setdefault(host, url)
+    if not robots_enabled():
+        return {host: ALLOW_ALL for host in by_host}
+
+    policies = {}
+    for host in by_host:
+        policy = _cached_policy(host)
+        if policy is not None:
+            policies[host] = policy
+
+    now = timezone.now()
+    pending = [host for host in by_host if host not in policies]
+    if pending:
+        for row in HostRobots.objects.filter(host__in=pending, expires_at__gt=now):
+            policy = _build_policy(row.status, row.body)
+            policies[row.host] = policy
+            _remember(row.host, by_host[row.host], policy, row.expires_at)
+
+    missing = [host for host in by_host if host not in policies]
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+            downloaded = list(executor.map(lambda host: _download_robots(by_host[host]), missing))
+        for host, (status, body) in zip(missing, downloaded):
+            policy, expires_at = _store(host, status, body, now)
+            policies[host] = policy
+            _remember(host, by_host[host], policy, expires_at)
+
+    return policies
+
+
+def get_robots_policy(url):
+    """1件分の get_robots_policies"""
+    return get_robots_policies([url]).get(host_of(url), ALLOW_ALL)
+
+
+def is_fetch_allowed(url):
+    """robots.txt 上、このURLを取得してよいか（Crawl-delay の反映も兼ねる）"""
+    return get_robots_policy(url).can_fetch(url)
+
+
+def robots_retry_seconds():
+    """robots.txt で拒否された URL を再確認するまでの秒数"""
+    return _ttl('ok').total_seconds()
+
+
+def reset_robots_cache():
+    """プロセス内キャッシュを破棄する（テスト用）"""
+    with _policies_lock:
+        _policies.clear()
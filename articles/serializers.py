@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from .models import Article, Tag, Question, ActionItem, CachedURL, RSSSubscription
+from .models import Article, Tag, Question, ActionItem, CachedURL, RSSSubscription, OPMLImport
 
 # ★ここから追加
 class RegisterSerializer(serializers.ModelSerializer):
@@ -71,8 +71,28 @@ class TagSerializer(serializers.ModelSerializer):
 class RSSSubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = RSSSubscription
-        fields = ['id', 'name', 'feed_url', 'is_active', 'last_fetched_at', 'created_at']
-        read_only_fields = ['last_fetched_at', 'created_at']
+        fields = ['id', 'name', 'feed_url', 'is_active', 'last_fetched_at', 'skipped_sync_count', 'created_at']
+        read_only_fields = ['last_fetched_at', 'skipped_sync_count', 'created_at']
+
+
+class OPMLImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OPMLImport
+        fields = [
+            'id',
+            'status',
+            'total',
+            'created_count',
+            'existing_count',
+            'processed',
+            'succeeded',
+            'failed',
+            'results',
+            'error',
+            'created_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
 
 
 class QuestionSerializer(serializers.ModelSerializer):
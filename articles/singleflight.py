@@ -0,0 +1,153 @@
+"""
+CachedURL 単位の取得の重複排除（single-flight）
+
+話題の URL を複数ユーザーが同時に保存したり、多くの購読者がいるフィードに同じ記事が載ったりすると、
+fetch_article_metadata が保存の数だけ走り、同じページを何度も取得して _mark_fetch_success で競合する。
+- 同じ CachedURL の取得は1つだけ（リーダー）が実行し、後から来た呼び出しは記事IDを待機者として登録して終了
+- リーダーは取得後に待機者の記事IDを受け取り、自分の記事と同じ後処理（分類・延期時の再投入）を行う
+- 状態の置き場所は FETCH_RATE_LIMIT_BACKEND と同じ（redis: ワーカー間で共有 / memory: プロセス内のみ）
+"""
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+_LOCK_KEY_PREFIX = 'newsreread:singleflight:lock:'
+_WAITERS_KEY_PREFIX = 'newsreread:singleflight:waiters:'
+
+# リーダーがいなければロックを取り、いれば待機者として記事IDを登録する（アトミック）
+_JOIN_LUA = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', tonumber(ARGV[2])) then
+    return 1
+end
+for i = 3, #ARGV do
+    redis.call('SADD', KEYS[2], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]))
+return 0
+"""
+
+# 自分のロックであれば解放し、待機者の記事IDを取り出す
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {}
+end
+local members = redis.call('SMEMBERS', KEYS[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+return members
+"""
+
+_tracker = None
+_tracker_pid = None
+_tracker_lock = threading.Lock()
+
+
+class InMemoryFlightStore:
+    """プロセス内の single-flight 状態（Redis の代替。テスト用）"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def join(self, key, token, ttl, article_ids, now):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None or flight['expires_at'] <= now:
+                self._flights[key] = {'token': token, 'expires_at': now + ttl, 'waiters': set()}
+                return True
+            flight['waiters'].update(article_ids)
+            return False
+
+    def release(self, key, token):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None or flight['token'] != token:
+                return []
+            del self._flights[key]
+            return list(flight['waiters'])
+
+
+class RedisFlightStore:
+    """Redis 上の single-flight 状態（ワーカー間で共有）"""
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self._join = self.client.register_script(_JOIN_LUA)
+        self._release = self.client.register_script(_RELEASE_LUA)
+
+    def join(self, key, token, ttl, article_ids, now):
+        keys = [_LOCK_KEY_PREFIX + key, _WAITERS_KEY_PREFIX + key]
+        return bool(self._join(keys=keys, args=[token, max(1, int(ttl)), *article_ids]))
+
+    def release(self, key, token):
+        keys = [_LOCK_KEY_PREFIX + key, _WAITERS_KEY_PREFIX + key]
+        return [int(member) for member in self._release(keys=keys, args=[token])]
+
+
+class FlightTracker:
+    """
+    CachedURL ID ごとの取得中フラグと待機者
+    ttl: リーダーが異常終了した場合にロックが自然に外れるまでの秒数
+    """
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = max(1.0, float(ttl))
+
+    def join(self, cached_url_id, article_ids=()):
+        """
+        取得に参加する
+        戻り値: リーダーなら解放用トークン、既に取得中なら None（記事IDは待機者として登録済み）
+        ストアに接続できない場合は重複排除をせず取得する（fail open）
+        """
+        token = uuid.uuid4().hex
+        article_ids = [int(article_id) for article_id in article_ids if article_id]
+        try:
+            if self.store.join(str(cached_url_id), token, self.ttl, article_ids, time.time()):
+                return token
+            return None
+        except Exception as exc:
+            print(f"Single-flight store unavailable ({exc}). Fetching without deduplication.")
+            return token
+
+    def release(self, cached_url_id, token):
+        """取得を終え、待機していた記事IDのリストを返す"""
+        try:
+            return sorted(self.store.release(str(cached_url_id), token))
+        except Exception as exc:
+            print(f"Single-flight store unavailable ({exc}). Waiters for {cached_url_id} were not collected.")
+            return []
+
+
+def _build_store():
+    backend = str(getattr(settings, 'FETCH_RATE_LIMIT_BACKEND', 'memory')).strip().lower()
+    if backend == 'redis':
+        url = getattr(settings, 'FETCH_RATE_LIMIT_REDIS_URL', None) or getattr(settings, 'CELERY_BROKER_URL', '')
+        try:
+            return RedisFlightStore(url)
+        except Exception as exc:
+            print(f"Redis single-flight store unavailable ({exc}). Fallback to in-memory.")
+    return InMemoryFlightStore()
+
+
+def get_flight_tracker():
+    """プロセス共通の FlightTracker を取得"""
+    global _tracker, _tracker_pid
+    pid = os.getpid()
+    if _tracker is not None and _tracker_pid == pid:
+        return _tracker
+
+    with _tracker_lock:
+        if _tracker is None or _tracker_pid != pid:
+            _tracker = FlightTracker(_build_store(), ttl=getattr(settings, 'FETCH_SINGLEFLIGHT_TTL', 120))
+            _tracker_pid = pid
+    return _tracker
+
+
+def reset_flight_tracker():
+    """トラッカーを破棄する（設定変更時・テスト用）"""
+    global _tracker, _tracker_pid
+    with _tracker_lock:
+        _tracker = None
+        _tracker_pid = None
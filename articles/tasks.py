@@ -1,16 +1,53 @@
-import warnings
 import requests
-from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
-import xml.etree.ElementTree as ET
 
-warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
-from urllib.parse import urlparse
 from datetime import timedelta
 import threading
+import hashlib
+import math
 import os
+import time
 from celery import shared_task
-from .models import CachedURL, Article, Tag, RSSSubscription
-from django.db.models import Q
+from celery.signals import worker_process_shutdown
+from .models import CachedURL, Article, Tag, RSSSubscription, FeedSource, OPMLImport
+from .http_client import http_get, pool_stats
+from .ratelimit import deferral_seconds, defer_until, get_rate_limiter, host_of
+from .urlnorm import record_redirect_alias, resolve_cached_urls
+from .singleflight import get_flight_tracker
+from .robots import get_robots_policies, get_robots_policy, robots_retry_seconds
+from .circuit import (
+    claim_host_name,
+    host_health_map,
+    host_priority,
+    is_host_failure,
+    is_host_open,
+    record_host_result,
+    release_host_probe,
+)
+from .http_cache import (
+    conditional_headers,
+    content_digest,
+    feed_conditional_headers,
+    is_not_modified,
+    response_validators,
+)
+from .feed_parser import DEFAULT_DESCRIPTION_MAX_CHARS, parse_feed_entries
+from .textnorm import normalize_description
+from .embedding_store import encode_with_store, store_enabled, text_hash
+from .term_cache import flush_term_embedding_cache, get_term_embedding_cache, normalize_term
+from .classification_cache import (
+    invalidate_classification,
+    load_classification_results,
+    save_classification_results,
+)
+from .feed_schedule import count_new_guids, guid_digests, next_poll_fields, retry_poll_fields
+from .html_meta import (
+    DEFAULT_HEAD_MAX_BYTES,
+    STREAM_CHUNK_SIZE,
+    extract_head_metadata,
+    extract_head_metadata_from_bytes,
+)
+from django.db import transaction
+from django.db.models import CASCADE, F, Q
 from django.utils import timezone
 from django.conf import settings
 
@@ -24,6 +61,9 @@ _category_embeddings = None
 _category_embeddings_source = None
 _openvino_embedder = None
 _openvino_embedder_source = None
+_inference_client = None
+_inference_client_source = None
+_inference_client_retry_at = 0.0
 _model_lock = threading.Lock()
 
 
@@ -76,7 +116,7 @@ def resolve_ai_device():
 
 def _normalize_transformers_backend(value):
     backend_raw = str(value or 'sentence_transformers').strip().lower()
-    allowed = {'auto', 'sentence_transformers', 'openvino_ir'}
+    allowed = {'auto', 'sentence_transformers', 'openvino_ir', 'inference_server'}
     return backend_raw if backend_raw in allowed else 'sentence_transformers'
 
 
@@ -258,14 +298,70 @@ def get_openvino_ir_embedder():
     return _openvino_embedder
 
 
+def get_inference_client():
+    """
+    推論サーバー（run_inference_server）のクライアントを取得（接続できなければ None）
+    接続に失敗したら INFERENCE_SERVER_RETRY_SECONDS 秒は再接続を試みない
+    前回のリクエストがエラーになったクライアントは捨て、/health を読み直して作り直す
+    （サーバーが別のモデルで再起動していれば新しいフィンガープリントになる）
+    """
+    global _inference_client, _inference_client_source, _inference_client_retry_at
+    from .inference_server import DEFAULT_INFERENCE_SERVER_URL, InferenceClient, InferenceServerError
+
+    url = str(getattr(settings, 'INFERENCE_SERVER_URL', '') or DEFAULT_INFERENCE_SERVER_URL).strip()
+    timeout = float(getattr(settings, 'INFERENCE_SERVER_TIMEOUT', 30))
+    source = (url, timeout)
+    if _inference_client is not None and _inference_client_source == source and not _inference_client.failed:
+        return _inference_client
+    if time.monotonic() < _inference_client_retry_at:
+        return None
+
+    with _model_lock:
+        if _inference_client is not None and _inference_client_source == source and not _inference_client.failed:
+            return _inference_client
+        try:
+            _inference_client = InferenceClient(url, timeout=timeout)
+            _inference_client_source = source
+        except (InferenceServerError, ValueError) as exc:
+            print(f"Inference server unavailable: {exc}")
+            _inference_client = None
+            _inference_client_source = None
+            _inference_client_retry_at = time.monotonic() + float(getattr(settings, 'INFERENCE_SERVER_RETRY_SECONDS', 30))
+    return _inference_client
+
+
+def reset_inference_client():
+    """推論サーバーのクライアントを破棄する（テスト用）"""
+    global _inference_client, _inference_client_source, _inference_client_retry_at
+    with _model_lock:
+        _inference_client = None
+        _inference_client_source = None
+        _inference_client_retry_at = 0.0
+
+
 def get_embedding_model_and_backend():
     """
     transformers系埋め込みモデルを取得。
     戻り値: (model, backend_name)
-    backend_name: 'openvino_ir' | 'sentence_transformers' | None
+    backend_name: 'openvino_ir' | 'sentence_transformers' | 'inference_server' | None
+    inference_server は推論サーバーのクライアント（モデルはこのプロセスに読み込まない）
     """
     backend = _normalize_transformers_backend(getattr(settings, 'AI_TRANSFORMERS_BACKEND', 'sentence_transformers'))
 
+    if backend == 'inference_server':
+        client = get_inference_client()
+        if client is not None:
+            return client, 'inference_server'
+        return None, None
+    return load_local_embedding_model(backend)
+
+
+def load_local_embedding_model(backend='auto'):
+    """
+    このプロセスに埋め込みモデルを読み込む（推論サーバー自身もこれを使う）
+    戻り値: (model, backend_name)
+    """
+    backend = _normalize_transformers_backend(backend)
     if backend in ('auto', 'openvino_ir'):
         ov_model = get_openvino_ir_embedder()
         if ov_model is not None:
@@ -279,31 +375,149 @@ def get_embedding_model_and_backend():
     return st_model, 'sentence_transformers'
 
 
+def embedding_model_fingerprint(backend):
+    """
+    埋め込みストアのキーに使うモデルのフィンガープリント
+    - sentence_transformers: モデル名
+    - openvino_ir: IR の .xml / .bin のパス・サイズ・更新時刻とトークナイザー（IR を差し替えたら別扱い）
+    - inference_server: サーバーが読み込んだモデルのフィンガープリント（/health で取得）
+    デバイスの違いは含めない（同じモデルなら同じ埋め込みとみなす）
+    """
+    if backend == 'inference_server' and _inference_client is not None and _inference_client.fingerprint:
+        return _inference_client.fingerprint
+    if backend == 'openvino_ir' and _openvino_embedder_source:
+        xml_path, tokenizer_model, _device = _openvino_embedder_source
+        parts = [backend, xml_path, tokenizer_model]
+        for path in (xml_path, os.path.splitext(xml_path)[0] + '.bin'):
+            try:
+                stat = os.stat(path)
+                parts.append(f"{stat.st_size}:{int(stat.st_mtime)}")
+            except OSError:
+                pass
+    else:
+        parts = [backend or '', str(_sbert_model_name or getattr(settings, 'AI_SBERT_MODEL', ''))]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+# 分類ロジックを変えて共有キャッシュの結果を使わせたくないときに上げる
+_CLASSIFIER_VERSION = 2
+
+
+def classification_fingerprint(engine):
+    """
+    分類結果の共有キャッシュのキーに使う分類設定のフィンガープリント
+    エンジン・埋め込みモデルの設定（IR は .xml / .bin のサイズ・更新時刻も）・カテゴリ候補が同じなら同じ値
+    モデルをロードせずに設定だけで決める（キャッシュが当たればモデルは不要）
+    inference_server はサーバーが読み込んだモデルのフィンガープリント（/health）を使う
+    （接続できなければURL。その間の結果は軽量版へのフォールバックなので保存されない）
+    """
+    parts = [str(_CLASSIFIER_VERSION), engine, '\t'.join(settings.AI_CATEGORY_CANDIDATES)]
+    if engine == 'transformers':
+        backend = _normalize_transformers_backend(getattr(settings, 'AI_TRANSFORMERS_BACKEND', 'sentence_transformers'))
+        if backend == 'inference_server':
+            client = get_inference_client()
+            if client is not None and client.fingerprint:
+                parts += [backend, client.fingerprint]
+            else:
+                parts += [backend, str(getattr(settings, 'INFERENCE_SERVER_URL', '') or '')]
+            return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+        parts += [backend, str(getattr(settings, 'AI_SBERT_MODEL', ''))]
+        if backend in ('auto', 'openvino_ir'):
+            xml_path = str(getattr(settings, 'AI_OPENVINO_IR_XML', '') or '').strip()
+            parts += [xml_path, str(getattr(settings, 'AI_OPENVINO_TOKENIZER_MODEL', '') or '')]
+            for path in (xml_path, os.path.splitext(xml_path)[0] + '.bin'):
+                try:
+                    stat = os.stat(path)
+                    parts.append(f"{stat.st_size}:{int(stat.st_mtime)}")
+                except OSError:
+                    pass
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _encode_documents(model, backend, texts, cached_url_ids=None, convert_to_tensor=False):
+    """
+    分類用テキストの埋め込みを求める
+    cached_url_ids を渡し EMBEDDING_STORE_ENABLED なら埋め込みストアを先に引き、未保存のものだけ推論する
+    """
+    if cached_url_ids is not None and store_enabled():
+        return encode_with_store(model, texts, list(cached_url_ids), embedding_model_fingerprint(backend))
+    if convert_to_tensor:
+        return model.encode(texts, convert_to_tensor=True)
+    return model.encode(texts)
+
+
 def _calculate_retry_at(failure_count, base_minutes=30, max_hours=24):
     delay_minutes = min(base_minutes * (2 ** max(0, failure_count - 1)), max_hours * 60)
     return timezone.now() + timedelta(minutes=delay_minutes)
 
 
-def _mark_fetch_failure(cache, status_code=None, is_not_found=False):
+_FETCH_FAILURE_FIELDS = [
+    'title',
+    'fetch_status',
+    'failure_count',
+    'last_failure_at',
+    'last_http_status',
+    'next_retry_at',
+]
+
+_FETCH_SUCCESS_FIELDS = [
+    'title',
+    'description',
+    'image_url',
+    'site_name',
+    'last_scraped_at',
+    'fetch_status',
+    'failure_count',
+    'last_failure_at',
+    'last_http_status',
+    'next_retry_at',
+    'etag',
+    'last_modified',
+]
+
+_FETCH_DISALLOWED_FIELDS = [
+    'fetch_status',
+    'next_retry_at',
+]
+
+_FETCH_DEFERRED_FIELDS = [
+    'last_http_status',
+    'next_retry_at',
+]
+
+_FETCH_NOT_MODIFIED_FIELDS = [
+    'last_scraped_at',
+    'fetch_status',
+    'failure_count',
+    'last_failure_at',
+    'last_http_status',
+    'next_retry_at',
+]
+
+
+def _apply_fetch_failure(cache, status_code=None, is_not_found=False):
+    """
+    取得失敗の記録をインスタンスに反映する（保存はしない）
+    戻り値: 更新対象フィールド名のリスト（save / bulk_update 用）
+    """
     cache.title = None
     cache.fetch_status = 'not_found' if is_not_found else 'failed'
     cache.failure_count = (cache.failure_count or 0) + 1
     cache.last_failure_at = timezone.now()
     cache.last_http_status = status_code
     cache.next_retry_at = _calculate_retry_at(cache.failure_count)
-    cache.save(update_fields=[
-        'title',
-        'fetch_status',
-        'failure_count',
-        'last_failure_at',
-        'last_http_status',
-        'next_retry_at',
-    ])
+    return list(_FETCH_FAILURE_FIELDS)
 
 
-def _mark_fetch_success(cache, title, description, image_url, site_name, status_code):
+def _apply_fetch_success(cache, title, description, image_url, site_name, status_code,
+                         etag=None, last_modified=None):
+    """
+    取得結果をインスタンスに反映する（保存はしない）
+    タイトルが取れなかった場合は失敗扱いでリトライ対象にする
+    etag / last_modified は次回の条件付きGET用（タイトルがなければ保存しない）
+    """
     cache.title = title
-    cache.description = description
+    cache.description = normalize_description(description)
     cache.image_url = image_url
     cache.site_name = site_name
     cache.last_scraped_at = timezone.now()
@@ -312,18 +526,114 @@ def _mark_fetch_success(cache, title, description, image_url, site_name, status_
     cache.last_failure_at = None if title else timezone.now()
     cache.last_http_status = status_code
     cache.next_retry_at = None if title else _calculate_retry_at(cache.failure_count)
-    cache.save(update_fields=[
-        'title',
-        'description',
-        'image_url',
-        'site_name',
-        'last_scraped_at',
-        'fetch_status',
-        'failure_count',
-        'last_failure_at',
-        'last_http_status',
-        'next_retry_at',
-    ])
+    cache.etag = etag if title else None
+    cache.last_modified = last_modified if title else None
+    return list(_FETCH_SUCCESS_FIELDS)
+
+
+def _apply_fetch_not_modified(cache, status_code=304):
+    """
+    304 Not Modified を反映する（保存はしない）
+    既存のメタデータはそのまま、最終取得日時だけ進める
+    """
+    cache.last_scraped_at = timezone.now()
+    cache.fetch_status = 'success'
+    cache.failure_count = 0
+    cache.last_failure_at = None
+    cache.last_http_status = status_code
+    cache.next_retry_at = None
+    return list(_FETCH_NOT_MODIFIED_FIELDS)
+
+
+def _apply_fetch_deferred(cache, seconds, status_code=None):
+    """
+    レート制限による延期を反映する（保存はしない）
+    失敗回数は増やさず、次回リトライ時刻だけ先送りする
+    """
+    cache.last_http_status = status_code if status_code is not None else cache.last_http_status
+    cache.next_retry_at = defer_until(seconds)
+    return list(_FETCH_DEFERRED_FIELDS)
+
+
+def _apply_fetch_disallowed(cache):
+    """
+    robots.txt で拒否された URL を反映する（保存はしない）
+    失敗回数は増やさず、robots.txt の再取得時期まで再試行しない
+    """
+    cache.fetch_status = 'disallowed'
+    cache.next_retry_at = defer_until(robots_retry_seconds())
+    return list(_FETCH_DISALLOWED_FIELDS)
+
+
+def _mark_fetch_failure(cache, status_code=None, is_not_found=False):
+    update_fields = _apply_fetch_failure(cache, status_code=status_code, is_not_found=is_not_found)
+    cache.save(update_fields=update_fields)
+
+
+def _mark_fetch_success(cache, title, description, image_url, site_name, status_code,
+                        etag=None, last_modified=None):
+    previous_text = _classification_text(cache)
+    update_fields = _apply_fetch_success(
+        cache,
+        title=title,
+        description=description,
+        image_url=image_url,
+        site_name=site_name,
+        status_code=status_code,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    cache.save(update_fields=update_fields)
+    # 分類元のテキストが変わったら共有している分類結果・埋め込みを捨てる
+    if _classification_text(cache) != previous_text:
+        invalidate_classification([cache.id])
+
+
+def _mark_fetch_disallowed(cache):
+    update_fields = _apply_fetch_disallowed(cache)
+    cache.save(update_fields=update_fields)
+
+
+def _mark_fetch_deferred(cache, seconds, status_code=None):
+    update_fields = _apply_fetch_deferred(cache, seconds, status_code=status_code)
+    cache.save(update_fields=update_fields)
+
+
+def _defer_fetch(cache, seconds, article_ids=()):
+    """
+    延期した取得を再投入する（next_retry_at は記録済みであること）
+    非同期実行時は countdown 付きでタスクを再投入、eager 時は next_retry_at のみ
+    分類待ちの記事IDはすべて引き継ぐ
+    """
+    article_ids = list(article_ids)
+    if not getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        fetch_article_metadata.apply_async(
+            args=(cache.id,),
+            kwargs={
+                'article_id': article_ids[0] if article_ids else None,
+                'waiting_article_ids': article_ids[1:],
+            },
+            countdown=max(1, int(math.ceil(seconds))),
+        )
+    print(f"Deferred fetch for {cache.url} by {seconds:.1f}s")
+
+
+def _mark_fetch_not_modified(cache, status_code=304):
+    update_fields = _apply_fetch_not_modified(cache, status_code=status_code)
+    cache.save(update_fields=update_fields)
+
+
+def _extract_metadata(content, url, content_type=None):
+    """
+    取得済み HTML（バイト列）の <head> からタイトル・概要・画像・サイト名を取り出す
+    戻り値: {'title', 'description', 'image_url', 'site_name'}
+    """
+    return extract_head_metadata_from_bytes(
+        content,
+        url,
+        content_type=content_type,
+        max_bytes=getattr(settings, 'METADATA_HEAD_MAX_BYTES', DEFAULT_HEAD_MAX_BYTES),
+    )
 
 def get_sbert_model():
     """SBERT モデルをキャッシュから取得（初回はロード）"""
@@ -401,6 +711,7 @@ def get_category_embeddings(model, categories):
         _sbert_model_name,
         _sbert_device,
         _openvino_embedder_source,
+        getattr(model, 'fingerprint', None),
         tuple(categories)
     )
     if _category_embeddings is not None and _category_embeddings_source == source:
@@ -413,11 +724,34 @@ def get_category_embeddings(model, categories):
         _category_embeddings_source = source
     return _category_embeddings
 
+def _is_recently_fetched(cache, now=None):
+    """
+    直近 FETCH_RECENT_WINDOW_SECONDS 秒以内に取得に成功しているか（再取得不要）
+    実際にページを取得した行（last_http_status あり）だけが対象。RSS の取り込みで
+    タイトル・概要だけ入った行は画像・サイト名が未取得なので対象外
+    """
+    window = float(getattr(settings, 'FETCH_RECENT_WINDOW_SECONDS', 300))
+    if window <= 0 or cache.fetch_status != 'success' or not cache.title or not cache.last_scraped_at:
+        return False
+    if cache.last_http_status is None:
+        return False
+    now = now or timezone.now()
+    return cache.last_scraped_at > now - timedelta(seconds=window)
+
+
+def _classify_fetched_articles(article_ids):
+    for article_id in article_ids:
+        classify_article(article_id)
+
+
 @shared_task
-def fetch_article_metadata(cached_url_id, article_id=None):
+def fetch_article_metadata(cached_url_id, article_id=None, waiting_article_ids=None, force=False):
     """
     CachedURLのIDを受け取り、スクレイピングしてキャッシュを更新するタスク
-    article_id は互換性のため受け取る（現状は未使用）
+    article_id: 取得後に自動分類する記事（waiting_article_ids は延期時に引き継いだ待機者）
+    force: 直近に取得済みでも取得し直す（rescrape アクション用）
+    同じ CachedURL の取得が実行中なら記事IDを待機者として登録して終了し、
+    実行中の取得（リーダー）が終わった時点でまとめて分類する
     """
     try:
         cache = CachedURL.objects.get(id=cached_url_id)
@@ -425,97 +759,189 @@ def fetch_article_metadata(cached_url_id, article_id=None):
         print(f"CachedURL {cached_url_id} not found. Task cancelled.")
         return
 
+    article_ids = []
+    for candidate in [article_id, *(waiting_article_ids or [])]:
+        if candidate and candidate not in article_ids:
+            article_ids.append(candidate)
+
+    # 直近に取得済みならネットワークに出ず分類だけ行う
+    if not force and _is_recently_fetched(cache):
+        _classify_fetched_articles(article_ids)
+        return
+
     # 次回リトライ時刻に達していない場合はスキップ
     if cache.next_retry_at and cache.next_retry_at > timezone.now():
         return
 
+    # 同じURLの取得が実行中なら相乗りする（分類はリーダーが行う）
+    flights = get_flight_tracker()
+    token = flights.join(cache.id, article_ids)
+    if token is None:
+        print(f"Fetch already in flight for {cache.url}. Attached articles {article_ids}.")
+        return
+
+    outcome, defer_seconds = 'error', None
+    try:
+        outcome, defer_seconds = _scrape_cached_url(cache)
+    finally:
+        for waiter in flights.release(cache.id, token):
+            if waiter not in article_ids:
+                article_ids.append(waiter)
+
+    if outcome == 'deferred':
+        _defer_fetch(cache, defer_seconds, article_ids=article_ids)
+    elif outcome in ('success', 'not_modified', 'disallowed'):
+        # robots.txt で拒否された記事も URL・サイト名から分類する
+        _classify_fetched_articles(article_ids)
+
+
+def _scrape_cached_url(cache):
+    """
+    1件スクレイピングして CachedURL に反映する
+    戻り値: (結果種別, 延期秒数)
+    結果種別は 'success' / 'not_modified' / 'deferred' / 'disallowed' / 'not_found' / 'failed' / 'error'
+    延期の場合は next_retry_at だけ記録し、再投入は呼び出し側が行う
+    """
+    # サイト全体が落ちている（ブレーカー open）ならネットワークに出さず延期
+    host = host_of(cache.url)
+    host_allowed, host_retry_at, probing = claim_host_name(host)
+    if not host_allowed:
+        seconds = max(1.0, (host_retry_at - timezone.now()).total_seconds())
+        _mark_fetch_deferred(cache, seconds)
+        return 'deferred', seconds
+
+    outcome, defer_seconds, recorded = _scrape_allowed_host(cache)
+    # 試行役（half_open）のまま結果を記録せずに終わったら返す（他の取得を試行タイムアウトまで止めない）
+    if probing and not recorded:
+        release_host_probe(host)
+    return outcome, defer_seconds
+
+
+def _scrape_allowed_host(cache):
+    """
+    _scrape_cached_url のうちサーキットブレーカーの判定後の処理
+    戻り値: (結果種別, 延期秒数, ホストの結果をサーキットブレーカーに記録したか)
+    """
+    # robots.txt で拒否されている URL は取得しない（Crawl-delay はここでレート制限に反映される）
+    if not get_robots_policy(cache.url).can_fetch(cache.url):
+        _mark_fetch_disallowed(cache)
+        print(f"Disallowed by robots.txt: {cache.url}")
+        return 'disallowed', None, False
+
+    # ホスト単位のレート制限: 上限超過なら失敗にせず延期（eager 時は短時間だけ待つ）
+    limiter = get_rate_limiter()
+    wait = limiter.try_acquire(cache.url)
+    if wait > 0:
+        max_inline_wait = float(getattr(settings, 'FETCH_RATE_LIMIT_MAX_INLINE_WAIT', 5))
+        if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False) and wait <= max_inline_wait:
+            time.sleep(wait)
+        else:
+            _mark_fetch_deferred(cache, wait)
+            return 'deferred', wait, False
+
     # --- スクレイピング処理 ---
+    recorded = False
     try:
-        headers = { 'User-Agent': 'YourAppName-Bookmark-Bot/1.0' }
-        response = requests.get(cache.url, headers=headers, timeout=10)
+        # 前回取得時のバリデータがあれば条件付きGETで再検証する
+        revalidate_headers = conditional_headers(cache)
+        headers = { 'User-Agent': 'YourAppName-Bookmark-Bot/1.0', **revalidate_headers }
+        # 本文全体は不要なのでストリーミングで <head> だけ読む
+        response = http_get(cache.url, purpose='scraper', headers=headers, timeout=10, stream=True)
         status_code = response.status_code
 
+        # 429 / Retry-After 付き 503 はスロットリング: ホストごと延期して失敗には数えない
+        # （サーキットブレーカーにも記録しない。一括取得と同じ扱い）
+        throttle_seconds = deferral_seconds(status_code, response.headers)
+        if throttle_seconds is not None:
+            response.close()
+            limiter.defer_host(cache.url, throttle_seconds)
+            _mark_fetch_deferred(cache, throttle_seconds, status_code=status_code)
+            return 'deferred', throttle_seconds, False
+
+        record_host_result(cache.url, ok=not is_host_failure(status_code, None))
+        recorded = True
+
+        # 304 は変更なし: 解析せず最終取得日時だけ更新
+        if is_not_modified(status_code, revalidate_headers):
+            response.close()
+            _mark_fetch_not_modified(cache, status_code=status_code)
+            print(f"Not modified ({status_code}) for {cache.url}")
+            return 'not_modified', None, True
+
         # 404/410は削除・移転の可能性が高いのでタイトルは空のままにする
         if status_code in (404, 410):
+            response.close()
             _mark_fetch_failure(cache, status_code=status_code, is_not_found=True)
             print(f"Not found ({status_code}) for {cache.url}")
-            return
+            return 'not_found', None, True
 
         # 5xxやその他4xxは失敗として再試行
         if status_code >= 500 or status_code >= 400:
+            response.close()
             _mark_fetch_failure(cache, status_code=status_code, is_not_found=False)
             print(f"HTTP error ({status_code}) for {cache.url}")
-            return
+            return 'failed', None, True
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # タイトル取得
-        title = None
-        og_title = soup.find('meta', property='og:title')
-        if og_title:
-            title = og_title.get('content')
-        else:
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text()
-
-        # 概要取得
-        description = None
-        og_desc = soup.find('meta', property='og:description')
-        if og_desc:
-            description = og_desc.get('content')
-        else:
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc:
-                description = meta_desc.get('content')
-
-        # 画像取得
-        image_url = None
-        og_image = soup.find('meta', property='og:image')
-        if og_image:
-            image_url = og_image.get('content')
-
-        # サイト名取得
-        site_name = None
-        og_site_name = soup.find('meta', property='og:site_name')
-        if og_site_name:
-            site_name = og_site_name.get('content')
-        else:
-            # og:site_nameがない場合、application-nameやtwitterのサイト名を試す
-            app_name = soup.find('meta', attrs={'name': 'application-name'})
-            if app_name:
-                site_name = app_name.get('content')
-            else:
-                twitter_site = soup.find('meta', attrs={'name': 'twitter:site'})
-                if twitter_site:
-                    site_name = twitter_site.get('content', '').lstrip('@')
+        try:
+            metadata = extract_head_metadata(
+                response.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                cache.url,
+                content_type=response.headers.get('Content-Type'),
+                max_bytes=getattr(settings, 'METADATA_HEAD_MAX_BYTES', DEFAULT_HEAD_MAX_BYTES),
+            )
+        finally:
+            response.close()
 
-        # サイト名のフォールバック（ドメインから）
-        if not site_name:
-            parsed = urlparse(cache.url)
-            site_name = parsed.netloc.replace('www.', '') or None
-        # タイトルが取れなかった場合は None のまま（再取得対象にするため URL 由来の仮タイトルは付けない）
+        # リダイレクトされた場合は転送先URLを別名として登録（次回の保存をキャッシュヒットにする）
+        record_redirect_alias(cache, getattr(response, 'url', None))
 
         # --- DB (CachedURL) に保存 ---
         _mark_fetch_success(
             cache,
-            title=title,
-            description=description,
-            image_url=image_url,
-            site_name=site_name,
             status_code=status_code,
+            **metadata,
+            **response_validators(response.headers),
         )
         print(f"Successfully fetched metadata for {cache.url}")
-
-        # ★記事IDが渡されたら、自動分類タスクを実行
-        if article_id:
-            classify_article(article_id)
+        return 'success', None, True
 
     except requests.RequestException as e:
         _mark_fetch_failure(cache, status_code=None, is_not_found=False)
+        record_host_result(cache.url, ok=False)
         print(f"Error fetching {cache.url}: {e}")
+        return 'failed', None, True
     except Exception as e:
         print(f"Error processing {cache.url}: {e}")
+        return 'error', None, recorded
+
+
+_EMPTY_TEXT_CATEGORY = 'その他・ポエム'
+_EMPTY_TEXT_ERROR = "分類元テキストなし（タイトル/概要未取得）"
+
+_CLASSIFICATION_FIELDS = [
+    'suggested_category',
+    'suggested_category_score',
+    'suggested_tags',
+    'classification_status',
+    'classification_error',
+]
+
+
+def _classification_text(cached_url):
+    """
+    分類に使うテキストを組み立てる（タイトル + 概要）
+    タイトル/概要が取れない記事（404等）は URL/サイト名を補助テキストとして利用
+    """
+    title = cached_url.title or ""
+    description = cached_url.description or ""
+    combined_text = f"{title} {description}".strip()
+    if not combined_text:
+        fallback_parts = [
+            cached_url.site_name or "",
+            cached_url.url or "",
+        ]
+        combined_text = " ".join(part for part in fallback_parts if part).strip()
+    return combined_text
 
 
 @shared_task
@@ -534,26 +960,15 @@ def classify_article(article_id):
         article.classification_status = 'processing'
         article.save(update_fields=['classification_status'])
 
-        # テキストを組み立て
-        title = article.cached_url.title or ""
-        description = article.cached_url.description or ""
-        combined_text = f"{title} {description}".strip()
+        combined_text = _classification_text(article.cached_url)
 
-        # タイトル/概要が取れない記事（404等）は URL/サイト名を補助テキストとして利用
+        # 空なら既定カテゴリで完了扱いにして再試行ループを避ける
         if not combined_text:
-            fallback_parts = [
-                article.cached_url.site_name or "",
-                article.cached_url.url or "",
-            ]
-            combined_text = " ".join(part for part in fallback_parts if part).strip()
-
-        # それでも空なら既定カテゴリで完了扱いにして再試行ループを避ける
-        if not combined_text.strip():
-            article.suggested_category = 'その他・ポエム'
+            article.suggested_category = _EMPTY_TEXT_CATEGORY
             article.suggested_category_score = 0.0
             article.suggested_tags = []
             article.classification_status = 'completed'
-            article.classification_error = "分類元テキストなし（タイトル/概要未取得）"
+            article.classification_error = _EMPTY_TEXT_ERROR
             article.save(update_fields=[
                 'suggested_category',
                 'suggested_category_score',
@@ -568,15 +983,12 @@ def classify_article(article_id):
         if engine_raw != engine:
             print(f"Invalid AI_CLASSIFICATION_ENGINE='{engine_raw}'. Fallback to 'lightweight'.")
 
-        if engine == 'transformers':
-            # ★処理A: カテゴリ判定 (SBERT 類似度)
-            category, category_score = classify_category_sbert(combined_text)
-            # ★処理B: タグ抽出 (KeyBERT)
-            tags = extract_keywords_keybert(combined_text)
-        else:
-            # 軽量モード: Transformers 依存を使わずに安定動作
-            category, category_score = predict_category_lightweight(combined_text)
-            tags = extract_keywords_lightweight(combined_text)
+        # 同じURLの分類結果が共有キャッシュにあれば推論しない
+        # （transformers: SBERT 類似度でカテゴリ判定 + KeyBERT でタグ抽出）
+        result = _classify_cached_urls({article.cached_url_id: combined_text}, engine)[article.cached_url_id]
+        if isinstance(result, Exception):
+            raise result
+        category, category_score, tags = result
 
         article.suggested_category = category
         article.suggested_category_score = category_score
@@ -610,188 +1022,501 @@ def classify_article(article_id):
         article.save(update_fields=['classification_status', 'classification_error'])
 
 
-def classify_category_sbert(text):
+def _classify_texts(texts, engine, cached_url_ids=None):
     """
-    SBERT で入力テキストとカテゴリ候補の類似度を計算
-    戻り値: (カテゴリ名, スコア)
+    テキストのリストをまとめて分類する
+    - transformers（OpenVINO IR / 推論サーバー）: 文書の埋め込みは1回だけ計算し、カテゴリ判定とキーワード抽出の両方に使う
+    - transformers（SentenceTransformers）: カテゴリ判定は model.encode(リスト) の1回、KeyBERT は文書リストで1回
+    - lightweight: モデルを使わないので1件ずつ
+    cached_url_ids（texts と同じ順序）を渡すと、文書の埋め込みは埋め込みストアを先に引く
+    transformers でモデルが使えない・推論に失敗したときはバッチ全体を軽量版で分類する
+    戻り値: ([(カテゴリ名, スコア, 推奨タグ), ...], 実際に分類したバックエンド)
+            バックエンドは 'lightweight' / 'sentence_transformers' / 'openvino_ir' / 'inference_server'
+    """
+    if engine == 'transformers':
+        model, backend = get_embedding_model_and_backend()
+        if model is not None:
+            try:
+                if backend in _EMBEDDING_KEYWORD_BACKENDS:
+                    categories = settings.AI_CATEGORY_CANDIDATES
+                    doc_embeddings = _encode_documents(model, backend, texts, cached_url_ids)
+                    scored = _best_categories(doc_embeddings, get_category_embeddings(model, categories), categories)
+                    tags = _embedding_keywords(texts, model, doc_embeddings=doc_embeddings, backend=backend)
+                else:
+                    scored = _sbert_categories(model, backend, texts, cached_url_ids)
+                    tags = _keybert_keywords(texts)
+                return _zip_classification(scored, tags), backend
+            except Exception as exc:
+                print(f"Transformers classification fell back to lightweight: {exc}")
+        else:
+            print("Embedding model unavailable. Fallback to lightweight classification.")
+
+    # 軽量モード: Transformers 依存を使わずに安定動作
+    scored = [predict_category_lightweight(text) for text in texts]
+    tags = [extract_keywords_lightweight(text) for text in texts]
+    return _zip_classification(scored, tags), 'lightweight'
+
+
+def _zip_classification(scored, tags):
+    return [(category, score, text_tags) for (category, score), text_tags in zip(scored, tags)]
+
+
+def _classify_cached_urls(texts_by_cache, engine):
     """
+    CachedURL ごとの分類用テキストを分類する（結果は CachedURL 単位で共有する）
+    - 共有キャッシュ（ClassificationResult）にテキストのハッシュが一致する結果があればそれを使う
+    - 残りだけを _classify_texts でまとめて推論し、共有キャッシュに保存する
+      バッチ全体が失敗したら1件ずつやり直し、失敗したものだけ例外を返す
+    - 設定したエンジンとは別の経路（モデルが使えず軽量版にフォールバック等）で出した結果は保存しない
+      （保存すると、テキストが変わるまで全ユーザーにフォールバックの結果が配られる）
+    - 推論中にフィンガープリントが変わった（推論サーバーが別のモデルで再起動した）場合も保存しない
+    texts_by_cache: {CachedURL ID: テキスト}
+    戻り値: {CachedURL ID: (カテゴリ名, スコア, 推奨タグ) または例外}
+    """
+    fingerprint = classification_fingerprint(engine)
+    digests = {cached_url_id: text_hash(text) for cached_url_id, text in texts_by_cache.items()}
+    results = dict(load_classification_results(digests, fingerprint))
+
+    missing = [cached_url_id for cached_url_id in texts_by_cache if cached_url_id not in results]
+    if not missing:
+        return results
+
+    missing_texts = [texts_by_cache[cached_url_id] for cached_url_id in missing]
     try:
-        # 埋め込みモデルを取得（OpenVINO IR / SentenceTransformers）
-        model, _backend = get_embedding_model_and_backend()
-        if model is None:
-            return predict_category_lightweight(text)
+        batch_results, produced_by = _classify_texts(missing_texts, engine, missing)
+        computed = [(result, produced_by) for result in batch_results]
+    except Exception as e:
+        print(f"Batch classification failed ({e}). Retrying one by one.")
+        computed = []
+        for text, cached_url_id in zip(missing_texts, missing):
+            try:
+                item_results, produced_by = _classify_texts([text], engine, [cached_url_id])
+                computed.append((item_results[0], produced_by))
+            except Exception as item_error:
+                computed.append((item_error, None))
+
+    results.update((cached_url_id, result) for cached_url_id, (result, _produced_by) in zip(missing, computed))
+    if classification_fingerprint(engine) != fingerprint:
+        return results
+    save_classification_results(
+        [
+            (cached_url_id, digests[cached_url_id], result)
+            for cached_url_id, (result, produced_by) in zip(missing, computed)
+            if not isinstance(result, Exception) and _produced_by_engine(produced_by, engine)
+        ],
+        fingerprint,
+    )
+    return results
 
-        # カテゴリ候補を取得
-        categories = settings.AI_CATEGORY_CANDIDATES
 
-        # テキストとカテゴリをベクトル化
-        text_embedding = model.encode(text, convert_to_tensor=True)
-        category_embeddings = get_category_embeddings(model, categories)
+def _produced_by_engine(produced_by, engine):
+    """結果が設定どおりのエンジンで出されたか（transformers 設定で軽量版にフォールバックした結果は False）"""
+    if engine == 'transformers':
+        return produced_by not in (None, 'lightweight')
+    return produced_by == 'lightweight'
 
-        # コサイン類似度を計算（torch / numpy 両対応）
-        try:
-            import torch
-            if isinstance(text_embedding, torch.Tensor):
-                te = text_embedding if text_embedding.ndim == 2 else text_embedding.unsqueeze(0)
-                ce = category_embeddings
-                if not isinstance(ce, torch.Tensor):
-                    ce = torch.as_tensor(ce)
-                te = te / te.norm(dim=1, keepdim=True).clamp(min=1e-9)
-                ce = ce / ce.norm(dim=1, keepdim=True).clamp(min=1e-9)
-                cos_scores = torch.mm(te, ce.transpose(0, 1))[0]
-                max_score, max_idx = cos_scores.max(dim=0)
-                best_category = categories[max_idx.item()]
-                score = float(max_score.item())
-                return best_category, score
-        except Exception:
-            pass
 
-        import numpy as np
-        te = np.asarray(text_embedding, dtype=np.float32)
-        ce = np.asarray(category_embeddings, dtype=np.float32)
-        if te.ndim == 1:
-            te = te[None, :]
-        te = te / np.clip(np.linalg.norm(te, axis=1, keepdims=True), 1e-9, None)
-        ce = ce / np.clip(np.linalg.norm(ce, axis=1, keepdims=True), 1e-9, None)
-        cos_scores = np.matmul(te, ce.T)[0]
-        max_idx = int(np.argmax(cos_scores))
-        best_category = categories[max_idx]
-        score = float(cos_scores[max_idx])
-
-        return best_category, score
+def _bulk_attach_tags(article_tags):
+    """
+    推奨タグを実タグとしてまとめて付与する（Tag の作成と記事への紐づけをそれぞれ bulk_create で1回）
+    article_tags: [(Article, 推奨タグのリスト), ...]
+    """
+    pairs = [
+        (article, tag['name'])
+        for article, tags in article_tags
+        for tag in tags
+        if isinstance(tag, dict) and tag.get('name')
+    ]
+    if not pairs:
+        return
+    wanted = {(article.user_id, name) for article, name in pairs}
+    Tag.objects.bulk_create([Tag(user_id=user_id, name=name) for user_id, name in wanted], ignore_conflicts=True)
+    tag_ids = {
+        (user_id, name): tag_id
+        for tag_id, user_id, name in Tag.objects.filter(
+            user_id__in={user_id for user_id, _name in wanted},
+            name__in={name for _user_id, name in wanted},
+        ).values_list('id', 'user_id', 'name')
+    }
+    through = Article.tags.through
+    through.objects.bulk_create(
+        [
+            through(article_id=article.id, tag_id=tag_ids[(article.user_id, name)])
+            for article, name in pairs
+            if (article.user_id, name) in tag_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+@shared_task
+def classify_articles(article_ids):
+    """
+    記事をまとめて自動分類するタスク（RSSで取り込んだ新規記事・未分類記事の一括再評価など）
+    - 記事とキャッシュは1クエリで読み、推論は CachedURL 単位でバッチにまとめて行う（_classify_cached_urls）
+    - 結果とタグは bulk_update / bulk_create でまとめて書き戻す
+    分類の内容は classify_article と同じ
+    戻り値: {'classified', 'errors'}
+    """
+    articles = list(
+        Article.objects.filter(id__in=list(article_ids)).select_related('cached_url').order_by('id')
+    )
+    if not articles:
+        return {'classified': 0, 'errors': 0}
+    Article.objects.filter(id__in=[article.id for article in articles]).update(classification_status='processing')
+
+    texts = {article.id: _classification_text(article.cached_url) for article in articles}
+    targets = [article for article in articles if texts[article.id]]
+    for article in articles:
+        if not texts[article.id]:
+            # 空なら既定カテゴリで完了扱いにして再試行ループを避ける
+            article.suggested_category = _EMPTY_TEXT_CATEGORY
+            article.suggested_category_score = 0.0
+            article.suggested_tags = []
+            article.classification_status = 'completed'
+            article.classification_error = _EMPTY_TEXT_ERROR
+
+    errors = 0
+    if targets:
+        engine_raw = str(getattr(settings, 'AI_CLASSIFICATION_ENGINE', 'lightweight')).strip().lower()
+        engine = _normalize_engine(engine_raw)
+        if engine_raw != engine:
+            print(f"Invalid AI_CLASSIFICATION_ENGINE='{engine_raw}'. Fallback to 'lightweight'.")
+        results = _classify_cached_urls(
+            {article.cached_url_id: texts[article.id] for article in targets},
+            engine,
+        )
+
+        classified = []
+        for article in targets:
+            result = results[article.cached_url_id]
+            if isinstance(result, Exception):
+                print(f"Error classifying article {article.id}: {result}")
+                errors += 1
+                article.classification_status = 'error'
+                article.classification_error = str(result)
+                continue
+            category, category_score, article_tags = result
+            article.suggested_category = category
+            article.suggested_category_score = category_score
+            article.suggested_tags = article_tags
+            article.classification_status = 'completed'
+            article.classification_error = None
+            classified.append((article, article_tags))
+        _bulk_attach_tags(classified)
+
+    Article.objects.bulk_update(articles, _CLASSIFICATION_FIELDS, batch_size=500)
+    print(f"Batch classified {len(articles) - errors}/{len(articles)} articles")
+    return {'classified': len(articles) - errors, 'errors': errors}
+
+
+def _best_categories(text_embeddings, category_embeddings, categories):
+    """
+    テキスト埋め込み [n, dim] とカテゴリ埋め込みのコサイン類似度を1回の行列積で計算する（torch / numpy 両対応）
+    戻り値: [(カテゴリ名, スコア), ...]（テキストと同じ順序）
+    """
+    try:
+        import torch
+        if isinstance(text_embeddings, torch.Tensor) or isinstance(category_embeddings, torch.Tensor):
+            ce = category_embeddings
+            if not isinstance(ce, torch.Tensor):
+                ce = torch.as_tensor(ce)
+            # 埋め込みストアから読んだ numpy 配列はカテゴリ埋め込みと同じデバイス・型に揃える
+            te = torch.as_tensor(text_embeddings, device=ce.device).to(ce.dtype)
+            te = te if te.ndim == 2 else te.unsqueeze(0)
+            te = te / te.norm(dim=1, keepdim=True).clamp(min=1e-9)
+            ce = ce / ce.norm(dim=1, keepdim=True).clamp(min=1e-9)
+            max_scores, max_indices = torch.mm(te, ce.transpose(0, 1)).max(dim=1)
+            return [
+                (categories[index], float(score))
+                for score, index in zip(max_scores.tolist(), max_indices.tolist())
+            ]
+    except Exception:
+        pass
+
+    import numpy as np
+    te = np.asarray(text_embeddings, dtype=np.float32)
+    ce = np.asarray(category_embeddings, dtype=np.float32)
+    if te.ndim == 1:
+        te = te[None, :]
+    te = te / np.clip(np.linalg.norm(te, axis=1, keepdims=True), 1e-9, None)
+    ce = ce / np.clip(np.linalg.norm(ce, axis=1, keepdims=True), 1e-9, None)
+    cos_scores = np.matmul(te, ce.T)
+    max_indices = np.argmax(cos_scores, axis=1)
+    return [
+        (categories[int(index)], float(cos_scores[row, index]))
+        for row, index in enumerate(max_indices)
+    ]
+
+
+def _sbert_categories(model, backend, texts, cached_url_ids=None):
+    """埋め込みモデルでカテゴリ判定する（失敗時は例外をそのまま投げる）"""
+    # カテゴリ候補を取得
+    categories = settings.AI_CATEGORY_CANDIDATES
+
+    # テキストとカテゴリをベクトル化
+    text_embeddings = _encode_documents(model, backend, texts, cached_url_ids, convert_to_tensor=True)
+    category_embeddings = get_category_embeddings(model, categories)
+    return _best_categories(text_embeddings, category_embeddings, categories)
+
+
+def classify_categories_sbert(texts, cached_url_ids=None):
+    """
+    SBERT で複数テキストとカテゴリ候補の類似度をまとめて計算
+    埋め込みは model.encode(リスト) の1回で求める（cached_url_ids を渡すと埋め込みストアを先に引く）
+    戻り値: [(カテゴリ名, スコア), ...]（texts と同じ順序）
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    try:
+        # 埋め込みモデルを取得（OpenVINO IR / SentenceTransformers）
+        model, backend = get_embedding_model_and_backend()
+        if model is None:
+            return [predict_category_lightweight(text) for text in texts]
+        return _sbert_categories(model, backend, texts, cached_url_ids)
 
     except Exception as exc:
         print(f"classify_category_sbert fallback to lightweight: {exc}")
-        return predict_category_lightweight(text)
+        return [predict_category_lightweight(text) for text in texts]
 
 
-def extract_keywords_openvino(text, model, top_n=5, max_candidates=50):
+def classify_category_sbert(text, cached_url_id=None):
+    """
+    SBERT で入力テキストとカテゴリ候補の類似度を計算
+    戻り値: (カテゴリ名, スコア)
     """
-    OpenVINO IR モデルを使ったKeyBERT相当のキーワード抽出。
-    既存経路（sentence_transformers + KeyBERT）を置き換えるのではなく、
-    openvino_ir バックエンド時のみ呼ばれる専用経路。
+    cached_url_ids = [cached_url_id] if cached_url_id is not None else None
+    return classify_categories_sbert([text], cached_url_ids=cached_url_ids)[0]
 
-    手順:
-      1. fugashi で分かち書き → 候補語リスト生成（名詞・英単語を優先）
-      2. IRモデルで文書全体をベクトル化
-      3. IRモデルで各候補語をバッチベクトル化
-      4. コサイン類似度でランキング → top_n を返す
+
+def _keyword_candidates(text, max_candidates=50):
+    """
+    キーワード候補語を集める（fugashi 形態素解析 or 正規表現フォールバック）
+    大文字小文字を区別せずに重複を除き、最大 max_candidates 件
     """
     import re
-    import numpy as np
 
-    try:
-        # 1. 候補語収集（fugashi 形態素解析 or 正規表現フォールバック）
-        tagger = get_fugashi_tagger()
-        if tagger is not None:
-            candidates = []
-            for word in tagger(text):
-                surface = word.surface.strip()
-                if not surface:
-                    continue
-                pos = ''
+    tagger = get_fugashi_tagger()
+    if tagger is not None:
+        candidates = []
+        for word in tagger(text):
+            surface = word.surface.strip()
+            if not surface:
+                continue
+            pos = ''
+            try:
+                pos = word.feature.pos1  # UniDic
+            except Exception:
+                pass
+            if not pos:
                 try:
-                    pos = word.feature.pos1  # UniDic
+                    pos = word.feature[0]  # IPAdic
                 except Exception:
                     pass
-                if not pos:
-                    try:
-                        pos = word.feature[0]  # IPAdic
-                    except Exception:
-                        pass
-                # 名詞・英語系 or 英数字2文字以上を候補に
-                if len(surface) >= 2 and pos in ('名詞', '英語', ''):
-                    candidates.append(surface)
-                elif re.match(r'^[a-zA-Z][a-zA-Z0-9_-]{1,}$', surface):
-                    candidates.append(surface.lower())
-        else:
-            # fugashi なし: 英単語のみ
-            candidates = re.findall(r'\b[a-zA-Z][a-zA-Z0-9_-]{1,}\b', text)
-
-        # 重複除去・上限
-        seen = set()
-        unique_candidates = []
-        for c in candidates:
-            cl = c.lower()
-            if cl not in seen:
-                seen.add(cl)
-                unique_candidates.append(c)
-        unique_candidates = unique_candidates[:max_candidates]
-
-        if not unique_candidates:
-            return extract_keywords_lightweight(text)
-
-        # 2. 文書ベクトル
-        doc_emb = np.asarray(model.encode(text), dtype=np.float32)
-        if doc_emb.ndim == 1:
-            doc_emb = doc_emb[None, :]
-        doc_norm = np.linalg.norm(doc_emb, axis=1, keepdims=True)
-        doc_emb = doc_emb / np.clip(doc_norm, 1e-9, None)
-
-        # 3. 候補語ベクトル（バッチ処理）
-        cand_embs = np.asarray(model.encode(unique_candidates), dtype=np.float32)
-        if cand_embs.ndim == 1:
-            cand_embs = cand_embs[None, :]
-        cand_norm = np.linalg.norm(cand_embs, axis=1, keepdims=True)
-        cand_embs = cand_embs / np.clip(cand_norm, 1e-9, None)
-
-        # 4. コサイン類似度スコアリング → top_n
-        cos_scores = np.matmul(doc_emb, cand_embs.T)[0]  # shape: (n_candidates,)
-        top_indices = np.argsort(cos_scores)[::-1][:top_n]
+            # 名詞・英語系 or 英数字2文字以上を候補に
+            if len(surface) >= 2 and pos in ('名詞', '英語', ''):
+                candidates.append(surface)
+            elif re.match(r'^[a-zA-Z][a-zA-Z0-9_-]{1,}$', surface):
+                candidates.append(surface.lower())
+    else:
+        # fugashi なし: 英単語のみ
+        candidates = re.findall(r'\b[a-zA-Z][a-zA-Z0-9_-]{1,}\b', text)
+
+    # 重複除去・上限
+    seen = set()
+    unique_candidates = []
+    for c in candidates:
+        cl = c.lower()
+        if cl not in seen:
+            seen.add(cl)
+            unique_candidates.append(c)
+    return unique_candidates[:max_candidates]
+
+
+def _normalize_rows(embeddings):
+    """埋め込みを float32 の [n, dim] にして行ごとに L2 正規化する"""
+    import numpy as np
 
-        result = [
-            {"name": unique_candidates[i], "score": float(cos_scores[i])}
-            for i in top_indices
-            if cos_scores[i] > 0.0
-        ]
-        return result if result else extract_keywords_lightweight(text)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[None, :]
+    return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9, None)
 
-    except Exception as exc:
-        print(f"extract_keywords_openvino failed: {exc}")
-        return extract_keywords_lightweight(text)
 
+# KeyBERT ではなく埋め込みの類似度でキーワードを選ぶバックエンド（KeyBERT は SentenceTransformer 専用）
+_EMBEDDING_KEYWORD_BACKENDS = ('openvino_ir', 'inference_server')
 
-def extract_keywords_keybert(text):
+
+def _encode_terms(model, terms, backend='openvino_ir'):
     """
-    KeyBERT で日本語キーワードを抽出
-    日本語分かち書きは fugashi を使用
-    戻り値: [{"name": "キーワード", "score": 0.95}, ...]
+    候補語（正規化済み）の埋め込みを求める
+    語の埋め込みキャッシュ（term_cache）にない語だけを model.encode(リスト) の1回で推論してキャッシュに入れる
+    戻り値: [len(terms), dim] の配列（terms と同じ順序）
+    """
+    import numpy as np
+
+    cache = get_term_embedding_cache(embedding_model_fingerprint(backend))
+    if cache is None:
+        return model.encode(terms)
+
+    found = cache.get_many(terms)
+    missing = [term for term in terms if term not in found]
+    if missing:
+        encoded = np.asarray(model.encode(missing), dtype=np.float32)
+        if encoded.ndim == 1:
+            encoded = encoded[None, :]
+        cache.put_many(zip(missing, encoded))
+        found.update(zip(missing, encoded))
+    stats = cache.stats()
+    print(
+        f"Term embedding cache: {len(terms) - len(missing)}/{len(terms)} hit "
+        f"(total hit_rate={stats['hit_rate']:.1%}, size={stats['size']})"
+    )
+    return np.stack([found[term] for term in terms])
+
+
+@worker_process_shutdown.connect
+def _flush_term_cache_on_shutdown(**kwargs):
+    """Celery の子プロセス終了時に語の埋め込みキャッシュを保存する（atexit が呼ばれないため）"""
+    flush_term_embedding_cache()
+
+
+def extract_keywords_openvino_batch(texts, model, doc_embeddings=None, top_n=5, max_candidates=50,
+                                    backend='openvino_ir'):
     """
+    OpenVINO IR モデルを使ったKeyBERT相当のキーワード抽出（複数文書をまとめて処理）
+    openvino_ir / inference_server バックエンド時のみ呼ばれる専用経路。
+
+    手順:
+      1. fugashi で分かち書き → 文書ごとに候補語リスト生成（名詞・英単語を優先）
+      2. IRモデルで文書をまとめてベクトル化（doc_embeddings を渡せば再計算しない）
+      3. 全文書の候補語の和集合を1回のバッチでベクトル化（同じ語は1回だけ、埋め込みキャッシュにある語は推論しない）
+      4. 文書 × 候補語のコサイン類似度を1回の行列積で求め、文書ごとに自分の候補語から top_n を返す
+    戻り値: [[{"name": "キーワード", "score": 0.95}, ...], ...]（texts と同じ順序）
+    """
+    texts = list(texts)
+    if not texts:
+        return []
     try:
-        _model, backend = get_embedding_model_and_backend()
-        if backend == 'openvino_ir':
-            # OpenVINO IR 専用経路: IRモデルによる埋め込み類似度でKeyBERT相当を実行
-            return extract_keywords_openvino(text, _model)
-
-        # KeyBERT モデルを取得（初回のみ初期化）
-        kw_model = get_keybert_model()
-        if kw_model is None:
-            # フォールバック
-            return extract_keywords_lightweight(text)
-
-        # 日本語分かち書き
-        wakati_text = tokenize_japanese(text)
-
-        # キーワード抽出（トップ5、単語のみ）
-        keywords = kw_model.extract_keywords(
-            wakati_text,
-            language='japanese',
-            keyphrase_ngram_range=(1, 1),
-            top_n=5,
-            use_mmr=True,
-            diversity=0.3
+        return _embedding_keywords(
+            texts, model, doc_embeddings=doc_embeddings, top_n=top_n, max_candidates=max_candidates, backend=backend,
         )
+    except Exception as exc:
+        print(f"extract_keywords_openvino failed: {exc}")
+        return [extract_keywords_lightweight(text) for text in texts]
+
 
-        # 結果を JSON 形式に変換
-        result_tags = [
-            {"name": kw, "score": float(score)}
-            for kw, score in keywords
+def _embedding_keywords(texts, model, doc_embeddings=None, top_n=5, max_candidates=50, backend='openvino_ir'):
+    """extract_keywords_openvino_batch の本体（失敗時は例外をそのまま投げる）"""
+    import numpy as np
+
+    # 1. 候補語収集（語彙は全文書で共有。表記ゆれは正規化した語でまとめる）
+    vocabulary = {}
+    doc_candidates = []
+    for text in texts:
+        candidates = []
+        for candidate in _keyword_candidates(text, max_candidates):
+            candidates.append((candidate, vocabulary.setdefault(normalize_term(candidate), len(vocabulary))))
+        doc_candidates.append(candidates)
+
+    if not vocabulary:
+        return [extract_keywords_lightweight(text) for text in texts]
+
+    # 2. 文書ベクトル
+    if doc_embeddings is None:
+        doc_embeddings = model.encode(texts)
+    doc_embs = _normalize_rows(doc_embeddings)
+
+    # 3. 候補語ベクトル（和集合のうちキャッシュにない語だけを1バッチ）
+    term_embs = _normalize_rows(_encode_terms(model, list(vocabulary), backend))
+
+    # 4. コサイン類似度スコアリング → 文書ごとに top_n
+    cos_scores = np.matmul(doc_embs, term_embs.T)  # shape: (n_docs, n_terms)
+    results = []
+    for row, (text, candidates) in enumerate(zip(texts, doc_candidates)):
+        if not candidates:
+            results.append(extract_keywords_lightweight(text))
+            continue
+        scores = cos_scores[row, [index for _candidate, index in candidates]]
+        top = np.argsort(scores)[::-1][:top_n]
+        result = [
+            {"name": candidates[i][0], "score": float(scores[i])}
+            for i in top
+            if scores[i] > 0.0
         ]
+        results.append(result if result else extract_keywords_lightweight(text))
+    return results
 
-        return result_tags
+
+def extract_keywords_openvino(text, model, top_n=5, max_candidates=50):
+    """
+    OpenVINO IR モデルを使ったKeyBERT相当のキーワード抽出（1文書）
+    処理は extract_keywords_openvino_batch と同じ
+    """
+    return extract_keywords_openvino_batch([text], model, top_n=top_n, max_candidates=max_candidates)[0]
+
+
+def extract_keywords_keybert_batch(texts):
+    """
+    KeyBERT で複数文書の日本語キーワードをまとめて抽出
+    文書リストを1回の extract_keywords に渡すので、埋め込みは文書・候補語ともにまとめて計算される
+    戻り値: [[{"name": "キーワード", "score": 0.95}, ...], ...]（texts と同じ順序）
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    try:
+        _model, backend = get_embedding_model_and_backend()
+        if backend in _EMBEDDING_KEYWORD_BACKENDS:
+            # OpenVINO IR / 推論サーバー経路: 埋め込み類似度でKeyBERT相当を実行
+            return extract_keywords_openvino_batch(texts, _model, backend=backend)
+        if _model is None:
+            # 指定のバックエンドが使えない（推論サーバーに接続できない等）
+            return [extract_keywords_lightweight(text) for text in texts]
+        return _keybert_keywords(texts)
 
     except Exception:
-        return extract_keywords_lightweight(text)
+        return [extract_keywords_lightweight(text) for text in texts]
+
+
+def _keybert_keywords(texts):
+    """extract_keywords_keybert_batch の本体（KeyBERT が使えない・失敗したときは例外を投げる）"""
+    # KeyBERT モデルを取得（初回のみ初期化）
+    kw_model = get_keybert_model()
+    if kw_model is None:
+        raise RuntimeError('KeyBERT is unavailable')
+
+    # 日本語分かち書き
+    wakati_texts = [tokenize_japanese(text) for text in texts]
+
+    # キーワード抽出（トップ5、単語のみ）
+    keywords = kw_model.extract_keywords(
+        wakati_texts,
+        language='japanese',
+        keyphrase_ngram_range=(1, 1),
+        top_n=5,
+        use_mmr=True,
+        diversity=0.3
+    )
+    # 文書が1件だと KeyBERT は入れ子にしない
+    if len(wakati_texts) == 1:
+        keywords = [keywords]
+
+    # 結果を JSON 形式に変換
+    return [
+        [{"name": kw, "score": float(score)} for kw, score in doc_keywords]
+        for doc_keywords in keywords
+    ]
+
+
+def extract_keywords_keybert(text):
+    """
+    KeyBERT で日本語キーワードを抽出
+    日本語分かち書きは fugashi を使用
+    戻り値: [{"name": "キーワード", "score": 0.95}, ...]
+    """
+    return extract_keywords_keybert_batch([text])[0]
 
 
 def tokenize_japanese(text):
@@ -878,193 +1603,625 @@ def _entry_guid(entry):
     return entry.get('guid') or entry.get('id') or entry.get('link') or None
 
 
-def _local_tag(tag_name):
-    if not tag_name:
-        return ''
-    return tag_name.split('}')[-1].lower()
+class FeedPollDeferred(Exception):
+    """ホストのペース（Crawl-delay 等）を超えるため今回の取得を見送る"""
+
+
+def _wait_for_feed_slot(feed_url):
+    """
+    フィードのホストのトークンを取得する（待ちが短ければ待機、長ければ見送る）
+    robots.txt の Crawl-delay は同期計画（_plan_feed_syncs）の時点でレート制限に反映済み
+    DB には触れないので、並行同期エンジンのスレッドから呼んでよい
+    """
+    wait = get_rate_limiter().try_acquire(feed_url)
+    if wait <= 0:
+        return
+    if wait > float(getattr(settings, 'FETCH_RATE_LIMIT_MAX_INLINE_WAIT', 5)):
+        raise FeedPollDeferred(f"{feed_url} deferred by {wait:.1f}s")
+    time.sleep(wait)
 
 
-def _find_child_text(node, accepted_tags):
-    accepted = {name.lower() for name in accepted_tags}
-    for child in list(node):
-        if _local_tag(child.tag) in accepted:
-            text = (child.text or '').strip()
-            if text:
-                return text
-    return None
+def _download_feed(feed_url, request_headers=None):
+    """
+    フィードを取得する（304 の場合もそのままレスポンスを返す）
+    request_headers: 条件付きGET用のヘッダー
+    """
+    _wait_for_feed_slot(feed_url)
+    headers = {'User-Agent': 'Newsreread-RSS-Bot/1.0', **(request_headers or {})}
+    response = http_get(feed_url, purpose='feed', headers=headers, timeout=15)
+    if is_not_modified(response.status_code, request_headers):
+        return response
+    response.raise_for_status()
+    return response
 
 
-def _find_link(node):
-    for child in list(node):
-        tag = _local_tag(child.tag)
-        if tag != 'link':
-            continue
+def _parse_feed_content(content, known_guids=None):
+    """
+    フィード本文をストリーミング解析し、概要を正規化する（feed_parser.py / textnorm.py）
+    RSS_INCREMENTAL_STOP_AFTER_KNOWN > 0 なら既知の GUID が続いた時点で打ち切る
+    戻り値: (エントリのリスト, 最後まで読んだか)
+    """
+    entries, complete = parse_feed_entries(
+        content,
+        known_guids=known_guids,
+        stop_after_known=int(getattr(settings, 'RSS_INCREMENTAL_STOP_AFTER_KNOWN', 0) or 0) if known_guids else 0,
+        description_max_chars=getattr(settings, 'RSS_DESCRIPTION_MAX_CHARS', DEFAULT_DESCRIPTION_MAX_CHARS),
+    )
+    # 概要の HTML を除去して上限で切り詰める（スクレイピング結果と同じ正規化）
+    for entry in entries:
+        entry['description'] = normalize_description(entry['description'])
+    return entries, complete
 
-        # RSS: <link>https://example.com</link>
-        text_value = (child.text or '').strip()
-        if text_value:
-            return text_value
 
-        # Atom: <link href="https://example.com" rel="alternate" />
-        href = (child.attrib.get('href') or '').strip()
-        if href:
-            return href
+_RSS_CACHED_URL_FIELDS = [
+    'title',
+    'description',
+    'last_scraped_at',
+    'fetch_status',
+    'failure_count',
+    'last_failure_at',
+    'next_retry_at',
+]
 
-    return None
 
+def _feed_rows(entries):
+    """エントリを (link, guid, title, description) に整える（link / guid のないものは除く）"""
+    rows = []
+    for entry in entries:
+        link = entry.get('link')
+        if not link:
+            continue
+        guid = str(_entry_guid(entry) or '').strip()
+        if not guid:
+            continue
+        rows.append((link, guid, entry.get('title'), entry.get('description')))
+    return rows
 
-def _parse_feed_entries(feed_url):
-    headers = {'User-Agent': 'Newsreread-RSS-Bot/1.0'}
-    response = requests.get(feed_url, headers=headers, timeout=15)
-    response.raise_for_status()
 
-    root = ET.fromstring(response.content)
-    parsed_entries = []
+def _ingest_cached_urls(rows):
+    """
+    フィードの行を CachedURL に反映する（購読者数によらずフィードごとに1回）
+    既存行は一括で引き、差分だけ bulk_update する
+    戻り値: {CachedURL ID: GUID}（同じURLが複数あれば後のエントリが優先）
+    """
+    if not rows:
+        return {}
+    caches = resolve_cached_urls(link for link, _guid, _title, _description in rows)
 
-    for node in root.iter():
-        local_name = _local_tag(node.tag)
-        if local_name not in {'item', 'entry'}:
+    # フィードのタイトル・概要で上書き
+    now = timezone.now()
+    changed_caches = {}
+    guid_by_cache = {}
+    for link, guid, entry_title, entry_description in rows:
+        cached_url = caches[link.strip()]
+        guid_by_cache[cached_url.id] = guid
+        changed = False
+        if entry_title and cached_url.title != entry_title:
+            cached_url.title = entry_title
+            changed = True
+        if entry_description and cached_url.description != entry_description:
+            cached_url.description = entry_description
+            changed = True
+        if changed:
+            cached_url.last_scraped_at = now
+            if cached_url.title:
+                cached_url.fetch_status = 'success'
+                cached_url.failure_count = 0
+                cached_url.last_failure_at = None
+                cached_url.next_retry_at = None
+            changed_caches[cached_url.id] = cached_url
+    if changed_caches:
+        CachedURL.objects.bulk_update(list(changed_caches.values()), _RSS_CACHED_URL_FIELDS, batch_size=500)
+        # タイトル・概要が変わったので共有している分類結果・埋め込みを捨てる
+        invalidate_classification(changed_caches)
+    return guid_by_cache
+
+
+def _fan_out_articles(subscriptions, guid_by_cache):
+    """
+    フィードのエントリを購読者全員の Article にまとめて反映する
+    購読者数・エントリ数によらずクエリ数は一定（ユーザー×CachedURL ごとに1件）
+    戻り値: 新規作成した記事IDのリスト
+    """
+    if not subscriptions or not guid_by_cache:
+        return []
+    by_user = {subscription.user_id: subscription for subscription in subscriptions}
+
+    existing = {
+        (article.user_id, article.cached_url_id): article
+        for article in Article.objects.filter(user_id__in=list(by_user), cached_url_id__in=list(guid_by_cache))
+    }
+    to_update = []
+    to_create = []
+    for user_id, subscription in by_user.items():
+        for cache_id, guid in guid_by_cache.items():
+            article = existing.get((user_id, cache_id))
+            if article is None:
+                to_create.append(Article(
+                    user_id=user_id,
+                    cached_url_id=cache_id,
+                    status='unread',
+                    rss_subscription=subscription,
+                    is_from_rss=True,
+                    rss_guid=guid,
+                ))
+                continue
+            if (
+                article.rss_subscription_id != subscription.id
+                or not article.is_from_rss
+                or article.rss_guid != guid
+            ):
+                article.rss_subscription = subscription
+                article.is_from_rss = True
+                article.rss_guid = guid
+                to_update.append(article)
+
+    if to_update:
+        Article.objects.bulk_update(to_update, ['rss_subscription', 'is_from_rss', 'rss_guid'], batch_size=500)
+    if not to_create:
+        return []
+
+    Article.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    created_pairs = {(article.user_id, article.cached_url_id) for article in to_create}
+    return [
+        article_id
+        for article_id, user_id, cache_id in Article.objects.filter(
+            user_id__in={user_id for user_id, _cache_id in created_pairs},
+            cached_url_id__in={cache_id for _user_id, cache_id in created_pairs},
+        ).values_list('id', 'user_id', 'cached_url_id')
+        if (user_id, cache_id) in created_pairs
+    ]
+
+
+def _article_dependents():
+    """
+    記事を参照する行のモデルと外部キー名（問い・アクション・タグの紐づけなど）
+    Article のモデル定義から求めるので、参照するモデルが増えても一覧を直す必要はない
+    記事の削除で CASCADE 以外の動作をする参照には使えない（_prune_unseen_rss_articles は生の DELETE のため）
+    """
+    dependents = []
+    for relation in Article._meta.related_objects:
+        if relation.many_to_many:
             continue
+        if relation.on_delete is not CASCADE:
+            raise ValueError(f'{relation.related_model._meta.label} は CASCADE ではないため生の DELETE で消せません')
+        dependents.append((relation.related_model, relation.field.name))
+    for field in Article._meta.many_to_many:
+        dependents.append((field.remote_field.through, field.m2m_field_name()))
+    return dependents
 
-        link = _find_link(node)
-        guid = _find_child_text(node, {'guid', 'id'}) or link
-        title = _find_child_text(node, {'title'})
-        description = _find_child_text(node, {'description', 'summary', 'content'})
 
-        if not link or not guid:
+def _prune_unseen_rss_articles(subscription_ids, seen_at):
+    """
+    フィードから消えた未読RSS記事（今回の同期で last_seen_in_feed が更新されなかったもの）を削除する
+    - GUID の大きな NOT IN は使わず、(rss_subscription, is_from_rss, status) のインデックスで対象を引く
+    - RSS_PRUNE_CHUNK_SIZE 件ずつ、関連行（_article_dependents）を記事IDで一括削除してから記事を生の DELETE で消す
+      （ORM のコレクターで記事を読み込んで関連を集めない。チャンクごとに1トランザクション）
+    戻り値: 削除した記事数
+    """
+    chunk_size = max(1, int(getattr(settings, 'RSS_PRUNE_CHUNK_SIZE', 500)))
+    stale = Article.objects.filter(
+        rss_subscription_id__in=list(subscription_ids),
+        is_from_rss=True,
+        status='unread',
+    ).filter(
+        Q(last_seen_in_feed__isnull=True) | Q(last_seen_in_feed__lt=seen_at)
+    )
+    dependents = _article_dependents()
+    removed = 0
+    while True:
+        article_ids = list(stale.values_list('id', flat=True)[:chunk_size])
+        if not article_ids:
+            return removed
+        with transaction.atomic():
+            for model, field_name in dependents:
+                model.objects.filter(**{f'{field_name}__in': article_ids})._raw_delete(model.objects.db)
+            removed += Article.objects.filter(id__in=article_ids)._raw_delete(Article.objects.db)
+
+
+def _known_guids(subscriptions):
+    """全購読者が取り込み済みの GUID（差分取り込みモードの打ち切り判定用）"""
+    per_subscription = {subscription.id: set() for subscription in subscriptions}
+    for subscription_id, guid in Article.objects.filter(
+        rss_subscription_id__in=list(per_subscription),
+        is_from_rss=True,
+        rss_guid__isnull=False,
+    ).values_list('rss_subscription_id', 'rss_guid'):
+        per_subscription[subscription_id].add(guid)
+    return set.intersection(*per_subscription.values()) if per_subscription else set()
+
+
+def _attach_feed_sources(subscriptions):
+    """
+    購読をフィードURLごとの FeedSource に紐づける（未設定・フィードURL変更時のみ）
+    subscriptions は select_related('source') 済みであること
+    """
+    pending = [
+        subscription
+        for subscription in subscriptions
+        if subscription.source_id is None or subscription.source.url != subscription.feed_url.strip()
+    ]
+    if not pending:
+        return
+    urls = {subscription.feed_url.strip() for subscription in pending}
+    FeedSource.objects.bulk_create([FeedSource(url=url) for url in urls], ignore_conflicts=True)
+    sources = {source.url: source for source in FeedSource.objects.filter(url__in=urls)}
+    for subscription in pending:
+        subscription.source = sources[subscription.feed_url.strip()]
+        # フィードが変わったので次回は全件取り込む
+        subscription.content_hash = None
+    RSSSubscription.objects.bulk_update(pending, ['source', 'content_hash'])
+
+
+def _mark_feed_unchanged(source, subscriptions, **validators):
+    """
+    変化のなかったフィードの記録（最終取得日時・スキップ回数・新しいバリデータのみ）
+    """
+    now = timezone.now()
+    RSSSubscription.objects.filter(id__in=[subscription.id for subscription in subscriptions]).update(
+        last_fetched_at=now,
+        skipped_sync_count=F('skipped_sync_count') + 1,
+    )
+    # 新着0件として更新頻度の推定に反映する
+    updates = {'last_fetched_at': now, **next_poll_fields(source, 0, now)}
+    for field in ('etag', 'last_modified'):
+        value = validators.get(field)
+        if value and value != getattr(source, field):
+            updates[field] = value
+    FeedSource.objects.filter(pk=source.pk).update(**updates)
+
+
+def _mark_feed_poll_failed(source):
+    """取得・解析に失敗したフィードの次回取得時刻だけ進める"""
+    FeedSource.objects.filter(pk=source.pk).update(**retry_poll_fields(source, timezone.now()))
+
+
+class FeedSyncPlan:
+    """
+    フィード1件分の同期計画（DB から読んだ状態）
+    取得・解析段階（_fetch_feed_plan）はこれだけを見て動き、DB には触れない
+    """
+    def __init__(self, source, subscriptions, request_headers, known_guids=None):
+        self.source = source
+        self.subscriptions = subscriptions
+        self.request_headers = request_headers
+        self.known_guids = known_guids
+
+
+class FeedFetchResult:
+    """
+    取得・解析段階の結果（DB 書き込み段階 _write_feed_sync に渡す）
+    outcome: 'fetched' / 'not_modified' / 'unchanged' / 'deferred' / 'failed'
+    """
+    def __init__(self, outcome, validators=None, content_hash=None, entries=None, complete=True):
+        self.outcome = outcome
+        self.validators = validators or {}
+        self.content_hash = content_hash
+        self.entries = entries or []
+        self.complete = complete
+
+
+def _plan_feed_syncs(source_ids, subscription_ids=None):
+    """
+    フィード群の同期計画を作る（FeedSource と購読はまとめて読む）
+    robots.txt もここでまとめて引き、Crawl-delay をレート制限に反映しておく
+    """
+    sources = FeedSource.objects.in_bulk(list(source_ids))
+    subscriptions = RSSSubscription.objects.filter(source_id__in=list(sources), is_active=True)
+    if subscription_ids is not None:
+        subscriptions = subscriptions.filter(id__in=subscription_ids)
+    by_source = {}
+    for subscription in subscriptions:
+        by_source.setdefault(subscription.source_id, []).append(subscription)
+
+    incremental = bool(getattr(settings, 'RSS_INCREMENTAL_STOP_AFTER_KNOWN', 0))
+    plans = []
+    for source_id in source_ids:
+        source = sources.get(source_id)
+        source_subscriptions = by_source.get(source_id)
+        if source is None or not source_subscriptions:
             continue
+        # 前回の本文をまだ取り込んでいない購読（新規購読など）がいれば、304 では足りないので条件なしで取得する
+        lagging = any(subscription.content_hash != source.content_hash for subscription in source_subscriptions)
+        plans.append(FeedSyncPlan(
+            source,
+            source_subscriptions,
+            {} if lagging else feed_conditional_headers(source),
+            # 差分取り込みモードでは全購読者が取り込み済みの GUID が続いた時点で解析を打ち切る
+            known_guids=_known_guids(source_subscriptions) if incremental else None,
+        ))
+
+    if plans:
+        get_robots_policies([plan.source.url for plan in plans])
+    return plans
+
+
+def _fetch_feed_plan(plan):
+    """
+    取得・解析段階（ネットワークと CPU のみ。DB には触れないのでスレッドから呼べる）
+    - 304 や本文が全購読者の取り込み済みのものと同じなら解析しない
+    """
+    try:
+        response = _download_feed(plan.source.url, plan.request_headers)
+    except FeedPollDeferred as exc:
+        print(f"RSS sync skipped: {exc}")
+        return FeedFetchResult('deferred')
+    except Exception as exc:
+        print(f"Error fetching RSS {plan.source.url}: {exc}")
+        return FeedFetchResult('failed')
+
+    if is_not_modified(response.status_code, plan.request_headers):
+        return FeedFetchResult('not_modified')
 
-        parsed_entries.append(
-            {
-                'link': link,
-                'guid': guid,
-                'title': title,
-                'description': description,
-            }
+    validators = response_validators(response.headers)
+    content_hash = content_digest(response.content)
+    if all(subscription.content_hash == content_hash for subscription in plan.subscriptions):
+        return FeedFetchResult('unchanged', validators=validators, content_hash=content_hash)
+
+    try:
+        entries, complete = _parse_feed_content(response.content, known_guids=plan.known_guids)
+    except Exception as exc:
+        print(f"Error parsing RSS {plan.source.url}: {exc}")
+        return FeedFetchResult('failed', content_hash=content_hash)
+    return FeedFetchResult('fetched', validators, content_hash, entries, complete)
+
+
+def _write_feed_sync(plan, result):
+    """
+    DB 書き込み段階: 取得結果を FeedSource・購読・記事に反映する
+    - feedから消えた未読RSS記事は即物理削除
+    戻り値: ({購読ID: 'synced' / 'not_modified' / 'unchanged' / 'deferred' / 'failed'}, 新規記事IDのリスト, 削除した記事数)
+    """
+    source = plan.source
+    subscriptions = plan.subscriptions
+    if result.outcome in ('deferred', 'failed'):
+        _mark_feed_poll_failed(source)
+        outcomes = {subscription.id: result.outcome for subscription in subscriptions}
+        # 解析だけ失敗した場合も、取り込み済みの購読は変化なし扱い
+        for subscription in subscriptions:
+            if result.content_hash and subscription.content_hash == result.content_hash:
+                outcomes[subscription.id] = 'unchanged'
+        return outcomes, [], 0
+
+    if result.outcome == 'not_modified':
+        _mark_feed_unchanged(source, subscriptions)
+        return {subscription.id: 'not_modified' for subscription in subscriptions}, [], 0
+
+    if result.outcome == 'unchanged':
+        _mark_feed_unchanged(source, subscriptions, **result.validators)
+        return {subscription.id: 'unchanged' for subscription in subscriptions}, [], 0
+
+    content_hash = result.content_hash
+    up_to_date = [subscription for subscription in subscriptions if subscription.content_hash == content_hash]
+    targets = [subscription for subscription in subscriptions if subscription.content_hash != content_hash]
+    outcomes = {subscription.id: 'unchanged' for subscription in up_to_date}
+
+    rows = _feed_rows(result.entries)
+    seen_guids = {guid for _link, guid, _title, _description in rows}
+    now = timezone.now()
+    with transaction.atomic():
+        guid_by_cache = _ingest_cached_urls(rows)
+        new_article_ids = _fan_out_articles(targets, guid_by_cache)
+
+        # 今回フィードに載っていた記事に同期時刻を記録する（フィードから消えた記事の判定用）
+        if guid_by_cache:
+            Article.objects.filter(
+                rss_subscription__in=targets,
+                cached_url_id__in=list(guid_by_cache),
+            ).update(last_seen_in_feed=now)
+
+        # ハッシュは最後まで取り込めた場合のみ保存（途中で失敗したら次回は再処理する）
+        RSSSubscription.objects.filter(id__in=[subscription.id for subscription in targets]).update(
+            last_fetched_at=now,
+            content_hash=content_hash,
         )
+        if up_to_date:
+            RSSSubscription.objects.filter(id__in=[subscription.id for subscription in up_to_date]).update(
+                last_fetched_at=now,
+                skipped_sync_count=F('skipped_sync_count') + 1,
+            )
+        # 前回の取得になかった GUID の数から更新頻度を推定し、次回取得時刻を決める
+        digests = guid_digests(seen_guids)
+        schedule = next_poll_fields(source, count_new_guids(source, digests), now)
+        if not result.complete:
+            digests = sorted(set(digests) | set(source.guid_digests or []))
+        for field, value in schedule.items():
+            setattr(source, field, value)
+        source.guid_digests = digests
+        source.etag = result.validators['etag']
+        source.last_modified = result.validators['last_modified']
+        source.content_hash = content_hash
+        source.last_fetched_at = now
+        source.save(update_fields=[
+            'etag',
+            'last_modified',
+            'content_hash',
+            'last_fetched_at',
+            'guid_digests',
+            *schedule,
+        ])
+
+    # 途中で打ち切った場合はフィードから消えた記事を判定できないので削除しない
+    removed = 0
+    if seen_guids and result.complete:
+        removed = _prune_unseen_rss_articles([subscription.id for subscription in targets], now)
+
+    outcomes.update({subscription.id: 'synced' for subscription in targets})
+    return outcomes, new_article_ids, removed
+
+
+def classify_articles_in_batches(article_ids):
+    """
+    記事の自動分類を AI_CLASSIFY_BATCH_SIZE 件ずつ classify_articles に渡して開始する
+    （eager 時は同期実行、それ以外はタスクとして投入）
+    RSSで取り込んだ新規記事は書き込みのコミット後に呼ぶ
+    """
+    article_ids = list(article_ids)
+    batch_size = max(1, int(getattr(settings, 'AI_CLASSIFY_BATCH_SIZE', 64)))
+    for start in range(0, len(article_ids), batch_size):
+        batch = article_ids[start:start + batch_size]
+        if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+            classify_articles(batch)
+        else:
+            classify_articles.delay(batch)
+
 
-    return parsed_entries
+@shared_task
+def sync_feed_source(source_id, subscription_ids=None):
+    """
+    フィード1件を1回だけ取得・解析し、購読者全員（subscription_ids 指定時はその購読のみ）に反映する
+    戻り値: {購読ID: 'synced' / 'not_modified' / 'unchanged' / 'deferred' / 'failed'}
+    """
+    plans = _plan_feed_syncs([source_id], subscription_ids=subscription_ids)
+    if not plans:
+        return {}
+    plan = plans[0]
+    outcomes, new_article_ids, _removed = _write_feed_sync(plan, _fetch_feed_plan(plan))
+    classify_articles_in_batches(new_article_ids)
+    return outcomes
 
 
 @shared_task
 def sync_single_rss_feed(subscription_id):
     """
-    単一購読のRSSを同期
-    - 新規/更新を反映
-    - feedから消えた未読RSS記事は即物理削除
+    単一購読のRSSを同期（フィードの取得状態は同じURLの購読者と共有）
+    戻り値: 'synced' / 'not_modified' / 'unchanged' / 'deferred' / 'failed'（購読がなければ None）
     """
     try:
-        subscription = RSSSubscription.objects.get(id=subscription_id, is_active=True)
+        subscription = RSSSubscription.objects.select_related('source').get(id=subscription_id, is_active=True)
     except RSSSubscription.DoesNotExist:
-        return
+        return None
 
-    try:
-        entries = _parse_feed_entries(subscription.feed_url)
-    except Exception:
-        return
+    _attach_feed_sources([subscription])
+    return sync_feed_source(subscription.source_id, subscription_ids=[subscription.id]).get(subscription.id)
 
-    seen_guids = set()
 
-    for entry in entries:
-        link = entry.get('link')
-        if not link:
-            continue
+def _active_feed_sources():
+    """有効な購読を FeedSource に紐づけ、{source_id: FeedSource} を返す"""
+    subscriptions = list(RSSSubscription.objects.filter(is_active=True).select_related('source'))
+    _attach_feed_sources(subscriptions)
+    return {subscription.source_id: subscription.source for subscription in subscriptions}
 
-        guid = _entry_guid(entry)
-        if not guid:
-            continue
 
-        guid = str(guid).strip()
-        if not guid:
-            continue
+def _report_feed_sync_cycle(summary):
+    print(
+        f"RSS sync ({summary['trigger']}): feeds={summary['feeds_total']} fetched={summary['feeds_fetched']} "
+        f"skipped={summary['feeds_skipped']} deferred={summary['feeds_deferred']} "
+        f"failed={summary['feeds_failed']} added={summary['entries_added']} "
+        f"removed={summary['entries_removed']} wall={summary['wall_time_seconds']:.2f}s"
+    )
+    return summary
 
-        seen_guids.add(guid)
 
-        cached_url, _ = CachedURL.objects.get_or_create(url=link)
+@shared_task
+def sync_all_rss_feeds():
+    """
+    有効なRSS購読を全件同期（次回取得時刻に関係なく取得する）
+    同じフィードURLの購読はまとめ、並行同期エンジン（feed_sync.py）でフィードごとに1回だけ取得する
+    戻り値: サイクルの集計（FeedSyncCycle と同じ項目）
+    """
+    from .feed_sync import run_feed_sync_cycle
 
-        entry_title = entry.get('title')
-        entry_description = entry.get('description')
+    return _report_feed_sync_cycle(run_feed_sync_cycle(sorted(_active_feed_sources()), trigger='all'))
 
-        changed_fields = []
-        if entry_title and cached_url.title != entry_title:
-            cached_url.title = entry_title
-            changed_fields.append('title')
-        if entry_description and cached_url.description != entry_description:
-            cached_url.description = entry_description
-            changed_fields.append('description')
-
-        if changed_fields:
-            cached_url.last_scraped_at = timezone.now()
-            cached_url.fetch_status = 'success' if cached_url.title else cached_url.fetch_status
-            cached_url.failure_count = 0 if cached_url.title else cached_url.failure_count
-            cached_url.last_failure_at = None if cached_url.title else cached_url.last_failure_at
-            cached_url.next_retry_at = None if cached_url.title else cached_url.next_retry_at
-            changed_fields.append('last_scraped_at')
-            changed_fields.extend(['fetch_status', 'failure_count', 'last_failure_at', 'next_retry_at'])
-            cached_url.save(update_fields=changed_fields)
-
-        article, created = Article.objects.get_or_create(
-            user=subscription.user,
-            cached_url=cached_url,
-            defaults={
-                'status': 'unread',
-                'rss_subscription': subscription,
-                'is_from_rss': True,
-                'rss_guid': guid,
-            }
-        )
 
-        # RSSで取り込んだ新規記事は自動分類を開始
-        if created:
-            if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
-                classify_article(article.id)
-            else:
-                classify_article.delay(article.id)
+@shared_task
+def sync_due_rss_feeds():
+    """
+    次回取得時刻（FeedSource.next_poll_at）を過ぎたフィードだけ同期する（beat から定期実行）
+    取得間隔はフィードごとの更新頻度から feed_schedule.py で決める
+    """
+    from .feed_sync import run_feed_sync_cycle
 
-        if not created:
-            fields_to_update = []
-            if article.rss_subscription_id != subscription.id:
-                article.rss_subscription = subscription
-                fields_to_update.append('rss_subscription')
-            if not article.is_from_rss:
-                article.is_from_rss = True
-                fields_to_update.append('is_from_rss')
-            if article.rss_guid != guid:
-                article.rss_guid = guid
-                fields_to_update.append('rss_guid')
-            if fields_to_update:
-                article.save(update_fields=fields_to_update)
+    now = timezone.now()
+    due_ids = sorted(
+        source_id
+        for source_id, source in _active_feed_sources().items()
+        if source.next_poll_at is None or source.next_poll_at <= now
+    )
+    return _report_feed_sync_cycle(run_feed_sync_cycle(due_ids, trigger='due'))
 
-    if seen_guids:
-        Article.objects.filter(
-            user=subscription.user,
-            rss_subscription=subscription,
-            is_from_rss=True,
-            status='unread',
-        ).exclude(
-            rss_guid__in=seen_guids
-        ).delete()
 
-    subscription.last_fetched_at = timezone.now()
-    subscription.save(update_fields=['last_fetched_at'])
+_OPML_SUCCEEDED_OUTCOMES = ('synced', 'not_modified', 'unchanged')
 
 
 @shared_task
-def sync_all_rss_feeds():
+def validate_opml_import(import_id):
     """
-    有効なRSS購読を全件同期
+    OPML インポートで作成した購読を検証する（初回同期を並行同期エンジンで実行）
+    フィードを1件書き込むたびに OPMLImport の進捗（processed / succeeded / failed / results）を更新する
     """
-    for subscription in RSSSubscription.objects.filter(is_active=True):
-        if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
-            sync_single_rss_feed(subscription.id)
-        else:
-            sync_single_rss_feed.delay(subscription.id)
+    from .feed_sync import run_feed_sync_cycle
+
+    try:
+        job = OPMLImport.objects.get(id=import_id)
+    except OPMLImport.DoesNotExist:
+        print(f"OPMLImport {import_id} not found. Task cancelled.")
+        return None
+
+    OPMLImport.objects.filter(pk=job.pk).update(status='running')
+    results = {}
+
+    def _record(outcomes):
+        results.update({str(subscription_id): outcome for subscription_id, outcome in outcomes.items()})
+        OPMLImport.objects.filter(pk=job.pk).update(
+            processed=len(results),
+            succeeded=sum(1 for outcome in results.values() if outcome in _OPML_SUCCEEDED_OUTCOMES),
+            failed=sum(1 for outcome in results.values() if outcome == 'failed'),
+            results=results,
+        )
+
+    try:
+        subscriptions = list(
+            RSSSubscription.objects.filter(
+                id__in=job.subscription_ids,
+                user_id=job.user_id,
+                is_active=True,
+            ).select_related('source')
+        )
+        _attach_feed_sources(subscriptions)
+        run_feed_sync_cycle(
+            sorted({subscription.source_id for subscription in subscriptions}),
+            trigger='import',
+            subscription_ids=[subscription.id for subscription in subscriptions],
+            on_feed_synced=_record,
+        )
+    except Exception as exc:
+        print(f"Error validating OPML import {import_id}: {exc}")
+        OPMLImport.objects.filter(pk=job.pk).update(status='failed', error=str(exc), finished_at=timezone.now())
+        return results
+
+    OPMLImport.objects.filter(pk=job.pk).update(status='completed', finished_at=timezone.now())
+    return results
+
+
+@shared_task
+def fetch_metadata_batch(cached_url_ids):
+    """
+    CachedURL のバッチを asyncio エンジンで一括取得する
+    """
+    from .fetcher import bulk_fetch_metadata
+
+    stats = bulk_fetch_metadata(cached_url_ids)
+    print(
+        f"Bulk metadata fetch: {stats['fetched']}/{stats['requested']} fetched, "
+        f"success={stats['success']} failed={stats['failed']} not_found={stats['not_found']} "
+        f"disallowed={stats['disallowed']}"
+    )
+    scraper_pool = pool_stats().get('scraper')
+    if scraper_pool:
+        print(
+            f"HTTP pool (scraper): hits={scraper_pool['hits']} misses={scraper_pool['misses']} "
+            f"hit_rate={scraper_pool['hit_rate']:.2f}"
+        )
+    return stats
 
 
 @shared_task
 def retry_pending_metadata(batch_size=100):
     """
     タイトル未取得でリトライ可能なCachedURLを再取得
+    1件ずつタスクを投げず、バッチ単位で fetch_metadata_batch に渡す
     """
     now = timezone.now()
     queryset = CachedURL.objects.filter(
@@ -1073,9 +2230,25 @@ def retry_pending_metadata(batch_size=100):
         Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now)
     )
 
-    targets = queryset.order_by('next_retry_at', 'id')[:batch_size]
-    for cache in targets:
-        if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
-            fetch_article_metadata(cache.id)
-        else:
-            fetch_article_metadata.delay(cache.id)
\ No newline at end of file
+    # ホストの健全性で並べ替えるため多めに候補を取り、正常なホストを先頭にする
+    # （ブレーカー open で試行待ちのホストは今回のバッチから外す）
+    candidates = list(
+        queryset.order_by('next_retry_at', 'id').values_list('id', 'url')[:batch_size * 4]
+    )
+    healths = host_health_map(host_of(url) for _id, url in candidates)
+    ranked = sorted(
+        enumerate(candidates),
+        key=lambda item: (host_priority(healths.get(host_of(item[1][1])), now=now), item[0]),
+    )
+    target_ids = [
+        cache_id
+        for _index, (cache_id, url) in ranked
+        if not is_host_open(healths.get(host_of(url)), now=now)
+    ][:batch_size]
+    if not target_ids:
+        return
+
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        fetch_metadata_batch(target_ids)
+    else:
+        fetch_metadata_batch.delay(target_ids)
@@ -0,0 +1,173 @@
+"""
+キーワード候補語の埋め込みキャッシュ（OpenVINO IR の KeyBERT 相当経路用）
+
+extract_keywords_openvino_batch は記事ごとに最大50件の候補語を IR モデルでベクトル化するが、
+「AI」「Python」「政府」のような語はコーパス全体で何度も現れる。
+- 表記を正規化した語（NFKC + 小文字）をキーに、埋め込みを上限付きの LRU で保持する
+- モデルが変わったら（source が変わったら）作り直す
+- TERM_EMBEDDING_CACHE_DIR を指定すると、モデルごとのファイル（float16 の .npz）に保存し、
+  ワーカーの再起動後も読み込んで使う（新しい語が TERM_EMBEDDING_CACHE_SAVE_EVERY 件たまるごと・プロセス終了時に保存）
+- ヒット率は stats() で確認できる
+"""
+import atexit
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_TERM_EMBEDDING_CACHE_SIZE = 50000
+DEFAULT_TERM_EMBEDDING_CACHE_SAVE_EVERY = 1000
+
+
+def normalize_term(term):
+    """キャッシュのキーにする表記（NFKC + 小文字 + 前後の空白除去）"""
+    return unicodedata.normalize('NFKC', term or '').strip().lower()
+
+
+class TermEmbeddingCache:
+    """語 → 埋め込み（float32 の1次元配列）の LRU キャッシュ（スレッドセーフ）"""
+    def __init__(self, max_entries, path=None, save_every=DEFAULT_TERM_EMBEDDING_CACHE_SAVE_EVERY):
+        self.max_entries = max(1, int(max_entries))
+        self.path = path
+        self.save_every = max(1, int(save_every))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def get_many(self, terms):
+        """保存済みの埋め込みを返す（見つかった語だけ。参照した語は LRU の先頭に移す）"""
+        found = {}
+        with self._lock:
+            for term in terms:
+                embedding = self._entries.get(term)
+                if embedding is None:
+                    continue
+                self._entries.move_to_end(term)
+                found[term] = embedding
+            self.hits += len(found)
+            self.misses += len(terms) - len(found)
+        return found
+
+    def put_many(self, items):
+        """埋め込みを追加し、上限を超えた分は古いものから捨てる"""
+        import numpy as np
+
+        with self._lock:
+            for term, embedding in items:
+                self._entries[term] = np.asarray(embedding, dtype=np.float32)
+                self._entries.move_to_end(term)
+                self._unsaved += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def load(self):
+        """ファイルから読み込む（ファイルがない・壊れている場合は空のまま）"""
+        import numpy as np
+
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                terms = data['terms'].tolist()
+                vectors = data['vectors'].astype(np.float32)
+        except Exception as exc:
+            print(f"Term embedding cache not loaded ({self.path}): {exc}")
+            return
+        with self._lock:
+            for term, vector in zip(terms[-self.max_entries:], vectors[-self.max_entries:]):
+                self._entries[term] = vector
+
+    def save(self):
+        """ファイルに保存する（一時ファイルに書いてから置き換える）"""
+        import numpy as np
+
+        if not self.path:
+            return
+        with self._lock:
+            if not self._entries or not self._unsaved:
+                return
+            terms = list(self._entries)
+            vectors = np.stack(list(self._entries.values())).astype(np.float16)
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, terms=np.array(terms), vectors=vectors)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:
+            print(f"Term embedding cache not saved ({self.path}): {exc}")
+
+
+_term_cache = None
+_term_cache_source = None
+_term_cache_lock = threading.Lock()
+
+
+def get_term_embedding_cache(source):
+    """
+    モデル（source）用のキャッシュを取得する（TERM_EMBEDDING_CACHE_SIZE=0 なら None）
+    source が前回と違えば作り直す
+    """
+    global _term_cache, _term_cache_source
+    max_entries = int(getattr(settings, 'TERM_EMBEDDING_CACHE_SIZE', DEFAULT_TERM_EMBEDDING_CACHE_SIZE) or 0)
+    if max_entries <= 0:
+        return None
+    if _term_cache is not None and _term_cache_source == source:
+        return _term_cache
+
+    with _term_cache_lock:
+        if _term_cache is not None and _term_cache_source == source:
+            return _term_cache
+        if _term_cache is not None:
+            _term_cache.save()
+        directory = str(getattr(settings, 'TERM_EMBEDDING_CACHE_DIR', '') or '').strip()
+        path = None
+        if directory:
+            digest = hashlib.sha256(str(source).encode('utf-8')).hexdigest()[:16]
+            path = os.path.join(directory, f"terms-{digest}.npz")
+        _term_cache = TermEmbeddingCache(
+            max_entries,
+            path=path,
+            save_every=getattr(settings, 'TERM_EMBEDDING_CACHE_SAVE_EVERY', DEFAULT_TERM_EMBEDDING_CACHE_SAVE_EVERY),
+        )
+        _term_cache_source = source
+    return _term_cache
+
+
+def flush_term_embedding_cache():
+    """未保存の語をファイルに書き出す（プロセス終了時）"""
+    if _term_cache is not None:
+        _term_cache.save()
+
+
+def reset_term_embedding_cache():
+    """キャッシュを破棄する（テスト用）"""
+    global _term_cache, _term_cache_source
+    with _term_cache_lock:
+        _term_cache = None
+        _term_cache_source = None
+
+
+atexit.register(flush_term_embedding_cache)
@@ -1,11 +1,86 @@
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
 from unittest.mock import patch
 
+import requests
 from django.contrib.auth.models import User
-from django.test import override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 
-from .models import Article
+from .fetcher import bulk_fetch_metadata, shutdown_parse_executor
+from .http_client import get_session, http_get, pool_stats, reset_sessions
+from .inference_server import InferenceServerError, MicroBatcher, create_server
+from .singleflight import get_flight_tracker, reset_flight_tracker
+from .ratelimit import HostRateLimiter, InMemoryBucketStore, get_rate_limiter, reset_rate_limiter
+from .robots import is_fetch_allowed, reset_robots_cache
+from .feed_parser import parse_feed_entries
+from .opml import parse_opml
+from .embedding_store import export_snapshot, open_snapshot
+from .feed_schedule import count_new_guids, guid_digests, next_poll_fields
+from .term_cache import TermEmbeddingCache, get_term_embedding_cache, reset_term_embedding_cache
+from .textnorm import normalize_text
+from .html_meta import extract_head_metadata, extract_head_metadata_from_bytes, extract_metadata_soup
+from .circuit import check_host, record_host_results
+from .models import (
+	ActionItem,
+	Article,
+	CachedURL,
+	ClassificationResult,
+	FeedSource,
+	FeedSyncCycle,
+	HostHealth,
+	HostRobots,
+	OPMLImport,
+	Question,
+	RSSSubscription,
+	Tag,
+	TextEmbedding,
+	URLAlias,
+)
+from .tasks import (
+	_classify_texts,
+	_mark_fetch_success,
+	classification_fingerprint,
+	classify_article,
+	classify_articles,
+	embedding_model_fingerprint,
+	extract_keywords_openvino_batch,
+	get_embedding_model_and_backend,
+	reset_inference_client,
+	fetch_article_metadata,
+	retry_pending_metadata,
+	sync_all_rss_feeds,
+	sync_due_rss_feeds,
+	sync_single_rss_feed,
+)
+from .urlnorm import canonicalize_url, resolve_cached_url
+
+
+class _FakeResponse:
+	def __init__(self, status_code=200, content=b'', headers=None):
+		self.status_code = status_code
+		self.content = content
+		self.headers = headers or {}
+
+	def iter_content(self, chunk_size=1):
+		for i in range(0, len(self.content), chunk_size):
+			yield self.content[i:i + chunk_size]
+
+	def close(self):
+		pass
+
+	def raise_for_status(self):
+		if self.status_code >= 400:
+			raise requests.HTTPError(f'{self.status_code} error')
 
 
 @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
@@ -34,3 +109,1235 @@ class QuickSaveApiTests(APITestCase):
 
 		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 		self.assertIn('hint', response.data)
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class BulkFetchMetadataTests(APITestCase):
+	def setUp(self):
+		reset_rate_limiter()
+
+	def _fake_get(self, url, **kwargs):
+		if url.endswith('/missing'):
+			return _FakeResponse(status_code=404)
+		html = f'<html><head><title>Title {url[-1]}</title></head><body></body></html>'
+		return _FakeResponse(content=html.encode('utf-8'))
+
+	def test_bulk_fetch_updates_success_and_failure(self):
+		ok = CachedURL.objects.create(url='https://example.com/a')
+		missing = CachedURL.objects.create(url='https://example.com/missing')
+
+		with patch('articles.fetcher.http_get', side_effect=self._fake_get):
+			stats = bulk_fetch_metadata([ok.id, missing.id], concurrency=4, per_host=2)
+
+		ok.refresh_from_db()
+		missing.refresh_from_db()
+		self.assertEqual(stats['success'], 1)
+		self.assertEqual(stats['not_found'], 1)
+		self.assertEqual(ok.title, 'Title a')
+		self.assertEqual(ok.fetch_status, 'success')
+		self.assertEqual(missing.fetch_status, 'not_found')
+		self.assertEqual(missing.failure_count, 1)
+		self.assertIsNotNone(missing.next_retry_at)
+
+	def test_bulk_fetch_writes_only_each_outcomes_fields(self):
+		ok = CachedURL.objects.create(url='https://example.com/a')
+		blocked = CachedURL.objects.create(url='https://blocked.example.com/b', title='Old')
+
+		class BlockedPolicy:
+			def can_fetch(self, url):
+				return False
+
+		def fake_policies(urls, **kwargs):
+			# 取得中に別の処理が更新した値は、不許可の行の書き戻しで消えない
+			CachedURL.objects.filter(id=blocked.id).update(title='Updated elsewhere')
+			return {'blocked.example.com': BlockedPolicy()}
+
+		with patch('articles.fetcher.get_robots_policies', side_effect=fake_policies), \
+				patch('articles.fetcher.http_get', side_effect=self._fake_get):
+			stats = bulk_fetch_metadata([ok.id, blocked.id], concurrency=4, per_host=2)
+
+		blocked.refresh_from_db()
+		self.assertEqual((stats['success'], stats['disallowed']), (1, 1))
+		self.assertEqual(blocked.fetch_status, 'disallowed')
+		self.assertEqual(blocked.title, 'Updated elsewhere')
+
+	@override_settings(METADATA_PARSE_WORKERS=1, METADATA_PARSE_QUEUE_SIZE=1)
+	def test_bulk_fetch_parses_in_process_pool(self):
+		self.addCleanup(shutdown_parse_executor)
+		caches = [CachedURL.objects.create(url=f'https://example{i}.com/{c}') for i, c in enumerate('abcde')]
+
+		with patch('articles.fetcher.http_get', side_effect=self._fake_get):
+			stats = bulk_fetch_metadata([cache.id for cache in caches], concurrency=4, per_host=1)
+
+		self.assertEqual(stats['success'], 5)
+		for cache, c in zip(caches, 'abcde'):
+			cache.refresh_from_db()
+			self.assertEqual(cache.title, f'Title {c}')
+
+
+class HeadMetadataExtractorTests(TestCase):
+	SAMPLES = [
+		(
+			'<html><head><meta property="og:title" content="OG &amp; Title">'
+			'<title>Fallback</title><meta name="description" content="desc">'
+			'<meta property="og:image" content="https://example.com/i.png">'
+			'<meta name="twitter:site" content="@example"></head><body><p>x</p></body></html>'
+		),
+		(
+			'<html><head><title>日本語タイトル</title>'
+			'<meta property="og:description" content="概要">'
+			'<meta property="og:site_name" content="サイト"></head><body></body></html>'
+		),
+		'<html><head></head><body>no meta</body></html>',
+	]
+
+	def test_matches_beautifulsoup_path(self):
+		url = 'https://www.example.com/path'
+		for html in self.SAMPLES:
+			content = html.encode('utf-8')
+			self.assertEqual(
+				extract_head_metadata_from_bytes(content, url),
+				extract_metadata_soup(content, url),
+			)
+
+	def test_stops_reading_after_head(self):
+		consumed = []
+
+		def chunks():
+			consumed.append(1)
+			yield b'<html><head><title>T</title></head>'
+			consumed.append(2)
+			yield b'<body>' + b'x' * 10000 + b'</body></html>'
+			consumed.append(3)
+
+		metadata = extract_head_metadata(chunks(), 'https://example.com/')
+		self.assertEqual(metadata['title'], 'T')
+		self.assertEqual(consumed, [1])
+
+	def test_decodes_meta_charset(self):
+		html = '<html><head><meta charset="shift_jis"><title>ニュース</title></head></html>'
+		metadata = extract_head_metadata_from_bytes(html.encode('shift_jis'), 'https://example.com/')
+		self.assertEqual(metadata['title'], 'ニュース')
+
+
+@override_settings(FETCH_RECENT_WINDOW_SECONDS=0, ROBOTS_TXT_ENABLED=False)
+class ConditionalRevalidationTests(TestCase):
+	def setUp(self):
+		reset_rate_limiter()
+
+	def test_success_stores_validators_and_304_skips_parse(self):
+		cache = CachedURL.objects.create(url='https://example.com/etag')
+		first = _FakeResponse(
+			content=b'<html><head><title>Original</title></head></html>',
+			headers={'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'},
+		)
+		with patch('articles.tasks.http_get', return_value=first):
+			fetch_article_metadata(cache.id)
+
+		cache.refresh_from_db()
+		self.assertEqual(cache.title, 'Original')
+		self.assertEqual(cache.etag, '"v1"')
+		scraped_at = cache.last_scraped_at
+
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(status_code=304)) as mock_get:
+			fetch_article_metadata(cache.id)
+
+		sent_headers = mock_get.call_args.kwargs['headers']
+		self.assertEqual(sent_headers['If-None-Match'], '"v1"')
+		self.assertEqual(sent_headers['If-Modified-Since'], 'Wed, 01 Jan 2025 00:00:00 GMT')
+		cache.refresh_from_db()
+		self.assertEqual(cache.title, 'Original')
+		self.assertEqual(cache.last_http_status, 304)
+		self.assertGreater(cache.last_scraped_at, scraped_at)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		body = b'<html><head><title>ok</title></head></html>'
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/html')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+class PooledSessionTests(TestCase):
+	def setUp(self):
+		reset_sessions()
+		self.server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+		self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+		self.thread.start()
+
+	def tearDown(self):
+		reset_sessions()
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_connections_are_reused_within_process(self):
+		url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+		for _ in range(3):
+			response = http_get(url, purpose='scraper', timeout=5)
+			self.assertEqual(response.status_code, 200)
+
+		stats = pool_stats()['scraper']
+		self.assertEqual(stats['requests'], 3)
+		self.assertEqual(stats['misses'], 1)
+		self.assertEqual(stats['hits'], 2)
+
+	def test_503_is_returned_without_retry(self):
+		hits = []
+
+		class UnavailableHandler(_KeepAliveHandler):
+			def do_GET(self):
+				hits.append(self.path)
+				self.send_response(503)
+				self.send_header('Retry-After', '120')
+				self.send_header('Content-Length', '0')
+				self.end_headers()
+
+		server = ThreadingHTTPServer(('127.0.0.1', 0), UnavailableHandler)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		try:
+			response = http_get(f'http://127.0.0.1:{server.server_address[1]}/', purpose='scraper', timeout=5)
+		finally:
+			server.shutdown()
+			server.server_close()
+
+		self.assertEqual(response.status_code, 503)
+		self.assertEqual(response.headers['Retry-After'], '120')
+		self.assertEqual(len(hits), 1)
+
+	def test_scraper_does_not_retry_connect_errors(self):
+		self.assertEqual(get_session('scraper').get_adapter('https://example.com/').max_retries.connect, 0)
+		self.assertGreater(get_session('feed').get_adapter('https://example.com/').max_retries.connect, 0)
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class HostRateLimitTests(TestCase):
+	def setUp(self):
+		reset_rate_limiter()
+
+	def test_token_bucket_limits_per_host(self):
+		limiter = HostRateLimiter(InMemoryBucketStore(), rate=1.0, burst=2)
+		self.assertEqual(limiter.try_acquire('https://a.example.com/1'), 0)
+		self.assertEqual(limiter.try_acquire('https://a.example.com/2'), 0)
+		self.assertGreater(limiter.try_acquire('https://a.example.com/3'), 0)
+		self.assertEqual(limiter.try_acquire('https://b.example.com/1'), 0)
+
+	def test_429_is_deferred_not_failed(self):
+		cache = CachedURL.objects.create(url='https://throttled.example.com/a')
+		response = _FakeResponse(status_code=429, headers={'Retry-After': '120'})
+		with patch('articles.tasks.http_get', return_value=response):
+			fetch_article_metadata(cache.id)
+
+		cache.refresh_from_db()
+		self.assertEqual(cache.failure_count, 0)
+		self.assertEqual(cache.fetch_status, 'pending')
+		self.assertEqual(cache.last_http_status, 429)
+		self.assertGreater(cache.next_retry_at, timezone.now() + timedelta(seconds=100))
+
+		# ホスト全体がブロックされ、同じホストの他URLも延期される
+		other = CachedURL.objects.create(url='https://throttled.example.com/b')
+		with patch('articles.tasks.http_get') as mock_get:
+			fetch_article_metadata(other.id)
+		mock_get.assert_not_called()
+		other.refresh_from_db()
+		self.assertIsNotNone(other.next_retry_at)
+
+
+@override_settings(HOST_BREAKER_FAILURE_THRESHOLD=2, HOST_BREAKER_COOLDOWN_MINUTES=10)
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class HostCircuitBreakerTests(TestCase):
+	def setUp(self):
+		reset_rate_limiter()
+
+	def test_breaker_opens_and_skips_network(self):
+		record_host_results({'down.example.com': [False, False]})
+		health = HostHealth.objects.get(host='down.example.com')
+		self.assertEqual(health.state, 'open')
+
+		cache = CachedURL.objects.create(url='https://down.example.com/a')
+		with patch('articles.tasks.http_get') as mock_get:
+			fetch_article_metadata(cache.id)
+		mock_get.assert_not_called()
+		cache.refresh_from_db()
+		self.assertEqual(cache.failure_count, 0)
+		self.assertGreaterEqual(cache.next_retry_at, health.next_probe_at)
+
+	def test_half_open_probe_closes_on_success(self):
+		record_host_results({'flaky.example.com': [False, False]})
+		HostHealth.objects.filter(host='flaky.example.com').update(
+			next_probe_at=timezone.now() - timedelta(seconds=1)
+		)
+
+		self.assertEqual(check_host('https://flaky.example.com/a'), (True, None))
+		# 試行中は他のURLを通さない
+		allowed, _retry_at = check_host('https://flaky.example.com/b')
+		self.assertFalse(allowed)
+
+		record_host_results({'flaky.example.com': [True]})
+		self.assertEqual(HostHealth.objects.get(host='flaky.example.com').state, 'closed')
+
+	def test_throttled_single_fetch_is_not_a_host_failure(self):
+		for i in range(3):
+			cache = CachedURL.objects.create(url=f'https://busy.example.com/{i}')
+			reset_rate_limiter()
+			response = _FakeResponse(status_code=503, headers={'Retry-After': '30'})
+			with patch('articles.tasks.http_get', return_value=response):
+				fetch_article_metadata(cache.id)
+
+		self.assertFalse(HostHealth.objects.filter(host='busy.example.com').exists())
+
+	def test_probe_is_released_when_nothing_is_fetched(self):
+		record_host_results({'probe.example.com': [False, False]})
+		probe_at = timezone.now() - timedelta(seconds=1)
+		HostHealth.objects.filter(host='probe.example.com').update(next_probe_at=probe_at)
+
+		# 試行役が 429 で延期されたら、失敗に数えず試行役を返す
+		cache = CachedURL.objects.create(url='https://probe.example.com/a')
+		response = _FakeResponse(status_code=429, headers={'Retry-After': '30'})
+		with patch('articles.tasks.http_get', return_value=response):
+			fetch_article_metadata(cache.id)
+		health = HostHealth.objects.get(host='probe.example.com')
+		self.assertEqual((health.state, health.next_probe_at, health.consecutive_failures), ('open', probe_at, 2))
+		self.assertEqual(check_host('https://probe.example.com/b'), (True, None))
+
+		# 一括取得で全URLが robots.txt で拒否された場合も同じ
+		HostHealth.objects.filter(host='probe.example.com').update(state='open')
+		blocked = CachedURL.objects.create(url='https://probe.example.com/private')
+
+		class BlockedPolicy:
+			def can_fetch(self, url):
+				return False
+
+		with patch('articles.fetcher.get_robots_policies', return_value={'probe.example.com': BlockedPolicy()}), \
+				patch('articles.fetcher.http_get') as mock_get:
+			stats = bulk_fetch_metadata([blocked.id])
+		mock_get.assert_not_called()
+		self.assertEqual(stats['disallowed'], 1)
+		self.assertEqual(HostHealth.objects.get(host='probe.example.com').state, 'open')
+		self.assertEqual(check_host('https://probe.example.com/c'), (True, None))
+
+	def test_bulk_fetch_stops_hitting_host_after_threshold(self):
+		caches = [CachedURL.objects.create(url=f'https://timeout.example.com/{i}') for i in range(4)]
+
+		with patch('articles.fetcher.http_get', side_effect=requests.ConnectionError('down')) as mock_get:
+			stats = bulk_fetch_metadata([cache.id for cache in caches], concurrency=4, per_host=1)
+
+		self.assertEqual(mock_get.call_count, 2)
+		self.assertEqual(stats['failed'], 2)
+		self.assertEqual(stats['deferred'], 2)
+		self.assertEqual(HostHealth.objects.get(host='timeout.example.com').state, 'open')
+
+	def test_retry_pending_puts_healthy_hosts_first(self):
+		record_host_results({'down.example.com': [False, False]})
+		record_host_results({'shaky.example.com': [False]})
+		shaky = CachedURL.objects.create(url='https://shaky.example.com/a')
+		CachedURL.objects.create(url='https://down.example.com/a')
+		healthy = CachedURL.objects.create(url='https://ok.example.com/a')
+
+		with patch('articles.tasks.fetch_metadata_batch') as mock_batch:
+			retry_pending_metadata()
+		self.assertEqual(mock_batch.call_args.args[0], [healthy.id, shaky.id])
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class URLCanonicalizationTests(TestCase):
+	def test_canonicalize_strips_tracking_and_normalizes(self):
+		self.assertEqual(
+			canonicalize_url('HTTPS://News.Example.COM:443/a/b/?id=3&utm_source=x&UTM_Medium=y&fbclid=z#top'),
+			'https://news.example.com/a/b?id=3',
+		)
+		self.assertEqual(canonicalize_url('https://example.com'), 'https://example.com/')
+		self.assertEqual(canonicalize_url('https://example.com/p?q=a%20b'), 'https://example.com/p?q=a%20b')
+
+	def test_variants_resolve_to_one_cached_url(self):
+		first, created = resolve_cached_url('https://example.com/post/?utm_source=twitter')
+		self.assertTrue(created)
+		self.assertEqual(first.url, 'https://example.com/post')
+
+		for variant in (
+			'https://example.com/post',
+			'https://EXAMPLE.com/post/#comments',
+			'http://example.com/post?utm_campaign=rss',
+		):
+			cache, created = resolve_cached_url(variant)
+			self.assertFalse(created)
+			self.assertEqual(cache.id, first.id)
+		self.assertEqual(CachedURL.objects.count(), 1)
+
+	def test_redirect_target_becomes_alias(self):
+		reset_rate_limiter()
+		short, _ = resolve_cached_url('https://sho.rt/abc')
+		response = _FakeResponse(content=b'<html><head><title>Long</title></head></html>')
+		response.url = 'https://long.example.com/article?utm_source=short'
+		with patch('articles.tasks.http_get', return_value=response):
+			fetch_article_metadata(short.id)
+
+		self.assertTrue(URLAlias.objects.filter(alias_url='https://long.example.com/article').exists())
+		cache, created = resolve_cached_url('https://long.example.com/article')
+		self.assertFalse(created)
+		self.assertEqual(cache.id, short.id)
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class SingleFlightFetchTests(TestCase):
+	def setUp(self):
+		reset_rate_limiter()
+		reset_flight_tracker()
+
+	def test_concurrent_caller_attaches_to_in_flight_fetch(self):
+		cache = CachedURL.objects.create(url='https://trending.example.com/a')
+
+		def fake_get(url, **kwargs):
+			# 取得中に別ユーザーが同じURLを保存した
+			fetch_article_metadata(cache.id, article_id=2)
+			return _FakeResponse(content=b'<html><head><title>Trending</title></head></html>')
+
+		with patch('articles.tasks.http_get', side_effect=fake_get) as mock_get, \
+				patch('articles.tasks.classify_article') as mock_classify:
+			fetch_article_metadata(cache.id, article_id=1)
+
+		self.assertEqual(mock_get.call_count, 1)
+		self.assertEqual([c.args[0] for c in mock_classify.call_args_list], [1, 2])
+		self.assertIsNotNone(get_flight_tracker().join(cache.id))
+
+	def test_recently_fetched_url_is_not_refetched(self):
+		cache = CachedURL.objects.create(
+			url='https://trending.example.com/b', title='Done', fetch_status='success', last_http_status=200,
+		)
+
+		with patch('articles.tasks.http_get') as mock_get, \
+				patch('articles.tasks.classify_article') as mock_classify:
+			fetch_article_metadata(cache.id, article_id=3)
+
+		mock_get.assert_not_called()
+		mock_classify.assert_called_once_with(3)
+
+		# rescrape（force）は直近の取得に関係なく取得し直す
+		page = _FakeResponse(content=b'<html><head><title>Again</title></head></html>')
+		with patch('articles.tasks.http_get', return_value=page) as mock_get, \
+				patch('articles.tasks.classify_article'):
+			fetch_article_metadata(cache.id, article_id=3, force=True)
+		mock_get.assert_called_once()
+		cache.refresh_from_db()
+		self.assertEqual(cache.title, 'Again')
+
+	def test_rss_ingested_url_is_still_scraped(self):
+		# RSS の取り込みはタイトル・概要だけを success で入れる（ページは未取得）
+		cache = CachedURL.objects.create(url='https://trending.example.com/c', title='From feed', fetch_status='success')
+		page = _FakeResponse(content=b'<html><head><title>Page</title><meta property="og:site_name" content="Trend"></head></html>')
+
+		with patch('articles.tasks.http_get', return_value=page) as mock_get:
+			fetch_article_metadata(cache.id)
+
+		mock_get.assert_called_once()
+		cache.refresh_from_db()
+		self.assertEqual(cache.site_name, 'Trend')
+
+
+class RobotsTxtTests(TestCase):
+	ROBOTS = b'User-agent: *\nDisallow: /private/\nCrawl-delay: 10\n'
+
+	def setUp(self):
+		reset_rate_limiter()
+		reset_robots_cache()
+
+	def test_disallowed_url_is_marked_without_fetching(self):
+		blocked = CachedURL.objects.create(url='https://robots.example.com/private/a')
+		allowed = CachedURL.objects.create(url='https://robots.example.com/public/b')
+
+		with patch('articles.robots.http_get', return_value=_FakeResponse(content=self.ROBOTS)) as mock_robots, \
+				patch('articles.tasks.http_get', return_value=_FakeResponse(
+					content=b'<html><head><title>Public</title></head></html>',
+				)) as mock_get:
+			fetch_article_metadata(blocked.id)
+			fetch_article_metadata(allowed.id)
+
+		self.assertEqual(mock_robots.call_count, 1)
+		self.assertEqual(mock_get.call_count, 1)
+		blocked.refresh_from_db()
+		self.assertEqual(blocked.fetch_status, 'disallowed')
+		self.assertEqual(blocked.failure_count, 0)
+		self.assertIsNotNone(blocked.next_retry_at)
+		self.assertEqual(HostRobots.objects.get(host='robots.example.com').crawl_delay, 10)
+
+		# Crawl-delay: 10 の間はバーストを許さず、続けて取得すると約10秒待ち
+		limiter = get_rate_limiter()
+		waits = [limiter.try_acquire(allowed.url) for _ in range(2)]
+		self.assertGreater(waits[1], 5)
+
+	def test_missing_robots_is_cached_as_allow_all(self):
+		with patch('articles.robots.http_get', return_value=_FakeResponse(status_code=404)) as mock_robots:
+			self.assertTrue(is_fetch_allowed('https://norobots.example.com/a'))
+			reset_robots_cache()
+			self.assertTrue(is_fetch_allowed('https://norobots.example.com/b'))
+
+		self.assertEqual(mock_robots.call_count, 1)
+		self.assertEqual(HostRobots.objects.get(host='norobots.example.com').status, 'missing')
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class FeedUnchangedSkipTests(TestCase):
+	FEED = (
+		b'<?xml version="1.0"?><rss><channel>'
+		b'<item><title>One</title><link>https://news.example.com/1</link><guid>g1</guid></item>'
+		b'<item><title>Two</title><link>https://news.example.com/2</link><guid>g2</guid></item>'
+		b'</channel></rss>'
+	)
+
+	def setUp(self):
+		reset_rate_limiter()
+		user = User.objects.create_user(username='reader', password='pass1234')
+		self.subscription = RSSSubscription.objects.create(user=user, name='News', feed_url='https://news.example.com/rss')
+
+	def _sync(self, response):
+		with patch('articles.tasks.http_get', return_value=response) as mock_get, \
+				patch('articles.tasks.classify_articles'):
+			outcome = sync_single_rss_feed(self.subscription.id)
+		return outcome, mock_get
+
+	def test_same_body_skips_parsing(self):
+		self.assertEqual(self._sync(_FakeResponse(content=self.FEED))[0], 'synced')
+		self.assertEqual(Article.objects.filter(rss_subscription=self.subscription).count(), 2)
+
+		with patch('articles.tasks._parse_feed_content') as mock_parse:
+			outcome, _ = self._sync(_FakeResponse(content=self.FEED))
+		self.assertEqual(outcome, 'unchanged')
+		mock_parse.assert_not_called()
+		self.subscription.refresh_from_db()
+		self.assertEqual(self.subscription.skipped_sync_count, 1)
+
+	def test_not_modified_uses_stored_validators(self):
+		self._sync(_FakeResponse(content=self.FEED, headers={'ETag': '"feed-v1"'}))
+
+		outcome, mock_get = self._sync(_FakeResponse(status_code=304))
+		self.assertEqual(outcome, 'not_modified')
+		self.assertEqual(mock_get.call_args.kwargs['headers']['If-None-Match'], '"feed-v1"')
+		self.subscription.refresh_from_db()
+		self.assertEqual(self.subscription.skipped_sync_count, 1)
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class FeedBulkIngestTests(TestCase):
+	def setUp(self):
+		reset_rate_limiter()
+		self.user = User.objects.create_user(username='bulk', password='pass1234')
+
+	def _feed(self, count, prefix='n'):
+		items = ''.join(
+			f'<item><title>T{i}</title><link>https://bulk.example.com/{prefix}{i}?utm_source=rss</link>'
+			f'<guid>{prefix}{i}</guid></item>'
+			for i in range(count)
+		)
+		return f'<rss><channel>{items}</channel></rss>'.encode('utf-8')
+
+	def _sync_queries(self, subscription, content):
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(content=content)), \
+				patch('articles.tasks.classify_articles') as mock_classify, \
+				CaptureQueriesContext(connection) as queries:
+			sync_single_rss_feed(subscription.id)
+		return len(queries), mock_classify
+
+	def test_query_count_is_constant_in_entries(self):
+		small = RSSSubscription.objects.create(user=self.user, name='S', feed_url='https://bulk.example.com/s')
+		large = RSSSubscription.objects.create(user=self.user, name='L', feed_url='https://bulk.example.com/l')
+
+		small_queries, _ = self._sync_queries(small, self._feed(3, 's'))
+		large_queries, mock_classify = self._sync_queries(large, self._feed(40, 'l'))
+
+		self.assertEqual(small_queries, large_queries)
+		mock_classify.assert_called_once()
+		self.assertEqual(len(mock_classify.call_args.args[0]), 40)
+		self.assertEqual(Article.objects.filter(rss_subscription=large).count(), 40)
+		self.assertTrue(CachedURL.objects.filter(url='https://bulk.example.com/l0', title='T0').exists())
+		self.assertTrue(URLAlias.objects.filter(alias_url='https://bulk.example.com/l0?utm_source=rss').exists())
+
+	def test_resync_updates_existing_rows_without_duplicates(self):
+		subscription = RSSSubscription.objects.create(user=self.user, name='R', feed_url='https://bulk.example.com/r')
+		self._sync_queries(subscription, self._feed(5, 'r'))
+		_queries, mock_classify = self._sync_queries(subscription, self._feed(5, 'r') + b' ')
+
+		mock_classify.assert_not_called()
+		self.assertEqual(Article.objects.filter(rss_subscription=subscription).count(), 5)
+		self.assertEqual(CachedURL.objects.filter(url__startswith='https://bulk.example.com/r').count(), 5)
+
+
+class StreamingFeedParserTests(TestCase):
+	ATOM = (
+		b'<?xml version="1.0" encoding="utf-8"?>'
+		b'<feed xmlns="http://www.w3.org/2005/Atom"><title>Feed</title>'
+		b'<entry><title>A</title><link rel="alternate" href="https://atom.example.com/a"/>'
+		b'<id>urn:a</id><summary>short</summary></entry>'
+		b'<entry><title>B</title><link href="https://atom.example.com/b"/></entry>'
+		b'</feed>'
+	)
+
+	def test_parses_rss_and_atom(self):
+		entries, complete = parse_feed_entries(self.ATOM)
+		self.assertTrue(complete)
+		self.assertEqual(entries, [
+			{'link': 'https://atom.example.com/a', 'guid': 'urn:a', 'title': 'A', 'description': 'short'},
+			{'link': 'https://atom.example.com/b', 'guid': 'https://atom.example.com/b', 'title': 'B', 'description': None},
+		])
+
+		rss = (
+			'<rss xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel>'
+			'<item><title>R</title><link>https://rss.example.com/r</link><guid>r1</guid>'
+			f'<description>{"x" * 50}</description><content:encoded>{"y" * 1000}</content:encoded></item>'
+			'</channel></rss>'
+		).encode('utf-8')
+		entries, _complete = parse_feed_entries(rss, description_max_chars=10)
+		self.assertEqual(entries[0]['description'], 'x' * 10)
+		self.assertEqual(entries[0]['guid'], 'r1')
+
+	def test_incremental_mode_stops_on_known_guids(self):
+		items = ''.join(f'<item><link>https://inc.example.com/{i}</link><guid>g{i}</guid></item>' for i in range(10))
+		content = f'<rss><channel>{items}</channel></rss>'.encode('utf-8')
+
+		entries, complete = parse_feed_entries(content, known_guids={'g2', 'g3', 'g4'}, stop_after_known=2)
+		self.assertFalse(complete)
+		self.assertEqual([entry['guid'] for entry in entries], ['g0', 'g1', 'g2', 'g3'])
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False)
+class SharedFeedSourceTests(TestCase):
+	FEED = (
+		b'<rss><channel>'
+		b'<item><title>Shared</title><link>https://shared.example.com/1</link><guid>s1</guid></item>'
+		b'</channel></rss>'
+	)
+
+	def setUp(self):
+		reset_rate_limiter()
+
+	def test_feed_is_fetched_once_and_fanned_out(self):
+		subscriptions = [
+			RSSSubscription.objects.create(
+				user=User.objects.create_user(username=f'fan{i}', password='pass1234'),
+				name='Shared',
+				feed_url='https://shared.example.com/rss',
+			)
+			for i in range(3)
+		]
+
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(content=self.FEED)) as mock_get, \
+				patch('articles.tasks.classify_articles'):
+			sync_all_rss_feeds()
+
+		self.assertEqual(mock_get.call_count, 1)
+		self.assertEqual(CachedURL.objects.filter(url='https://shared.example.com/1').count(), 1)
+		for subscription in subscriptions:
+			self.assertEqual(Article.objects.filter(rss_subscription=subscription, rss_guid='s1').count(), 1)
+
+		# 後から購読したユーザーには、フィードが変わっていなくても全件取り込む
+		late = RSSSubscription.objects.create(
+			user=User.objects.create_user(username='late', password='pass1234'),
+			name='Shared',
+			feed_url='https://shared.example.com/rss',
+		)
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(content=self.FEED)) as mock_get, \
+				patch('articles.tasks.classify_articles'):
+			sync_all_rss_feeds()
+
+		self.assertEqual(mock_get.call_count, 1)
+		self.assertEqual(Article.objects.filter(rss_subscription=late).count(), 1)
+		subscriptions[0].refresh_from_db()
+		self.assertEqual(subscriptions[0].skipped_sync_count, 1)
+
+
+@override_settings(RSS_POLL_MIN_MINUTES=15, RSS_POLL_MAX_MINUTES=1440, RSS_POLL_JITTER=0, ROBOTS_TXT_ENABLED=False)
+class AdaptivePollingTests(TestCase):
+	def test_interval_follows_publish_rate(self):
+		now = timezone.now()
+		fast = FeedSource(url='https://fast.example.com/rss', last_fetched_at=now - timedelta(minutes=15))
+		fields = next_poll_fields(fast, 3, now)
+		self.assertEqual(fields['poll_interval_seconds'], 15 * 60)
+
+		# 新着が途絶えたフィードは1回につき最大2倍ずつ上限まで伸びる
+		quiet = FeedSource(
+			url='https://quiet.example.com/rss',
+			last_fetched_at=now - timedelta(hours=1),
+			poll_interval_seconds=3600,
+			publish_rate_per_hour=0.01,
+		)
+		intervals = []
+		for _ in range(8):
+			fields = next_poll_fields(quiet, 0, now)
+			for name, value in fields.items():
+				setattr(quiet, name, value)
+			intervals.append(quiet.poll_interval_seconds)
+		self.assertEqual(intervals[0], 7200)
+		self.assertEqual(intervals[-1], 1440 * 60)
+		self.assertEqual(quiet.next_poll_at, now + timedelta(minutes=1440))
+
+	def test_empty_feed_backs_off(self):
+		now = timezone.now()
+		source = FeedSource(url='https://empty.example.com/rss')
+		self.assertIsNone(count_new_guids(source, []))
+
+		# 前回の取得でエントリが0件だったフィードも、新着0件として間隔を伸ばす
+		source.last_fetched_at = now - timedelta(minutes=15)
+		source.poll_interval_seconds = 15 * 60
+		source.guid_digests = []
+		self.assertEqual(count_new_guids(source, []), 0)
+		self.assertEqual(count_new_guids(source, guid_digests(['a'])), 1)
+		fields = next_poll_fields(source, count_new_guids(source, []), now)
+		self.assertEqual(fields['poll_interval_seconds'], 30 * 60)
+
+	def test_only_due_sources_are_synced(self):
+		reset_rate_limiter()
+		user = User.objects.create_user(username='poller', password='pass1234')
+		due = RSSSubscription.objects.create(user=user, name='Due', feed_url='https://due.example.com/rss')
+		later = RSSSubscription.objects.create(user=user, name='Later', feed_url='https://later.example.com/rss')
+		later.source = FeedSource.objects.create(url=later.feed_url, next_poll_at=timezone.now() + timedelta(hours=1))
+		later.save(update_fields=['source'])
+
+		feed = b'<rss><channel><item><link>https://due.example.com/1</link><guid>d1</guid></item></channel></rss>'
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(content=feed)) as mock_get, \
+				patch('articles.tasks.classify_articles'):
+			sync_due_rss_feeds()
+
+		self.assertEqual([c.args[0] for c in mock_get.call_args_list], ['https://due.example.com/rss'])
+		due.refresh_from_db()
+		self.assertGreater(due.source.next_poll_at, timezone.now())
+		self.assertEqual(len(due.source.guid_digests), 1)
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False, RSS_SYNC_CONCURRENCY=8, RSS_SYNC_PER_HOST=2, FETCH_HOST_RATE=100)
+class FeedSyncEngineTests(TestCase):
+	def setUp(self):
+		reset_rate_limiter()
+		self.user = User.objects.create_user(username='engine', password='pass1234')
+
+	def test_cycle_respects_host_limit_and_records_summary(self):
+		for i in range(6):
+			RSSSubscription.objects.create(user=self.user, name=f'A{i}', feed_url=f'https://busy.example.com/{i}.xml')
+		RSSSubscription.objects.create(user=self.user, name='Down', feed_url='https://down.example.com/rss')
+
+		lock = threading.Lock()
+		active = {}
+		peak = {}
+
+		def fake_get(url, **kwargs):
+			host = url.split('/')[2]
+			with lock:
+				active[host] = active.get(host, 0) + 1
+				peak[host] = max(peak.get(host, 0), active[host])
+			try:
+				time.sleep(0.02)
+				if host == 'down.example.com':
+					return _FakeResponse(status_code=503)
+				name = url.rsplit('/', 1)[-1]
+				return _FakeResponse(content=(
+					f'<rss><channel><item><link>https://busy.example.com/a/{name}</link>'
+					f'<guid>{name}</guid></item></channel></rss>'
+				).encode('utf-8'))
+			finally:
+				with lock:
+					active[host] -= 1
+
+		with patch('articles.tasks.http_get', side_effect=fake_get), \
+				patch('articles.tasks.classify_articles'):
+			summary = sync_all_rss_feeds()
+
+		self.assertLessEqual(peak['busy.example.com'], 2)
+		cycle = FeedSyncCycle.objects.get()
+		self.assertEqual(cycle.trigger, 'all')
+		self.assertEqual((cycle.feeds_total, cycle.feeds_fetched, cycle.feeds_failed), (7, 6, 1))
+		self.assertEqual(cycle.entries_added, 6)
+		self.assertEqual(summary['entries_added'], 6)
+		self.assertGreater(cycle.wall_time_seconds, 0)
+
+		# 2回目は本文が同じなのでスキップとして数える
+		with patch('articles.tasks.http_get', side_effect=fake_get), \
+				patch('articles.tasks.classify_articles'):
+			sync_all_rss_feeds()
+		latest = FeedSyncCycle.objects.first()
+		self.assertEqual((latest.feeds_skipped, latest.feeds_failed, latest.entries_added), (6, 1, 0))
+
+
+class _FakeEmbeddingModel:
+	"""カテゴリ名・記事テキストに含まれる語で決まる埋め込みを返す"""
+	def __init__(self, categories):
+		self.categories = categories
+		self.calls = []
+
+	def encode(self, texts, convert_to_tensor=False):
+		import numpy as np
+
+		self.calls.append(texts)
+		single = isinstance(texts, str)
+		rows = [
+			[1.0 if category in text else 0.01 for category in self.categories]
+			for text in ([texts] if single else texts)
+		]
+		embeddings = np.asarray(rows, dtype=np.float32)
+		return embeddings[0] if single else embeddings
+
+
+@override_settings(AI_CLASSIFICATION_ENGINE='transformers', AI_CATEGORY_CANDIDATES=['政治', '科学', 'スポーツ'])
+class BatchClassificationTests(TestCase):
+	def test_batch_is_encoded_once_and_written_in_bulk(self):
+		user = User.objects.create_user(username='batch', password='pass1234')
+		texts = ['政治 ニュース', '科学 の発見', 'スポーツ 結果']
+		articles = [
+			Article.objects.create(
+				user=user,
+				cached_url=CachedURL.objects.create(url=f'https://batch.example.com/{i}', title=text),
+			)
+			for i, text in enumerate(texts)
+		]
+		model = _FakeEmbeddingModel(['政治', '科学', 'スポーツ'])
+
+		with patch('articles.tasks.get_embedding_model_and_backend', return_value=(model, 'sentence_transformers')), \
+				patch('articles.tasks._keybert_keywords',
+					side_effect=lambda texts: [[{'name': 'ニュース', 'score': 0.5}] for _ in texts]):
+			stats = classify_articles([article.id for article in articles])
+
+		self.assertEqual(stats, {'classified': 3, 'errors': 0})
+		# カテゴリ埋め込みを除くと、記事テキストの encode はバッチ全体で1回
+		self.assertEqual([call for call in model.calls if call != model.categories], [texts])
+		results = {article.id: article for article in Article.objects.filter(user=user)}
+		self.assertEqual(
+			[results[article.id].suggested_category for article in articles],
+			['政治', '科学', 'スポーツ'],
+		)
+		self.assertTrue(all(results[article.id].classification_status == 'completed' for article in articles))
+		self.assertEqual(Tag.objects.filter(user=user, name='ニュース').count(), 1)
+		self.assertEqual(results[articles[0].id].tags.count(), 1)
+
+	def test_embeddings_are_reused_until_text_changes(self):
+		user = User.objects.create_user(username='store', password='pass1234')
+		caches = [
+			CachedURL.objects.create(url=f'https://store.example.com/{i}', title=title)
+			for i, title in enumerate(['政治 ニュース', '科学 の発見'])
+		]
+		articles = [Article.objects.create(user=user, cached_url=cache) for cache in caches]
+		model = _FakeEmbeddingModel(['政治', '科学', 'スポーツ'])
+
+		def classify():
+			model.calls.clear()
+			with patch('articles.tasks.get_embedding_model_and_backend', return_value=(model, 'sentence_transformers')), \
+					patch('articles.tasks._keybert_keywords', side_effect=lambda texts: [[] for _ in texts]):
+				classify_articles([article.id for article in articles])
+			return [call for call in model.calls if call != model.categories]
+
+		self.assertEqual(classify(), [['政治 ニュース', '科学 の発見']])
+		self.assertEqual(TextEmbedding.objects.count(), 2)
+		self.assertEqual(classify(), [])
+
+		caches[1].title = 'スポーツ 結果'
+		caches[1].save(update_fields=['title'])
+		self.assertEqual(classify(), [['スポーツ 結果']])
+		self.assertEqual(TextEmbedding.objects.count(), 2)
+		self.assertEqual(Article.objects.get(id=articles[1].id).suggested_category, 'スポーツ')
+
+		with tempfile.TemporaryDirectory() as directory:
+			fingerprint = TextEmbedding.objects.values_list('model_fingerprint', flat=True).first()
+			manifest = export_snapshot(directory, fingerprint, chunk_size=1)
+			_manifest, ids, vectors = open_snapshot(directory)
+			self.assertEqual((manifest['count'], manifest['dim']), (2, 3))
+			self.assertEqual(sorted(ids.tolist()), sorted(cache.id for cache in caches))
+			self.assertEqual(str(vectors.dtype), 'float16')
+			self.assertEqual(vectors.shape, (2, 3))
+
+	@override_settings(AI_CATEGORY_CANDIDATES=['python', 'rust', 'golang'])
+	def test_openvino_path_shares_document_embeddings_with_keywords(self):
+		reset_term_embedding_cache()
+		self.addCleanup(reset_term_embedding_cache)
+		texts = ['python tips', 'rust tips', 'golang tips']
+		model = _FakeEmbeddingModel(['python', 'rust', 'golang'])
+
+		with patch('articles.tasks.get_embedding_model_and_backend', return_value=(model, 'openvino_ir')), \
+				patch('articles.tasks.get_fugashi_tagger', return_value=None):
+			results, produced_by = _classify_texts(texts, 'transformers')
+
+		self.assertEqual([category for category, _score, _tags in results], ['python', 'rust', 'golang'])
+		self.assertEqual([tags[0]['name'] for _category, _score, tags in results], ['python', 'rust', 'golang'])
+		# 文書の encode は1回、候補語は全文書の和集合（重複なし）を1回
+		self.assertEqual(
+			[call for call in model.calls if call != model.categories],
+			[texts, ['python', 'tips', 'rust', 'golang']],
+		)
+
+	def test_term_embeddings_are_cached_and_persisted(self):
+		reset_term_embedding_cache()
+		self.addCleanup(reset_term_embedding_cache)
+		model = _FakeEmbeddingModel(['python', 'rust', 'golang'])
+
+		def term_calls(texts):
+			model.calls.clear()
+			with patch('articles.tasks.get_fugashi_tagger', return_value=None):
+				keywords = extract_keywords_openvino_batch(texts, model)
+			return keywords, model.calls[1:]
+
+		with tempfile.TemporaryDirectory() as directory, \
+				override_settings(TERM_EMBEDDING_CACHE_DIR=directory, TERM_EMBEDDING_CACHE_SAVE_EVERY=1):
+			keywords, calls = term_calls(['python tips', 'rust tips'])
+			self.assertEqual(calls, [['python', 'tips', 'rust']])
+			self.assertEqual([doc[0]['name'] for doc in keywords], ['python', 'rust'])
+
+			# 表記ゆれを含め、キャッシュにない語だけを推論する
+			_keywords, calls = term_calls(['PYTHON golang'])
+			self.assertEqual(calls, [['golang']])
+
+			# 再起動相当: ファイルから読み込んで推論しない
+			reset_term_embedding_cache()
+			_keywords, calls = term_calls(['python rust golang'])
+			self.assertEqual(calls, [])
+			stats = get_term_embedding_cache(embedding_model_fingerprint('openvino_ir')).stats()
+			self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (3, 0, 1.0))
+
+		lru = TermEmbeddingCache(max_entries=2)
+		lru.put_many([('a', [1.0]), ('b', [2.0])])
+		lru.get_many(['a'])
+		lru.put_many([('c', [3.0])])
+		self.assertEqual(sorted(lru.get_many(['a', 'b', 'c'])), ['a', 'c'])
+
+	def test_fallback_results_are_not_shared(self):
+		user = User.objects.create_user(username='fallback', password='pass1234')
+		article = Article.objects.create(
+			user=user,
+			cached_url=CachedURL.objects.create(url='https://fallback.example.com/a', title='hello world'),
+		)
+
+		class _BrokenModel:
+			def encode(self, texts, convert_to_tensor=False):
+				raise RuntimeError('encode failed')
+
+		for model_and_backend in [(None, None), (_BrokenModel(), 'openvino_ir'), (_BrokenModel(), 'sentence_transformers')]:
+			with patch('articles.tasks.get_embedding_model_and_backend', return_value=model_and_backend):
+				stats = classify_articles([article.id])
+			self.assertEqual(stats, {'classified': 1, 'errors': 0})
+			self.assertEqual(Article.objects.get(id=article.id).classification_status, 'completed')
+			self.assertFalse(ClassificationResult.objects.exists())
+
+	@override_settings(CELERY_TASK_ALWAYS_EAGER=True, AI_CLASSIFY_BATCH_SIZE=2)
+	def test_reclassify_pending_dispatches_batches(self):
+		user = User.objects.create_user(username='rebatch', password='pass1234')
+		for i in range(3):
+			Article.objects.create(
+				user=user,
+				cached_url=CachedURL.objects.create(url=f'https://rebatch.example.com/{i}'),
+				classification_status='error',
+			)
+		client = APIClient()
+		client.force_authenticate(user=user)
+
+		with patch('articles.tasks.classify_articles') as batch_task:
+			response = client.post('/api/articles/reclassify_pending/')
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['count'], 3)
+		self.assertEqual([len(call.args[0]) for call in batch_task.call_args_list], [2, 1])
+
+
+class InferenceServerTests(TestCase):
+	def test_micro_batcher_merges_concurrent_requests(self):
+		import numpy as np
+
+		calls = []
+
+		def encode(texts):
+			calls.append(list(texts))
+			return np.asarray([[float(len(text))] for text in texts])
+
+		batcher = MicroBatcher(encode, max_batch=10, max_wait=0.2)
+		self.addCleanup(batcher.close)
+		futures = [batcher.submit(['a']), batcher.submit(['bb', 'ccc']), batcher.submit(['dddd'])]
+		results = [future.result(timeout=5) for future in futures]
+
+		self.assertEqual(calls, [['a', 'bb', 'ccc', 'dddd']])
+		self.assertEqual([result[:, 0].tolist() for result in results], [[1.0], [2.0, 3.0], [4.0]])
+		self.assertEqual(batcher.stats()['mean_batch_size'], 4.0)
+
+	@override_settings(
+		AI_CLASSIFICATION_ENGINE='transformers',
+		AI_TRANSFORMERS_BACKEND='inference_server',
+		AI_CATEGORY_CANDIDATES=['政治', '科学', 'スポーツ'],
+		EMBEDDING_STORE_ENABLED=False,
+		TERM_EMBEDDING_CACHE_SIZE=0,
+	)
+	def test_client_backend_classifies_through_unix_socket(self):
+		model = _FakeEmbeddingModel(['政治', '科学', 'スポーツ'])
+		with tempfile.TemporaryDirectory() as directory:
+			url = f'unix://{directory}/inference.sock'
+			batcher = MicroBatcher(model.encode, max_batch=64, max_wait=0.001)
+			server = create_server(url, batcher, backend='sentence_transformers', fingerprint='fake-model')
+			thread = threading.Thread(target=server.serve_forever, daemon=True)
+			thread.start()
+			reset_inference_client()
+			self.addCleanup(reset_inference_client)
+			try:
+				with override_settings(INFERENCE_SERVER_URL=url):
+					client, backend = get_embedding_model_and_backend()
+					self.assertEqual((backend, client.fingerprint), ('inference_server', 'fake-model'))
+					self.assertEqual(embedding_model_fingerprint(backend), 'fake-model')
+					self.assertEqual(client.encode('科学').shape, (3,))
+
+					with patch('articles.tasks.get_fugashi_tagger', return_value=None):
+						results, produced_by = _classify_texts(['政治 ニュース', 'スポーツ 結果'], 'transformers')
+			finally:
+				server.shutdown()
+				server.server_close()
+				batcher.close()
+
+		self.assertEqual(produced_by, 'inference_server')
+		self.assertEqual([category for category, _score, _tags in results], ['政治', 'スポーツ'])
+		self.assertGreater(batcher.stats()['texts'], 0)
+
+	@override_settings(AI_TRANSFORMERS_BACKEND='inference_server', AI_CATEGORY_CANDIDATES=['政治', '科学', 'スポーツ'])
+	def test_restarted_server_with_new_model_changes_fingerprint(self):
+		import http.client
+		import socket
+
+		model = _FakeEmbeddingModel(['政治', '科学', 'スポーツ'])
+
+		def start(url, fingerprint):
+			batcher = MicroBatcher(model.encode, max_batch=64, max_wait=0.001)
+			server = create_server(url, batcher, backend='sentence_transformers', fingerprint=fingerprint)
+			threading.Thread(target=server.serve_forever, daemon=True).start()
+			return server, batcher
+
+		def stop(server, batcher):
+			server.shutdown()
+			server.server_close()
+			batcher.close()
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = f'{directory}/inference.sock'
+			url = f'unix://{path}'
+			reset_inference_client()
+			self.addCleanup(reset_inference_client)
+			with override_settings(INFERENCE_SERVER_URL=url):
+				server, batcher = start(url, 'model-a')
+				try:
+					client, _backend = get_embedding_model_and_backend()
+					first = classification_fingerprint('transformers')
+
+					# オブジェクトでない JSON は 400
+					sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+					sock.connect(path)
+					connection = http.client.HTTPConnection('localhost')
+					connection.sock = sock
+					connection.request('POST', '/encode', body=b'["a"]', headers={'Content-Type': 'application/json'})
+					self.assertEqual(connection.getresponse().status, 400)
+					connection.close()
+				finally:
+					stop(server, batcher)
+
+				server, batcher = start(url, 'model-b')
+				try:
+					with self.assertRaises(InferenceServerError):
+						client.encode(['政治'])
+					renewed, _backend = get_embedding_model_and_backend()
+					self.assertIsNot(renewed, client)
+					self.assertEqual(renewed.fingerprint, 'model-b')
+					self.assertEqual(embedding_model_fingerprint('inference_server'), 'model-b')
+					self.assertNotEqual(classification_fingerprint('transformers'), first)
+				finally:
+					stop(server, batcher)
+
+	@override_settings(AI_TRANSFORMERS_BACKEND='inference_server', INFERENCE_SERVER_URL='unix:///nonexistent/inference.sock')
+	def test_unreachable_server_falls_back_to_lightweight(self):
+		reset_inference_client()
+		self.addCleanup(reset_inference_client)
+		self.assertEqual(get_embedding_model_and_backend(), (None, None))
+		results, produced_by = _classify_texts(['python code'], 'transformers')
+		self.assertEqual((results[0][0], produced_by), ('プログラミング', 'lightweight'))
+
+
+@override_settings(AI_CLASSIFICATION_ENGINE='lightweight')
+class SharedClassificationTests(TestCase):
+	def test_second_user_reuses_result_until_text_changes(self):
+		cache = CachedURL.objects.create(url='https://shared.example.com/a', title='python code review', description='django python')
+		first = Article.objects.create(user=User.objects.create_user(username='first', password='pass1234'), cached_url=cache)
+		second = Article.objects.create(user=User.objects.create_user(username='second', password='pass1234'), cached_url=cache)
+
+		with patch('articles.tasks._classify_texts', wraps=_classify_texts) as inference:
+			classify_article(first.id)
+			classify_article(second.id)
+		self.assertEqual(inference.call_count, 1)
+
+		first.refresh_from_db()
+		second.refresh_from_db()
+		self.assertEqual(second.suggested_category, first.suggested_category)
+		self.assertEqual(second.suggested_tags, first.suggested_tags)
+		self.assertEqual(second.classification_status, 'completed')
+		self.assertEqual(list(second.tags.values_list('name', flat=True)), list(first.tags.values_list('name', flat=True)))
+		self.assertEqual(ClassificationResult.objects.filter(cached_url=cache).count(), 1)
+
+		# 同じテキストの再取得では残り、テキストが変わると捨てる
+		_mark_fetch_success(cache, 'python code review', 'django python', None, None, 200)
+		self.assertEqual(ClassificationResult.objects.filter(cached_url=cache).count(), 1)
+		_mark_fetch_success(cache, 'rust release notes', 'rust', None, None, 200)
+		self.assertEqual(ClassificationResult.objects.filter(cached_url=cache).count(), 0)
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False, INGEST_DESCRIPTION_MAX_CHARS=40)
+class DescriptionNormalizationTests(TestCase):
+	def test_normalize_text(self):
+		html = '<p>Hello&nbsp;<b>world</b> &amp; <i>friends</i></p><script>var x = 1;</script>\n\n<p>次の段落</p>'
+		self.assertEqual(normalize_text(html), 'Hello world & friends 次の段落')
+		self.assertEqual(normalize_text('  <br/>  '), None)
+		self.assertEqual(normalize_text('a' * 20, max_chars=10), 'a' * 9 + '…')
+
+	def test_rss_description_is_stripped_at_ingest(self):
+		reset_rate_limiter()
+		user = User.objects.create_user(username='norm', password='pass1234')
+		subscription = RSSSubscription.objects.create(user=user, name='N', feed_url='https://norm.example.com/rss')
+		feed = (
+			b'<rss><channel><item><title>T</title><link>https://norm.example.com/1</link><guid>n1</guid>'
+			b'<description>&lt;div&gt;&lt;p&gt;Long   &lt;a href="/x"&gt;story&lt;/a&gt;&lt;/p&gt;'
+			+ b'&lt;p&gt;more text&lt;/p&gt;' * 10
+			+ b'&lt;/div&gt;</description></item></channel></rss>'
+		)
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(content=feed)), \
+				patch('articles.tasks.classify_articles'):
+			sync_single_rss_feed(subscription.id)
+
+		description = CachedURL.objects.get(url='https://norm.example.com/1').description
+		self.assertTrue(description.startswith('Long story more text'))
+		self.assertNotIn('<', description)
+		self.assertEqual(len(description), 40)
+
+	def test_backfill_command_rewrites_in_chunks(self):
+		raw = CachedURL.objects.create(url='https://norm.example.com/raw', description='<p>Raw  <b>HTML</b></p>')
+		clean = CachedURL.objects.create(url='https://norm.example.com/clean', description='Already clean')
+
+		call_command('normalize_descriptions', '--chunk-size', '1', '--dry-run', stdout=StringIO())
+		raw.refresh_from_db()
+		self.assertEqual(raw.description, '<p>Raw  <b>HTML</b></p>')
+
+		out = StringIO()
+		call_command('normalize_descriptions', '--chunk-size', '1', stdout=out)
+		raw.refresh_from_db()
+		clean.refresh_from_db()
+		self.assertEqual(raw.description, 'Raw HTML')
+		self.assertEqual(clean.description, 'Already clean')
+		self.assertIn('1/2', out.getvalue())
+
+
+@override_settings(ROBOTS_TXT_ENABLED=False, RSS_PRUNE_CHUNK_SIZE=2)
+class StaleRSSPruneTests(TestCase):
+	def _feed(self, names):
+		items = ''.join(f'<item><link>https://prune.example.com/{n}</link><guid>{n}</guid></item>' for n in names)
+		return f'<rss><channel>{items}</channel></rss>'.encode('utf-8')
+
+	def _sync(self, subscription, names):
+		with patch('articles.tasks.http_get', return_value=_FakeResponse(content=self._feed(names))), \
+				patch('articles.tasks.classify_articles'), \
+				CaptureQueriesContext(connection) as queries:
+			sync_single_rss_feed(subscription.id)
+		return [query['sql'] for query in queries.captured_queries]
+
+	def test_unseen_unread_articles_are_pruned_in_chunks(self):
+		reset_rate_limiter()
+		user = User.objects.create_user(username='pruner', password='pass1234')
+		subscription = RSSSubscription.objects.create(user=user, name='P', feed_url='https://prune.example.com/rss')
+		self._sync(subscription, ['a', 'b', 'c', 'd', 'e', 'f'])
+
+		kept_read = Article.objects.get(rss_guid='b')
+		kept_read.status = 'read'
+		kept_read.save(update_fields=['status'])
+		noted = Article.objects.get(rss_guid='c')
+		Question.objects.create(article=noted, text='なぜ？')
+		ActionItem.objects.create(article=noted, text='調べる')
+
+		queries = self._sync(subscription, ['a', 'f'])
+
+		self.assertEqual(
+			sorted(Article.objects.filter(rss_subscription=subscription).values_list('rss_guid', flat=True)),
+			['a', 'b', 'f'],
+		)
+		self.assertFalse(Question.objects.exists())
+		self.assertFalse(ActionItem.objects.exists())
+		self.assertTrue(all(article.last_seen_in_feed for article in Article.objects.filter(rss_guid__in=['a', 'f'])))
+		# GUID の NOT IN ではなく、2件ずつの DELETE で消す
+		self.assertFalse([sql for sql in queries if 'NOT' in sql and 'rss_guid' in sql])
+		article_deletes = [sql for sql in queries if sql.startswith('DELETE FROM "articles_article"')]
+		self.assertEqual(len(article_deletes), 2)
+		# コレクターで記事を読み込まない
+		self.assertFalse([
+			sql for sql in queries
+			if sql.startswith('SELECT "articles_article"."id", "articles_article"."user_id"') and 'WHERE "articles_article"."id" IN' in sql
+		])
+
+	def test_dependents_cover_every_relation_to_article(self):
+		from .tasks import _article_dependents
+
+		dependents = {model for model, _field_name in _article_dependents()}
+		self.assertTrue({Question, ActionItem, Article.tags.through} <= dependents)
+		related = {relation.related_model for relation in Article._meta.related_objects if not relation.many_to_many}
+		related |= {field.remote_field.through for field in Article._meta.many_to_many}
+		self.assertEqual(dependents, related)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, ROBOTS_TXT_ENABLED=False, FETCH_HOST_RATE=100)
+class OPMLImportExportTests(APITestCase):
+	OPML = (
+		'<?xml version="1.0"?><opml version="2.0"><head><title>mine</title></head><body>'
+		'<outline text="Tech">'
+		'<outline text="Good" type="rss" xmlUrl="https://good.example.com/rss"/>'
+		'<outline text="Broken" type="rss" xmlUrl="https://broken.example.com/rss"/>'
+		'</outline>'
+		'<outline text="Already" xmlUrl="https://already.example.com/rss"/>'
+		'<outline text="Dup" xmlUrl="https://good.example.com/rss"/>'
+		'<outline text="Bad" xmlUrl="ftp://bad.example.com/rss"/>'
+		'</body></opml>'
+	)
+
+	def setUp(self):
+		reset_rate_limiter()
+		self.user = User.objects.create_user(username='opml', password='pass1234')
+		self.client.force_authenticate(user=self.user)
+		RSSSubscription.objects.create(user=self.user, name='Already', feed_url='https://already.example.com/rss')
+
+	def _fake_get(self, url, **kwargs):
+		if 'broken' in url:
+			return _FakeResponse(status_code=500)
+		return _FakeResponse(content=b'<rss><channel><item><link>https://good.example.com/1</link></item></channel></rss>')
+
+	def test_import_creates_subscriptions_and_reports_progress(self):
+		with patch('articles.tasks.http_get', side_effect=self._fake_get) as mock_get, \
+				patch('articles.tasks.classify_articles'):
+			response = self.client.post('/api/rss-subscriptions/import_opml/', {'opml': self.OPML}, format='json')
+
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+		self.assertEqual(mock_get.call_count, 2)
+		self.assertEqual(
+			(response.data['total'], response.data['created_count'], response.data['existing_count']),
+			(3, 2, 1),
+		)
+		progress = self.client.get(f"/api/rss-subscriptions/imports/{response.data['id']}/").data
+		self.assertEqual(progress['status'], 'completed')
+		self.assertEqual((progress['processed'], progress['succeeded'], progress['failed']), (2, 1, 1))
+		good = RSSSubscription.objects.get(user=self.user, feed_url='https://good.example.com/rss')
+		self.assertEqual(progress['results'][str(good.id)], 'synced')
+		self.assertEqual(Article.objects.filter(rss_subscription=good).count(), 1)
+		self.assertEqual(FeedSyncCycle.objects.get().trigger, 'import')
+
+		other = User.objects.create_user(username='other', password='pass1234')
+		self.client.force_authenticate(user=other)
+		self.assertEqual(
+			self.client.get(f"/api/rss-subscriptions/imports/{response.data['id']}/").status_code,
+			status.HTTP_404_NOT_FOUND,
+		)
+
+	def test_invalid_opml_is_rejected_and_export_round_trips(self):
+		response = self.client.post('/api/rss-subscriptions/import_opml/', {'opml': '<html></html>'}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		for content in (123, ['<opml/>'], {'body': 'x'}):
+			response = self.client.post('/api/rss-subscriptions/import_opml/', {'opml': content}, format='json')
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertFalse(OPMLImport.objects.exists())
+
+		response = self.client.get('/api/rss-subscriptions/export_opml/')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(parse_opml(response.content), [('Already', 'https://already.example.com/rss')])
@@ -0,0 +1,83 @@
+"""
+取り込み時のテキスト正規化（RSS の概要・スクレイピングしたメタデータ共通）
+
+フィードの description / content には生の HTML が数KB単位で入っていることが多く、
+そのまま CachedURL.description に保存すると、テーブル・一覧APIのレスポンス・分類に渡すテキストが膨らむ。
+- タグを除去し（script / style の中身は捨てる）、文字参照をデコードする
+- 連続する空白・改行を1つの空白にまとめる
+- INGEST_DESCRIPTION_MAX_CHARS 文字で切り詰める（切り詰めた場合は末尾を「…」にする）
+"""
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+DEFAULT_INGEST_DESCRIPTION_MAX_CHARS = 1000
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+# 前後の文字とつながらないよう空白に置き換える要素
+_BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption',
+    'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p',
+    'pre', 'section', 'table', 'td', 'th', 'tr', 'ul',
+}
+
+
+class _TextExtractor(HTMLParser):
+    """タグを除いたテキストだけを集めるパーサー（文字参照は convert_charrefs でデコード）"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def strip_html(text):
+    """HTML のタグを除去し、文字参照をデコードしたテキストを返す"""
+    if '<' not in text and '&' not in text:
+        return text
+    parser = _TextExtractor()
+    parser.feed(text)
+    parser.close()
+    return ''.join(parser.parts)
+
+
+def normalize_text(value, max_chars=None):
+    """
+    タグ除去・文字参照のデコード・空白の圧縮・長さの上限を適用する
+    空になった場合は None
+    """
+    if value is None:
+        return None
+    text = _WHITESPACE_RE.sub(' ', strip_html(str(value))).strip()
+    if not text:
+        return None
+    if max_chars and len(text) > max_chars:
+        text = text[:max(1, max_chars - 1)].rstrip() + '…'
+    return text
+
+
+def normalize_description(value):
+    """概要を保存用に正規化する（上限は INGEST_DESCRIPTION_MAX_CHARS）"""
+    max_chars = int(getattr(settings, 'INGEST_DESCRIPTION_MAX_CHARS', DEFAULT_INGEST_DESCRIPTION_MAX_CHARS) or 0)
+    return normalize_text(value, max_chars=max_chars)
@@ -0,0 +1,249 @@
+"""
+URL の正規化と CachedURL の解決
+
+CachedURL は URL 文字列そのものをキーにしているため、?utm_source= 付きや末尾スラッシュ、
+http / https、短縮URLの違いだけで別の行・別の取得になってしまう。
+- canonicalize_url: トラッキング用パラメータ除去・スキーム/ホストの小文字化・フラグメント除去など
+- resolve_cached_url: 別名表（URLAlias）→ 正規化URL → http/https 違いの順で既存の CachedURL を探す
+- record_alias: 入力URLやリダイレクト先URLを別名として登録し、次回以降はキャッシュヒットにする
+- resolve_cached_urls: RSS 取り込み用の一括版（URL の件数によらずクエリ数は一定）
+"""
+from fnmatch import fnmatchcase
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import CachedURL, URLAlias
+
+DEFAULT_TRACKING_PARAMS = [
+    'utm_*',
+    'fbclid',
+    'gclid',
+    'dclid',
+    'yclid',
+    'msclkid',
+    'mc_cid',
+    'mc_eid',
+    'igshid',
+    '_ga',
+    '_gl',
+    'ref_src',
+]
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_param(name, patterns):
+    lowered = name.lower()
+    return any(fnmatchcase(lowered, pattern) for pattern in patterns)
+
+
+def canonicalize_url(url):
+    """
+    URL を正規化する（http/https 以外や解釈できないものはそのまま返す）
+    - スキーム・ホスト名を小文字化、既定ポートと末尾ドットを除去
+    - フラグメント（#以降）を除去
+    - URL_TRACKING_PARAMS に一致するクエリパラメータを除去（ワイルドカード可）
+    - URL_STRIP_TRAILING_SLASH=True ならルート以外のパス末尾の / を除去
+    """
+    if not url:
+        return url
+    url = str(url).strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.rstrip('.').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    netloc = host
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f'{host}:{port}'
+    if parts.username:
+        userinfo = parts.username + (f':{parts.password}' if parts.password else '')
+        netloc = f'{userinfo}@{netloc}'
+
+    path = parts.path or '/'
+    if getattr(settings, 'URL_STRIP_TRAILING_SLASH', True) and len(path) > 1:
+        path = path.rstrip('/') or '/'
+
+    patterns = [p.lower() for p in getattr(settings, 'URL_TRACKING_PARAMS', DEFAULT_TRACKING_PARAMS)]
+    all_items = parse_qsl(parts.query, keep_blank_values=True)
+    query_items = [(key, value) for key, value in all_items if not _is_tracking_param(key, patterns)]
+    if len(query_items) == len(all_items):
+        # 除去対象がなければ元のクエリ文字列を保つ（エンコードの揺れを作らない）
+        query = parts.query
+    else:
+        query = urlencode(query_items, doseq=True) if query_items else ''
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def _swap_scheme(url):
+    if url.startswith('https://'):
+        return 'http://' + url[len('https://'):]
+    if url.startswith('http://'):
+        return 'https://' + url[len('http://'):]
+    return None
+
+
+def lookup_cached_url(url):
+    """
+    既存の CachedURL を探す（なければ None）
+    別名表 → 正規化URL → 元のURL → http/https を入れ替えたURL の順
+    """
+    raw = str(url or '').strip()
+    if not raw:
+        return None
+    canonical = canonicalize_url(raw)
+
+    alias = URLAlias.objects.select_related('cached_url').filter(
+        alias_url__in={raw, canonical}
+    ).first()
+    if alias is not None:
+        return alias.cached_url
+
+    preference = [canonical, raw]
+    swapped = _swap_scheme(canonical)
+    if swapped:
+        # https を優先
+        preference = [canonical, swapped, raw] if canonical.startswith('https://') else [swapped, canonical, raw]
+    found = {cache.url: cache for cache in CachedURL.objects.filter(url__in=set(preference))}
+    for candidate in preference:
+        if candidate in found:
+            return found[candidate]
+    return None
+
+
+def record_alias(alias_url, cache):
+    """
+    alias_url を cache の別名として登録する
+    既に別の CachedURL 本体や別名として使われている URL は登録しない
+    """
+    alias_url = str(alias_url or '').strip()
+    if not alias_url or alias_url == cache.url or len(alias_url) > 2000:
+        return False
+    if CachedURL.objects.filter(url=alias_url).exists():
+        return False
+    try:
+        with transaction.atomic():
+            _alias, created = URLAlias.objects.get_or_create(alias_url=alias_url, defaults={'cached_url': cache})
+    except IntegrityError:
+        return False
+    return created
+
+
+def resolve_cached_url(url):
+    """
+    URL に対応する CachedURL を取得し、なければ正規化URLで作成する
+    CachedURL.objects.get_or_create(url=...) の置き換え
+    戻り値: (cached_url, created)
+    """
+    raw = str(url or '').strip()
+    cache = lookup_cached_url(raw)
+    if cache is not None:
+        created = False
+    else:
+        canonical = canonicalize_url(raw)
+        cache, created = CachedURL.objects.get_or_create(url=canonical)
+
+    # 入力そのままの形も別名として覚えておき、次回は1クエリで引けるようにする
+    if raw != cache.url:
+        record_alias(raw, cache)
+    return cache, created
+
+
+def record_redirect_alias(cache, final_url):
+    """リダイレクト後の URL（正規化済み）を別名として登録する"""
+    if not final_url:
+        return False
+    canonical_final = canonicalize_url(final_url)
+    if canonical_final == cache.url:
+        return False
+    return record_alias(canonical_final, cache)
+
+
+def resolve_cached_urls(urls):
+    """
+    resolve_cached_url の一括版
+    別名表・既存行をまとめて引き、足りない CachedURL と別名は bulk_create で作成する
+    戻り値: {入力URL: CachedURL}
+    """
+    raws = []
+    for url in urls:
+        raw = str(url or '').strip()
+        if raw and raw not in raws:
+            raws.append(raw)
+    if not raws:
+        return {}
+    canonicals = {raw: canonicalize_url(raw) for raw in raws}
+
+    # 1. 別名表
+    resolved = {}
+    known_aliases = set()
+    aliases = {
+        alias.alias_url: alias.cached_url
+        for alias in URLAlias.objects.select_related('cached_url').filter(
+            alias_url__in=set(raws) | set(canonicals.values())
+        )
+    }
+    for raw in raws:
+        for candidate in (raw, canonicals[raw]):
+            if candidate in aliases:
+                resolved[raw] = aliases[candidate]
+                known_aliases.add(raw)
+                break
+
+    # 2. 正規化URL → http/https 違い → 元のURL（https を優先）
+    preferences = {}
+    for raw in raws:
+        if raw in resolved:
+            continue
+        canonical = canonicals[raw]
+        swapped = _swap_scheme(canonical)
+        if not swapped:
+            preferences[raw] = [canonical, raw]
+        elif canonical.startswith('https://'):
+            preferences[raw] = [canonical, swapped, raw]
+        else:
+            preferences[raw] = [swapped, canonical, raw]
+    wanted = {candidate for candidates in preferences.values() for candidate in candidates}
+    found = {cache.url: cache for cache in CachedURL.objects.filter(url__in=wanted)} if wanted else {}
+    missing = []
+    for raw, candidates in preferences.items():
+        for candidate in candidates:
+            if candidate in found:
+                resolved[raw] = found[candidate]
+                break
+        else:
+            missing.append(raw)
+
+    # 3. なければ正規化URLで作成（並行実行で先に作られていても ignore_conflicts で吸収）
+    if missing:
+        new_urls = {canonicals[raw] for raw in missing}
+        CachedURL.objects.bulk_create([CachedURL(url=url) for url in new_urls], ignore_conflicts=True)
+        created = {cache.url: cache for cache in CachedURL.objects.filter(url__in=new_urls)}
+        for raw in missing:
+            resolved[raw] = created[canonicals[raw]]
+
+    # 4. 入力そのままの形を別名として登録（CachedURL 本体として使われている URL は除く）
+    alias_candidates = {
+        raw: cache
+        for raw, cache in resolved.items()
+        if raw != cache.url and raw not in known_aliases and len(raw) <= 2000
+    }
+    if alias_candidates:
+        taken = set(CachedURL.objects.filter(url__in=list(alias_candidates)).values_list('url', flat=True))
+        URLAlias.objects.bulk_create(
+            [URLAlias(alias_url=raw, cached_url=cache) for raw, cache in alias_candidates.items() if raw not in taken],
+            ignore_conflicts=True,
+        )
+
+    return resolved
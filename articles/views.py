@@ -6,6 +6,7 @@ from bs4 import BeautifulSoup
 # ▲▲▲ 追加ここまで ▲▲▲
 
 # Django Core
+from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404 # ★追加：HTMLを表示するために必要
 from .forms import ArticleEditForm, ArticleShareForm # ArticleShareFormを追加 # ★追加：編集用フォームをインポート
 from django.contrib.auth.decorators import login_required # ★追加：ログイン必須にするために必要
@@ -24,7 +25,7 @@ from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
 # Local Application Imports
-from .models import Article, Tag, Question, ActionItem, CachedURL, RSSSubscription
+from .models import Article, Tag, Question, ActionItem, RSSSubscription, OPMLImport
 from .serializers import (
     RegisterSerializer, # ★インポート追加
     UserSerializer, # ★ユーザー情報用シリアライザをインポート
@@ -32,6 +33,7 @@ from .serializers import (
     ArticleSimpleSerializer,
     TagSerializer, 
     RSSSubscriptionSerializer,
+    OPMLImportSerializer,
     QuestionSerializer, 
     ActionItemSerializer
 )
@@ -60,7 +62,16 @@ class UserDetailView(generics.RetrieveAPIView):
         return self.request.user
 # ★ここまで追加
 from .filters import ArticleFilter
-from .tasks import fetch_article_metadata, classify_article, sync_single_rss_feed, retry_pending_metadata
+from .urlnorm import resolve_cached_url
+from .opml import OPML_MAX_BYTES, OPMLError, build_opml, parse_opml
+from .tasks import (
+    fetch_article_metadata,
+    classify_article,
+    classify_articles_in_batches,
+    sync_single_rss_feed,
+    retry_pending_metadata,
+    validate_opml_import,
+)
 
 # ↓ ここから ViewSet の定義が始まります
 
@@ -110,6 +121,77 @@ class RSSSubscriptionViewSet(viewsets.ModelViewSet):
             sync_single_rss_feed.delay(subscription.id)
         return Response({'detail': 'RSS同期を開始しました'})
 
+    @action(detail=False, methods=['post'])
+    def import_opml(self, request):
+        """
+        OPML から購読を一括作成する (POST /api/rss-subscriptions/import_opml/)
+        file（multipart）または opml（テキスト）で受け取る。購読済みのURLはスキップ
+        フィードの検証（初回同期）はバックグラウンドで並行実行し、
+        進捗は imports/{id}/ で確認する
+        """
+        upload = request.FILES.get('file')
+        content = upload.read(OPML_MAX_BYTES + 1) if upload else request.data.get('opml', '')
+        if not isinstance(content, (str, bytes)):
+            return Response({'detail': 'opml は文字列で指定してください'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            feeds = parse_opml(content)
+        except OPMLError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        existing = set(
+            RSSSubscription.objects.filter(
+                user=request.user,
+                feed_url__in=[feed_url for _name, feed_url in feeds],
+            ).values_list('feed_url', flat=True)
+        )
+        new_feeds = [(name, feed_url) for name, feed_url in feeds if feed_url not in existing]
+        RSSSubscription.objects.bulk_create(
+            [RSSSubscription(user=request.user, name=name, feed_url=feed_url) for name, feed_url in new_feeds],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        subscription_ids = list(
+            RSSSubscription.objects.filter(
+                user=request.user,
+                feed_url__in=[feed_url for _name, feed_url in new_feeds],
+            ).order_by('id').values_list('id', flat=True)
+        )
+        job = OPMLImport.objects.create(
+            user=request.user,
+            total=len(feeds),
+            created_count=len(subscription_ids),
+            existing_count=len(existing),
+            subscription_ids=subscription_ids,
+        )
+
+        if not subscription_ids:
+            job.status = 'completed'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'finished_at'])
+        elif getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+            validate_opml_import(job.id)
+            job.refresh_from_db()
+        else:
+            validate_opml_import.delay(job.id)
+        return Response(OPMLImportSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'imports/(?P<import_id>[0-9]+)')
+    def import_status(self, request, import_id=None):
+        """
+        OPML インポートの進捗 (GET /api/rss-subscriptions/imports/{id}/)
+        """
+        job = get_object_or_404(OPMLImport, id=import_id, user=request.user)
+        return Response(OPMLImportSerializer(job).data)
+
+    @action(detail=False, methods=['get'])
+    def export_opml(self, request):
+        """
+        購読を OPML として書き出す (GET /api/rss-subscriptions/export_opml/)
+        """
+        response = HttpResponse(build_opml(self.get_queryset()), content_type='text/x-opml; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="subscriptions.opml"'
+        return response
+
     @action(detail=False, methods=['post'])
     def retry_metadata(self, request):
         if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
@@ -222,7 +304,7 @@ class ArticleViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         url_input = serializer.validated_data.get('url_input')
         user = self.request.user
-        cached_url_instance, created_cache = CachedURL.objects.get_or_create(url=url_input)
+        cached_url_instance, created_cache = resolve_cached_url(url_input)
         try:
             existing_article = Article.objects.get(
                 user=user,
@@ -323,9 +405,9 @@ class ArticleViewSet(viewsets.ModelViewSet):
         try:
             article = self.get_object()
             if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
-                fetch_article_metadata(article.cached_url.id, article_id=article.id)
+                fetch_article_metadata(article.cached_url.id, article_id=article.id, force=True)
             else:
-                fetch_article_metadata.delay(article.cached_url.id, article_id=article.id)
+                fetch_article_metadata.delay(article.cached_url.id, article_id=article.id, force=True)
 
             article.cached_url.refresh_from_db()
             serializer = self.get_serializer(article)
@@ -363,12 +445,8 @@ class ArticleViewSet(viewsets.ModelViewSet):
         if not article_ids:
             return Response({'count': 0})
 
-        if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
-            for article_id in article_ids:
-                classify_article(article_id)
-        else:
-            for article_id in article_ids:
-                classify_article.delay(article_id)
+        # 1件ずつではなく AI_CLASSIFY_BATCH_SIZE 件ずつまとめて推論する
+        classify_articles_in_batches(article_ids)
 
         return Response({'count': len(article_ids)})
 
@@ -405,7 +483,7 @@ class ArticleViewSet(viewsets.ModelViewSet):
             return Response({'error': '有効なURLを指定してください'}, status=status.HTTP_400_BAD_REQUEST)
 
         user = request.user
-        cached_url_instance, created_cache = CachedURL.objects.get_or_create(url=url)
+        cached_url_instance, created_cache = resolve_cached_url(url)
 
         existing_article = Article.objects.filter(
             user=user,
@@ -557,7 +635,7 @@ def article_share(request):
             priority = form.cleaned_data['priority']
             next_reminder_date = form.cleaned_data['next_reminder_date']
 
-            cached_url, created_cache = CachedURL.objects.get_or_create(url=url)
+            cached_url, created_cache = resolve_cached_url(url)
             article, _ = Article.objects.get_or_create(
                 user=request.user,
                 cached_url=cached_url,
@@ -12,9 +12,10 @@ app = Celery('config')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.conf.beat_schedule = {
-	'sync-rss-every-15-minutes': {
-		'task': 'articles.tasks.sync_all_rss_feeds',
-		'schedule': crontab(minute='*/15'),
+	# フィードごとの次回取得時刻（更新頻度から自動調整）を過ぎたものだけ同期する
+	'sync-due-rss-every-5-minutes': {
+		'task': 'articles.tasks.sync_due_rss_feeds',
+		'schedule': crontab(minute='*/5'),
 	},
 	'retry-pending-metadata-every-30-minutes': {
 		'task': 'articles.tasks.retry_pending_metadata',
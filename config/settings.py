@@ -50,6 +50,7 @@ AI_DEVICE = os.getenv('AI_DEVICE', 'auto')
 # sentence_transformers: 既存経路
 # openvino_ir: OpenVINO IR (.xml/.bin) 経路
 # auto: OpenVINO IR が設定・利用可能なら優先、不可なら既存経路へ
+# inference_server: run_inference_server で起動した推論サーバーを使う（ワーカーにモデルを読み込まない）
 AI_TRANSFORMERS_BACKEND = os.getenv('AI_TRANSFORMERS_BACKEND', 'sentence_transformers')
 
 # OpenVINO IR 追加対応（既存経路は維持）
@@ -57,6 +58,31 @@ AI_OPENVINO_IR_XML = os.getenv('AI_OPENVINO_IR_XML', '')
 AI_OPENVINO_TOKENIZER_MODEL = os.getenv('AI_OPENVINO_TOKENIZER_MODEL', AI_SBERT_MODEL)
 AI_OPENVINO_DEVICE = os.getenv('AI_OPENVINO_DEVICE', 'CPU')
 
+# まとめて分類するときの1タスクあたりの記事数（RSS の新規記事など）
+AI_CLASSIFY_BATCH_SIZE = int(os.getenv('AI_CLASSIFY_BATCH_SIZE', '64'))
+
+# 記事テキストの埋め込みを CachedURL・モデル単位で保存して再利用する（float16）
+EMBEDDING_STORE_ENABLED = os.getenv('EMBEDDING_STORE_ENABLED', 'True').lower() == 'true'
+# export_embeddings コマンドがスナップショット（メモリマップ用の .npy + manifest.json）を書き出す先
+EMBEDDING_SNAPSHOT_DIR = os.getenv('EMBEDDING_SNAPSHOT_DIR', str(BASE_DIR / 'embeddings'))
+
+# OpenVINO IR のキーワード抽出で使う候補語の埋め込みキャッシュ（LRU の上限語数、0 で無効）
+TERM_EMBEDDING_CACHE_SIZE = int(os.getenv('TERM_EMBEDDING_CACHE_SIZE', '50000'))
+# 候補語の埋め込みキャッシュの保存先（空なら保存しない）と、保存する間隔（新しい語の数）
+TERM_EMBEDDING_CACHE_DIR = os.getenv('TERM_EMBEDDING_CACHE_DIR', '')
+TERM_EMBEDDING_CACHE_SAVE_EVERY = int(os.getenv('TERM_EMBEDDING_CACHE_SAVE_EVERY', '1000'))
+
+# 推論サーバー（python manage.py run_inference_server）の待ち受け先（http://127.0.0.1:8765 / unix:///path.sock）
+INFERENCE_SERVER_URL = os.getenv('INFERENCE_SERVER_URL', 'http://127.0.0.1:8765')
+# 推論サーバーが読み込むモデル（auto / sentence_transformers / openvino_ir）
+INFERENCE_SERVER_BACKEND = os.getenv('INFERENCE_SERVER_BACKEND', 'auto')
+# マイクロバッチ: 1回の推論にまとめる最大テキスト数と、リクエストをまとめるために待つ最大時間（ミリ秒）
+INFERENCE_SERVER_MAX_BATCH = int(os.getenv('INFERENCE_SERVER_MAX_BATCH', '64'))
+INFERENCE_SERVER_MAX_WAIT_MS = float(os.getenv('INFERENCE_SERVER_MAX_WAIT_MS', '10'))
+# クライアント側のタイムアウト秒と、接続できなかったときに再接続を試みるまでの秒数
+INFERENCE_SERVER_TIMEOUT = float(os.getenv('INFERENCE_SERVER_TIMEOUT', '30'))
+INFERENCE_SERVER_RETRY_SECONDS = float(os.getenv('INFERENCE_SERVER_RETRY_SECONDS', '30'))
+
 # ★AI カテゴリ候補（SBERT 版で使用）
 AI_CATEGORY_CANDIDATES = [
     "プログラミング",
@@ -246,6 +272,92 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Tokyo' # タイムゾーンを日本に設定
 
+# ========== METADATA FETCH SETTINGS ==========
+# retry_pending_metadata の一括取得エンジン（articles/fetcher.py）
+# 全体の同時接続数 / 同一ホストへの同時接続数 / タイムアウト秒
+METADATA_FETCH_CONCURRENCY = int(os.getenv('METADATA_FETCH_CONCURRENCY', '32'))
+METADATA_FETCH_PER_HOST = int(os.getenv('METADATA_FETCH_PER_HOST', '4'))
+METADATA_FETCH_TIMEOUT = float(os.getenv('METADATA_FETCH_TIMEOUT', '10'))
+# 共有HTTPセッション（articles/http_client.py）
+# HTTP_POOL_CONNECTIONS: プロセス内で保持するホスト別プール数
+# HTTP_POOL_MAXSIZE: 1ホストあたりの keep-alive 接続数（METADATA_FETCH_PER_HOST 以上推奨）
+# HTTP_RETRY_TOTAL / HTTP_RETRY_BACKOFF: 502/504（RSS取得では接続エラーも）時のリトライ回数とバックオフ係数
+# 503 / 429 は Retry-After に従って延期するためリトライしない
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '50'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '8'))
+HTTP_RETRY_TOTAL = int(os.getenv('HTTP_RETRY_TOTAL', '2'))
+HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.5'))
+HTTP_RETRY_STATUS_FORCELIST = (502, 504)
+# ホスト単位のレート制限（articles/ratelimit.py）
+# FETCH_RATE_LIMIT_BACKEND: redis（ワーカー間で共有）/ memory（プロセス内のみ。開発・テスト用）
+# FETCH_HOST_RATE: 1ホストあたり毎秒の取得数, FETCH_HOST_BURST: 連続で取得できる数
+# FETCH_RATE_LIMIT_MAX_INLINE_WAIT: この秒数以下の待ちはその場で待機、超える場合は延期
+# FETCH_RATE_LIMIT_DEFAULT_BACKOFF: Retry-After なしの 429 を受けたときの延期秒数
+FETCH_RATE_LIMIT_BACKEND = os.getenv('FETCH_RATE_LIMIT_BACKEND', 'memory' if DEBUG else 'redis')
+FETCH_RATE_LIMIT_REDIS_URL = os.getenv('FETCH_RATE_LIMIT_REDIS_URL', CELERY_BROKER_URL)
+FETCH_HOST_RATE = float(os.getenv('FETCH_HOST_RATE', '1.0'))
+FETCH_HOST_BURST = int(os.getenv('FETCH_HOST_BURST', '4'))
+FETCH_RATE_LIMIT_MAX_INLINE_WAIT = float(os.getenv('FETCH_RATE_LIMIT_MAX_INLINE_WAIT', '5'))
+FETCH_RATE_LIMIT_DEFAULT_BACKOFF = float(os.getenv('FETCH_RATE_LIMIT_DEFAULT_BACKOFF', '60'))
+# RSS 解析（articles/feed_parser.py）
+# RSS_DESCRIPTION_MAX_CHARS: 解析時にエントリの概要として読む最大文字数（HTML 除去前）
+# RSS_INCREMENTAL_STOP_AFTER_KNOWN: 取り込み済みの GUID がこの件数続いたら以降を読まない（0 で無効、常に全件解析）
+RSS_DESCRIPTION_MAX_CHARS = int(os.getenv('RSS_DESCRIPTION_MAX_CHARS', '5000'))
+RSS_INCREMENTAL_STOP_AFTER_KNOWN = int(os.getenv('RSS_INCREMENTAL_STOP_AFTER_KNOWN', '0'))
+# 取り込み時の概要の正規化（articles/textnorm.py。RSS・スクレイピング共通）
+# HTML を除去して空白をまとめたあと、この文字数で切り詰める（0 で上限なし）
+INGEST_DESCRIPTION_MAX_CHARS = int(os.getenv('INGEST_DESCRIPTION_MAX_CHARS', '1000'))
+# フィードから消えた未読RSS記事を削除するときの1回あたりの件数（問い・アクション・タグの紐づけを記事IDで一括削除してから記事を消す。ORM のコレクターは通さない）
+RSS_PRUNE_CHUNK_SIZE = int(os.getenv('RSS_PRUNE_CHUNK_SIZE', '500'))
+# フィードごとの適応的ポーリング（articles/feed_schedule.py）
+# 取得間隔の下限 / 上限（分）と、取得時刻を前後にずらす割合
+RSS_POLL_MIN_MINUTES = float(os.getenv('RSS_POLL_MIN_MINUTES', '15'))
+RSS_POLL_MAX_MINUTES = float(os.getenv('RSS_POLL_MAX_MINUTES', str(24 * 60)))
+RSS_POLL_JITTER = float(os.getenv('RSS_POLL_JITTER', '0.1'))
+# RSS の並行同期エンジン（articles/feed_sync.py）
+# RSS_SYNC_CONCURRENCY: 同時に取得するフィード数 / RSS_SYNC_PER_HOST: 同一ホストへの同時接続数
+RSS_SYNC_CONCURRENCY = int(os.getenv('RSS_SYNC_CONCURRENCY', '16'))
+RSS_SYNC_PER_HOST = int(os.getenv('RSS_SYNC_PER_HOST', '2'))
+# 同一URLの取得の重複排除（articles/singleflight.py。状態の置き場所は FETCH_RATE_LIMIT_BACKEND と同じ）
+# FETCH_SINGLEFLIGHT_TTL: 取得中フラグの有効秒数（リーダーが異常終了した場合の保険）
+# FETCH_RECENT_WINDOW_SECONDS: この秒数以内に取得済みの URL は再取得せず分類だけ行う（0 で無効）
+FETCH_SINGLEFLIGHT_TTL = float(os.getenv('FETCH_SINGLEFLIGHT_TTL', '120'))
+FETCH_RECENT_WINDOW_SECONDS = float(os.getenv('FETCH_RECENT_WINDOW_SECONDS', '300'))
+# robots.txt キャッシュ（articles/robots.py）
+# ROBOTS_TXT_TTL_HOURS: 取得した robots.txt（404 等で存在しない場合を含む）を再利用する時間
+# ROBOTS_TXT_ERROR_TTL_MINUTES: 5xx・接続エラー時に「制限なし」として扱う時間
+# ROBOTS_MAX_CRAWL_DELAY: Crawl-delay として受け入れる最大秒数
+ROBOTS_TXT_ENABLED = os.getenv('ROBOTS_TXT_ENABLED', 'True').lower() == 'true'
+ROBOTS_TXT_TTL_HOURS = float(os.getenv('ROBOTS_TXT_TTL_HOURS', '24'))
+ROBOTS_TXT_ERROR_TTL_MINUTES = float(os.getenv('ROBOTS_TXT_ERROR_TTL_MINUTES', '30'))
+ROBOTS_TXT_TIMEOUT = float(os.getenv('ROBOTS_TXT_TIMEOUT', '5'))
+ROBOTS_MAX_CRAWL_DELAY = float(os.getenv('ROBOTS_MAX_CRAWL_DELAY', '60'))
+# URL 正規化（articles/urlnorm.py）
+# 保存・RSS取り込み時に除去するトラッキング用クエリパラメータ（* ワイルドカード可、大文字小文字は無視）
+URL_TRACKING_PARAMS = [
+    'utm_*', 'fbclid', 'gclid', 'dclid', 'yclid', 'msclkid',
+    'mc_cid', 'mc_eid', 'igshid', '_ga', '_gl', 'ref_src',
+]
+_extra_tracking_params = [p.strip() for p in os.getenv('URL_EXTRA_TRACKING_PARAMS', '').split(',') if p.strip()]
+URL_TRACKING_PARAMS += _extra_tracking_params
+# ルート以外のパス末尾の / を除去して同一URL扱いにする
+URL_STRIP_TRAILING_SLASH = os.getenv('URL_STRIP_TRAILING_SLASH', 'True').lower() == 'true'
+
+# ホスト単位のサーキットブレーカー（articles/circuit.py）
+# 連続失敗が閾値に達したホストは COOLDOWN 分だけスキップし、その後1件だけ試行する
+# （再び失敗するたびにクールダウンを倍にし、MAX_COOLDOWN で頭打ち）
+HOST_BREAKER_FAILURE_THRESHOLD = int(os.getenv('HOST_BREAKER_FAILURE_THRESHOLD', '5'))
+HOST_BREAKER_COOLDOWN_MINUTES = float(os.getenv('HOST_BREAKER_COOLDOWN_MINUTES', '10'))
+HOST_BREAKER_MAX_COOLDOWN_MINUTES = float(os.getenv('HOST_BREAKER_MAX_COOLDOWN_MINUTES', '360'))
+HOST_BREAKER_PROBE_TIMEOUT = float(os.getenv('HOST_BREAKER_PROBE_TIMEOUT', '120'))
+# メタデータ抽出で読む最大バイト数（</head> に達しない巨大ページの打ち切り用）
+METADATA_HEAD_MAX_BYTES = int(os.getenv('METADATA_HEAD_MAX_BYTES', str(512 * 1024)))
+# 一括取得の解析段階（articles/fetcher.py）
+# METADATA_PARSE_WORKERS: HTML 解析用プロセス数（0 ならダウンロード用スレッドで解析）
+# METADATA_PARSE_QUEUE_SIZE: ダウンロード済み・未解析で溜めておく件数の上限（超えるとダウンロードが待つ）
+METADATA_PARSE_WORKERS = int(os.getenv('METADATA_PARSE_WORKERS', '0' if DEBUG else str(min(4, os.cpu_count() or 1))))
+METADATA_PARSE_QUEUE_SIZE = int(os.getenv('METADATA_PARSE_QUEUE_SIZE', str(max(1, METADATA_PARSE_WORKERS) * 4)))
+
 # ========== CORS SETTINGS ==========
 
 # 開発中 (DEBUG=True) はすべてのオリジンを許可、本番では環境変数 CORS_ALLOWED_ORIGINS_LIST で制限